@@ -1,16 +1,35 @@
 import os
 import json
+import time
+import asyncio
 import openai
-import duckdb
 import gradio as gr
 from functools import lru_cache
 
+from async_pipeline import HANDLER_CONCURRENCY, LLM_CONCURRENCY, SingleFlight, run_blocking
+from crosswalk import REGION_LEVELS, region_aggregate_table, region_table_schemas, register_crosswalk
+from duckdb_pool import check_single_select, get_connection_manager
+from metrics import (
+    METRICS_PORT, QueryProfile, Trace, configure_trace_log, registry, start_metrics_server,
+)
+from paged_results import PagedResult, PagedResultStore, arrow_reader
+from query_guard import QueryDeadline, Verdict, admit_query
+from result_cache import ResultCache, canonicalize_sql
+from rollups import build_rollups, execute_with_rollups
+from template_sql import TemplateTranslator
+from translation_cache import TranslationCache, normalize_nl_query
+
 # =========================
 # Configuration and Setup
 # =========================
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
-DATASET_PATH = 'hsas.parquet'  # Update with your Parquet file path
+# A Parquet file, or the hive-partitioned directory written by
+# `load_hsa_data.py --partitioned` so zip filters can skip whole partitions
+DATASET_PATH = os.getenv("HSA_DATASET_PATH", 'hsas.parquet')
+# ZIP -> HSA/HRR crosswalk written by the ETL (`load_hsa_data.py --crosswalk`)
+CROSSWALK_PATH = os.getenv("HSA_CROSSWALK_PATH", 'zip_hsa_hrr.parquet')
+OPENAI_MODEL = "gpt-4"
 
 SCHEMA = [
     {"column_name": "total_charges", "column_type": "BIGINT"},
@@ -26,50 +45,327 @@ def get_schema():
 
 COLUMN_TYPES = {col['column_name']: col['column_type'] for col in get_schema()}
 
+@lru_cache(maxsize=1)
+def get_region_tables():
+    """Columns of the HSA/HRR lookup tables, or ``{}`` without a crosswalk."""
+    return region_table_schemas() if os.path.exists(CROSSWALK_PATH) else {}
+
+def get_prompt_schema():
+    """Every table the SQL prompt describes."""
+    if not get_region_tables():
+        return get_schema()
+    return {"hsa_data": get_schema(), **get_region_tables()}
+
+# Persisted NL->SQL translations; entries are dropped if schema or model change
+translation_cache = TranslationCache(schema=get_prompt_schema(), model=OPENAI_MODEL)
+
+# Local translator for common question shapes, tried before the LLM; totals
+# by HSA or HRR are read from the per-region tables
+template_translator = TemplateTranslator(get_schema(), region_tables={
+    id_column: region_aggregate_table(level) for level, (id_column, _) in REGION_LEVELS.items()
+} if get_region_tables() else None)
+
+# Arrow results keyed on canonical SQL and the dataset and crosswalk fingerprints
+result_cache = ResultCache()
+
+# Open, lazily paged query results shared across Gradio sessions
+paged_results = PagedResultStore()
+
+# Pre-aggregated GROUP BY tables, rebuilt whenever the dataset is (re)loaded
+get_connection_manager(DATASET_PATH).add_refresh_hook(build_rollups)
+# ZIP -> HSA/HRR crosswalk and per-region aggregates, indexed, rebuilt alongside
+get_connection_manager(DATASET_PATH).add_source(CROSSWALK_PATH)
+get_connection_manager(DATASET_PATH).add_refresh_hook(lambda con: register_crosswalk(con, CROSSWALK_PATH))
+
+# Concurrent identical requests share one LLM call / one query execution
+llm_flight = SingleFlight()
+query_flight = SingleFlight()
+llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+
+registry.gauge("hsa_result_cache_bytes", lambda: result_cache.stats()["bytes"])
+registry.gauge("hsa_open_results", lambda: len(paged_results))
+
+@lru_cache(maxsize=1)
+def get_async_client():
+    return openai.AsyncOpenAI(api_key=openai.api_key)
+
 # =========================
 # OpenAI API Integration
 # =========================
 
-def parse_query(nl_query):
-    messages = [
+REGION_PROMPT = (
+    " For hospital service areas (HSAs) and hospital referral regions (HRRs), hsa_aggregates and"
+    " hrr_aggregates hold total_charges, total_days_of_care and total_cases already summed per"
+    " hsanum/hrrnum (with row_count, zip_count and provider_count), and zip_hsa_hrr maps each"
+    " zip_cd_of_residence to its hsanum and hrrnum. Prefer these tables over aggregating hsa_data."
+)
+
+def build_messages(nl_query):
+    return [
         {
             "role": "system",
             "content": (
                 "You are an assistant that converts natural language queries into SQL queries for the 'hsa_data' table. "
                 "Ensure the SQL query is syntactically correct and uses only the columns provided in the schema."
+                + (REGION_PROMPT if get_region_tables() else "")
             ),
         },
         {
             "role": "user",
-            "content": f"Schema:\n{json.dumps(get_schema(), indent=2)}\n\nQuery:\n\"{nl_query}\"\n\nSQL:",
+            "content": f"Schema:\n{json.dumps(get_prompt_schema(), indent=2)}\n\nQuery:\n\"{nl_query}\"\n\nSQL:",
         },
     ]
 
+def translate_offline(nl_query, trace):
+    """Return ``(sql, source)`` from the templates or the cache, else ``(None, None)``."""
+    with trace.stage("template"):
+        sql_query = template_translator.translate(nl_query)
+    if sql_query is not None:
+        return sql_query, "template"
+    with trace.stage("translation_cache"):
+        cached_sql = translation_cache.get(nl_query)
+    registry.inc("hsa_cache_lookups_total", cache="translation",
+                 result="miss" if cached_sql is None else "hit")
+    if cached_sql is not None:
+        return cached_sql, "cache"
+    return None, None
+
+def translation_status(source, trace):
+    registry.inc("hsa_translations_total", source=source)
+    trace.set(source=source)
+    elapsed = trace.finish()
+    return f"SQL from {source} in {elapsed * 1000:.1f} ms"
+
+def parse_query(nl_query):
+    """Return ``(sql, error, status)``; the status names the path that served it."""
+    trace = Trace("parse_query", question=nl_query)
+    sql_query, source = translate_offline(nl_query, trace)
+    if sql_query is not None:
+        return sql_query, "", translation_status(source, trace)
+
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            temperature=0,
-            max_tokens=150,
-        )
+        with trace.stage("llm"):
+            response = openai.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=build_messages(nl_query),
+                temperature=0,
+                max_tokens=150,
+            )
         sql_query = response.choices[0].message.content.strip()
-        return sql_query, ""
+        translation_cache.put(nl_query, sql_query)
+        return sql_query, "", translation_status("llm", trace)
     except Exception as e:
-        return "", f"Error generating SQL query: {e}"
+        trace.finish()
+        return "", f"Error generating SQL query: {e}", ""
+
+async def parse_query_async(nl_query):
+    """Async ``parse_query``: one shared, rate-limited LLM call per question."""
+    trace = Trace("parse_query", question=nl_query)
+    sql_query, source = translate_offline(nl_query, trace)
+    if sql_query is not None:
+        return sql_query, "", translation_status(source, trace)
+
+    async def translate():
+        async with llm_semaphore:
+            response = await get_async_client().chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=build_messages(nl_query),
+                temperature=0,
+                max_tokens=150,
+            )
+        sql_query = response.choices[0].message.content.strip()
+        translation_cache.put(nl_query, sql_query)
+        return sql_query
+
+    try:
+        with trace.stage("llm"):
+            sql_query = await llm_flight.do(normalize_nl_query(nl_query), translate)
+        return sql_query, "", translation_status("llm", trace)
+    except Exception as e:
+        trace.finish()
+        return "", f"Error generating SQL query: {e}", ""
 
 # =========================
 # Database Interaction
 # =========================
 
+def checkout_cursor(manager):
+    """Check out a result cursor, taking it from the stalest open result if all are held."""
+    try:
+        return manager.detached_cursor(timeout=0)
+    except TimeoutError:
+        # Only wait when every cursor belongs to a query still executing
+        paged_results.release_oldest_streaming()
+        return manager.detached_cursor()
+
+
 def execute_sql_query(sql_query):
+    """Run ``sql_query`` and return ``(PagedResult, verdict, error)``.
+
+    Anything but a single SELECT is refused. The query is then admitted (or
+    rejected, or given a LIMIT) from its ``EXPLAIN`` estimates, and executed
+    under a wall-clock deadline that covers reading the first page. Rows are
+    streamed from DuckDB as Arrow batches one page at a time, so nothing
+    beyond the first page is read until it is asked for. Each stage is traced; queries slower than
+    ``HSA_SLOW_QUERY_MS`` keep a profile recording how they ended.
+    """
+    trace = Trace("execute_sql_query", sql=sql_query)
+    verdict = None
     try:
-        con = duckdb.connect(database=':memory:')
-        con.execute(f"CREATE OR REPLACE VIEW hsa_data AS SELECT * FROM '{DATASET_PATH}'")
-        result_df = con.execute(sql_query).fetchdf()
-        con.close()
-        return result_df, ""
+        with trace.stage("connect"):
+            manager = get_connection_manager(DATASET_PATH)
+            fingerprint = manager.refresh()
+        with trace.stage("result_cache"):
+            table = result_cache.get(sql_query, fingerprint)
+        registry.inc("hsa_cache_lookups_total", cache="result",
+                     result="miss" if table is None else "hit")
+        if table is not None:
+            verdict = Verdict("cached", sql_query, reason="served from result cache")
+            trace.set(verdict="cached", rows=table.num_rows)
+            trace.finish()
+            return PagedResult.from_table(table), verdict, ""
+        with trace.stage("connect"):
+            cur = checkout_cursor(manager)
+        result = profile = None
+        try:
+            with trace.stage("admission"):
+                check_single_select(cur, sql_query)
+                verdict = admit_query(cur, sql_query)
+            trace.set(verdict=verdict.action, estimated_rows=verdict.rows)
+            if verdict.rejected:
+                manager.release(cur)
+                trace.finish("rejected")
+                return None, verdict, "Query rejected before execution."
+            profile = QueryProfile(cur, verdict.sql).start()
+
+            def outcome(default):
+                return "cancelled" if verdict.action == "cancelled" else default
+
+            def close():
+                profile.finish(outcome(result.outcome))
+                manager.release(cur)
+
+            start = time.perf_counter()
+            with QueryDeadline(cur) as deadline:
+                try:
+                    with trace.stage("execute"):
+                        reader = arrow_reader(execute_with_rollups(cur, verdict.sql))
+                    result = PagedResult(
+                        reader,
+                        on_close=close,
+                        on_complete=lambda t: result_cache.put(sql_query, fingerprint, t),
+                    )
+                    with trace.stage("fetch"):
+                        result.page(0)
+                    profile.stop()
+                except Exception:
+                    if deadline.expired:
+                        verdict.action = "cancelled"
+                        verdict.reason = f"exceeded {deadline.timeout_s:g} s timeout"
+                    raise
+                finally:
+                    verdict.run_ms = (time.perf_counter() - start) * 1000
+        except Exception:
+            if result is not None:
+                result.close()
+            else:
+                if profile is not None:
+                    profile.finish(outcome("error"))
+                manager.release(cur)
+            raise
+        registry.inc("hsa_rows_read_total", result.rows_read)
+        registry.inc("hsa_bytes_materialized_total", result.bytes_read)
+        trace.set(rows=result.rows_read, bytes=result.bytes_read)
+        trace.finish()
+        return result, verdict, ""
     except Exception as e:
-        return None, f"Error executing query: {e}"
+        trace.finish(verdict.action if verdict is not None and verdict.rejected else "error")
+        return None, verdict, f"Error executing query: {e}"
+
+def show_page(result_id, page_index):
+    """Return ``(DataFrame, page label, page index)`` for an open result."""
+    result = paged_results.get(result_id) if result_id else None
+    if result is None:
+        return None, "", 0
+    trace = Trace("show_page")
+    rows_before, bytes_before = result.rows_read, result.bytes_read
+    page_index = max(0, page_index)
+    with trace.stage("fetch"):
+        table = result.page(page_index)
+        if result.page_count is not None and page_index >= result.page_count:
+            page_index = result.page_count - 1
+            table = result.page(page_index)
+    total = result.page_count if result.page_count is not None else "?"
+    label = f"Page {page_index + 1} of {total}"
+    if result.evicted:
+        label += f" (truncated at {result.rows_read:,} rows; the rest was dropped to free a cursor)"
+    elif result.truncated:
+        label += f" (truncated at {result.max_rows:,} rows)"
+    # Conversion for Gradio; the JSON encoding of the frame happens after return
+    with trace.stage("to_pandas"):
+        df = table.to_pandas()
+    registry.inc("hsa_rows_read_total", result.rows_read - rows_before)
+    registry.inc("hsa_bytes_materialized_total", result.bytes_read - bytes_before)
+    trace.set(page=page_index, rows=table.num_rows)
+    trace.finish()
+    return df, label, page_index
+
+async def open_result(sql_query, previous_result_id=None):
+    """Execute ``sql_query`` and return its first page plus paging state.
+
+    DuckDB work runs on the bounded query executor; concurrent requests for
+    the same (canonical) SQL share one execution and one ``PagedResult``.
+    The last element is the guardrail verdict with its timings, or ``""``.
+    """
+    if previous_result_id:
+        paged_results.discard(previous_result_id)
+    result, verdict, error = await query_flight.do(
+        canonicalize_sql(sql_query), lambda: run_blocking(execute_sql_query, sql_query)
+    )
+    status = verdict.summary() if verdict is not None else ""
+    if error:
+        return None, "", None, 0, error, status
+    result_id = paged_results.add(result)
+    result_df, label, page_index = await run_blocking(show_page, result_id, 0)
+    return result_df, label, result_id, page_index, "", status
+
+async def show_page_async(result_id, page_index):
+    return await run_blocking(show_page, result_id, page_index)
+
+# =========================
+# Event Handlers
+# =========================
+
+def status_update(error, *statuses):
+    # Translation path and guardrail verdict are shown with the error
+    message = "\n\n".join(part for part in (error, *statuses) if part)
+    return gr.Markdown.update(visible=bool(message), value=message)
+
+async def handle_example_click(example_query, result_id=None):
+    if example_query.strip().upper().startswith("SELECT"):
+        sql_query = example_query
+        result_df, label, result_id, page_index, error, status = await open_result(sql_query, result_id)
+        return sql_query, gr.update(), result_df, status_update(error, status), label, result_id, page_index
+    else:
+        sql_query, error, sql_status = await parse_query_async(example_query)
+        if error:
+            error_update = gr.Markdown.update(visible=True, value=error)
+            return sql_query, error_update, None, error_update, "", result_id, 0
+        result_df, label, result_id, page_index, exec_error, status = await open_result(sql_query, result_id)
+        return (sql_query, gr.update(), result_df, status_update(exec_error, sql_status, status),
+                label, result_id, page_index)
+
+# Gradio only awaits handlers that are coroutine functions; a lambda returning
+# a coroutine would hand the un-awaited coroutine to the outputs.
+def example_click_handler(example_query):
+    async def handler(result_id):
+        return await handle_example_click(example_query, result_id)
+    return handler
+
+def page_handler(step):
+    async def handler(result_id, page):
+        return await show_page_async(result_id, page + step)
+    return handler
 
 # =========================
 # Gradio Application UI
@@ -112,51 +408,28 @@ with gr.Blocks() as demo:
             error_out = gr.Markdown(visible=False)
         with gr.Column(scale=2):
             results_out = gr.Dataframe(label="Query Results")
+            with gr.Row():
+                btn_prev_page = gr.Button("Previous Page")
+                page_info = gr.Markdown()
+                btn_next_page = gr.Button("Next Page")
+            result_id_state = gr.State(None)
+            page_state = gr.State(0)
 
     with gr.Tab("Dataset Schema"):
         gr.Markdown("### Dataset Schema")
-        schema_display = gr.JSON(label="Schema", value=get_schema())
+        schema_display = gr.JSON(label="Schema", value=get_prompt_schema())
 
     # =========================
     # Event Functions
     # =========================
 
-    def generate_sql(nl_query):
-        sql_query, error = parse_query(nl_query)
-        if error:
-            error_update = gr.Markdown.update(visible=True, value=error)
-        else:
-            error_update = gr.Markdown.update(visible=False)
-        return sql_query, error_update
+    async def generate_sql(nl_query):
+        sql_query, error, status = await parse_query_async(nl_query)
+        return sql_query, status_update(error, status)
 
-    def execute_query(sql_query):
-        result_df, error = execute_sql_query(sql_query)
-        if error:
-            error_update = gr.Markdown.update(visible=True, value=error)
-        else:
-            error_update = gr.Markdown.update(visible=False)
-        return result_df, error_update
-
-    def handle_example_click(example_query):
-        if example_query.strip().upper().startswith("SELECT"):
-            sql_query = example_query
-            result_df, error = execute_sql_query(sql_query)
-            if error:
-                error_update = gr.Markdown.update(visible=True, value=error)
-            else:
-                error_update = gr.Markdown.update(visible=False)
-            return sql_query, gr.update(), result_df, error_update
-        else:
-            sql_query, error = parse_query(example_query)
-            if error:
-                error_update = gr.Markdown.update(visible=True, value=error)
-                return sql_query, error_update, None, error_update
-            result_df, exec_error = execute_sql_query(sql_query)
-            if exec_error:
-                error_update = gr.Markdown.update(visible=True, value=exec_error)
-            else:
-                error_update = gr.Markdown.update(visible=False)
-            return sql_query, gr.update(), result_df, error_update
+    async def execute_query(sql_query, result_id):
+        result_df, label, result_id, page_index, error, status = await open_result(sql_query, result_id)
+        return result_df, status_update(error, status), label, result_id, page_index
 
     # =========================
     # Button Click Event Handlers
@@ -170,16 +443,33 @@ with gr.Blocks() as demo:
 
     btn_execute_query.click(
         fn=execute_query,
-        inputs=sql_query_out,
-        outputs=[results_out, error_out],
+        inputs=[sql_query_out, result_id_state],
+        outputs=[results_out, error_out, page_info, result_id_state, page_state],
     )
 
     for btn, query in zip(btn_queries, query_buttons):
         btn.click(
-            fn=lambda q=query: handle_example_click(q),
-            outputs=[sql_query_out, error_out, results_out, error_out],
+            fn=example_click_handler(query),
+            inputs=result_id_state,
+            outputs=[sql_query_out, error_out, results_out, error_out,
+                     page_info, result_id_state, page_state],
         )
 
+    btn_prev_page.click(
+        fn=page_handler(-1),
+        inputs=[result_id_state, page_state],
+        outputs=[results_out, page_info, page_state],
+    )
+
+    btn_next_page.click(
+        fn=page_handler(+1),
+        inputs=[result_id_state, page_state],
+        outputs=[results_out, page_info, page_state],
+    )
+
 # Launch the Gradio App
 if __name__ == "__main__":
-    demo.launch()
+    configure_trace_log()
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    demo.queue(concurrency_count=HANDLER_CONCURRENCY).launch()
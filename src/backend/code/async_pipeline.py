@@ -0,0 +1,61 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from duckdb_pool import DUCKDB_POOL_SIZE
+
+# =========================
+# Configuration
+# =========================
+
+LLM_CONCURRENCY = int(os.getenv("HSA_LLM_CONCURRENCY", "8"))
+QUERY_WORKERS = int(os.getenv("HSA_QUERY_WORKERS", str(DUCKDB_POOL_SIZE)))
+HANDLER_CONCURRENCY = int(os.getenv("HSA_HANDLER_CONCURRENCY", "32"))
+
+# DuckDB work runs here so it never blocks the event loop; the worker count
+# bounds how many scans run at once.
+query_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="duckdb")
+
+
+async def run_blocking(fn, *args):
+    """Run ``fn(*args)`` on the bounded query executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(query_executor, fn, *args)
+
+
+# =========================
+# Single-Flight Coalescing
+# =========================
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one in-flight call.
+
+    The first caller for ``key`` starts ``fn()``; callers arriving while it
+    runs await the same task and get the same result (or exception). The key
+    is forgotten as soon as the call finishes, so later calls run afresh.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._inflight = {}
+
+    async def do(self, key, fn):
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+
+            def forget(done, key=key):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+
+            task.add_done_callback(forget)
+        else:
+            self.shared += 1
+        # A cancelled waiter must not cancel the call other waiters share
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
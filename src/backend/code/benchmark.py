@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import shutil
+import platform
+import statistics
+import subprocess
+import tempfile
+
+from synthetic_data import HSAGenerator, generate_businesses, parse_count, write_csv, write_parquet
+
+# =========================
+# Configuration
+# =========================
+
+BENCHMARK_ROWS = "1M"
+BENCHMARK_REPEAT = 5
+REGRESSION_THRESHOLD = 0.2  # median slower by more than 20% fails --compare
+MAP_BUSINESSES = 5_000
+SUITES = ["etl", "queries", "datasette", "map", "startup"]
+
+# Run in a fresh interpreter: import the dashboard, render the first map
+STARTUP_SCRIPT = """
+import json, resource, time
+start = time.perf_counter()
+import plot_hsas
+imported = time.perf_counter() - start
+plot_hsas.create_map(geo_layer="HSAs")
+print(json.dumps({"import_s": imported, "first_map_s": time.perf_counter() - start,
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def summarize(samples):
+    """Summary statistics (seconds) of repeated timings."""
+    return {
+        "runs": len(samples),
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "max_s": max(samples),
+    }
+
+
+def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# =========================
+# Suites
+# =========================
+
+def bench_etl(csv_path, workdir, rows):
+    """Time the full CSV -> SQLite + Parquet ETL once."""
+    from load_hsa_data import load_csv_to_sqlite_and_save_parquet
+
+    db_path = os.path.join(workdir, "databases", "hsas.db")
+    parquet_path = os.path.join(workdir, "processed", "hsas.parquet")
+    samples = time_call(lambda: load_csv_to_sqlite_and_save_parquet(
+        csv_path, db_path, "hsa_data", parquet_path), 1)
+    result = {"suite": "etl", "name": "load_csv_to_sqlite_and_save_parquet",
+              "rows": rows, **summarize(samples)}
+    result["rows_per_s"] = rows / result["median_s"]
+    return [result], db_path, parquet_path
+
+
+def bench_queries(parquet_path, repeat):
+    """Time ``execute_sql_query`` (result cache cleared) on the example queries."""
+    os.environ["HSA_DATASET_PATH"] = parquet_path
+    import app
+
+    results = []
+    for question in app.query_buttons:
+        if question.strip().upper().startswith("SELECT"):
+            sql_query = question
+        else:
+            sql_query, error, _ = app.parse_query(question)
+            if error:
+                results.append({"suite": "queries", "name": question, "error": error})
+                continue
+
+        def run():
+            app.result_cache.clear()
+            result, _, error = app.execute_sql_query(sql_query)
+            if error:
+                raise RuntimeError(error)
+            result.read_all()
+            result.close()
+
+        run()  # warm the view, rollups and OS cache
+        results.append({"suite": "queries", "name": question, "sql": sql_query,
+                        **summarize(time_call(run, repeat))})
+    return results
+
+
+def bench_datasette(db_path, repeat):
+    """Time Datasette endpoints: the first (uncached) and repeated requests."""
+    import httpx
+    from datasette_serving import create_app
+
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    paths = [
+        f"/{name}",
+        f"/{name}/hsa_data",
+        f"/{name}/hsa_data.json?_size=100&_sort_desc=total_charges",
+        f"/{name}.json?sql=select+zip_cd_of_residence,+sum(total_charges)+from+hsa_data"
+        f"+group+by+zip_cd_of_residence+order+by+2+desc+limit+20",
+    ]
+
+    async def run():
+        results = []
+        app = create_app(db_path, prewarm_paths=None)
+        await app.startup()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+            for path in paths:
+                start = time.perf_counter()
+                response = await client.get(path)
+                cold = time.perf_counter() - start
+                samples = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    await client.get(path)
+                    samples.append(time.perf_counter() - start)
+                results.append({"suite": "datasette", "name": path, "status": response.status_code,
+                                "cold_s": cold, **summarize(samples)})
+        return results
+
+    return asyncio.run(run())
+
+
+def bench_map(repeat, businesses=MAP_BUSINESSES):
+    """Time ``create_map`` and cached lookups for each layer over
+    ``businesses`` synthetic shops.
+
+    ``plot_hsas`` loads its shapefiles and CSVs on import; without them the
+    suite is reported as skipped.
+    """
+    try:
+        import plot_hsas
+    except Exception as e:
+        return [{"suite": "map", "name": "create_map", "skipped": f"{type(e).__name__}: {e}"}]
+
+    df = generate_businesses(businesses)
+    plot_hsas.load_businesses = lambda: df
+    plot_hsas.map_cache.clear()
+    results = []
+    for layer in ["Counties", "HSAs", "HRRs"]:
+        samples = time_call(lambda: plot_hsas.create_map(geo_layer=layer), repeat)
+        results.append({"suite": "map", "name": f"create_map[{layer}]",
+                        "businesses": businesses, **summarize(samples)})
+        plot_hsas.map_cache.get(layer, ["All"])
+        samples = time_call(lambda: plot_hsas.map_cache.get(layer, ["All"]), repeat)
+        results.append({"suite": "map", "name": f"map_cache[{layer}]",
+                        "businesses": businesses, **summarize(samples)})
+    return results
+
+
+def bench_startup(repeat):
+    """Cold start (empty geo and boundary caches) versus warm start.
+
+    Each run is a new interpreter timing ``import plot_hsas`` plus the first
+    ``create_map``, with its peak resident memory. Reported as skipped when
+    the dashboard cannot start here (missing data or packages).
+    """
+    cache_dir = tempfile.mkdtemp(prefix="hsa_startup_")
+    env = dict(os.environ, HSA_GEO_CACHE_DIR=os.path.join(cache_dir, "geo"),
+               HSA_BOUNDARY_DIR=os.path.join(cache_dir, "boundaries"),
+               PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                        os.environ.get("PYTHONPATH")])))
+
+    def run():
+        proc = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], env=env,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError((proc.stderr.strip().splitlines() or ["failed"])[-1])
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    try:
+        cold = run()
+        warm = [run() for _ in range(repeat)]
+    except RuntimeError as e:
+        return [{"suite": "startup", "name": "plot_hsas", "skipped": str(e)}]
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    results = [{"suite": "startup", "name": "cold", **summarize([cold["first_map_s"]]),
+                "import_s": cold["import_s"], "max_rss_mb": cold["max_rss_mb"]}]
+    results.append({"suite": "startup", "name": "warm",
+                    **summarize([w["first_map_s"] for w in warm]),
+                    "import_s": statistics.median(w["import_s"] for w in warm),
+                    "max_rss_mb": max(w["max_rss_mb"] for w in warm)})
+    return results
+
+
+def run_benchmarks(suites=SUITES, rows=parse_count(BENCHMARK_ROWS), repeat=BENCHMARK_REPEAT,
+                   seed=0, workdir=None, map_businesses=MAP_BUSINESSES):
+    """Run ``suites`` on ``rows`` synthetic rows and return the report dict.
+
+    Generated data goes to ``workdir``, or to a temporary directory that is
+    removed afterwards.
+    """
+    keep = workdir is not None
+    workdir = workdir or tempfile.mkdtemp(prefix="hsa_bench_")
+    generator = HSAGenerator(rows, seed=seed)
+    results = []
+    db_path = parquet_path = None
+
+    try:
+        if "etl" in suites or "datasette" in suites:
+            csv_path = write_csv(generator, os.path.join(workdir, "hsa.csv"))
+            etl_results, db_path, parquet_path = bench_etl(csv_path, workdir, rows)
+            if "etl" in suites:
+                results += etl_results
+        if "queries" in suites:
+            if parquet_path is None:
+                parquet_path = write_parquet(generator, os.path.join(workdir, "hsas.parquet"))
+            results += bench_queries(parquet_path, repeat)
+        if "datasette" in suites:
+            results += bench_datasette(db_path, repeat)
+        if "map" in suites:
+            results += bench_map(repeat, map_businesses)
+        if "startup" in suites:
+            results += bench_startup(repeat)
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "rows": rows,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """Return ``(key, baseline_s, current_s)`` for medians that regressed."""
+    def medians(r):
+        return {(x["suite"], x["name"]): x["median_s"] for x in r["results"] if "median_s" in x}
+
+    before, after = medians(baseline), medians(report)
+    return [
+        (key, before[key], after[key])
+        for key in sorted(before.keys() & after.keys())
+        if after[key] > before[key] * (1 + threshold)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the HSA ETL, queries, Datasette, maps and startup.")
+    parser.add_argument('--suites', nargs='+', choices=SUITES, default=SUITES)
+    parser.add_argument('--rows', default=BENCHMARK_ROWS, help="Synthetic rows, e.g. 1M or 500M.")
+    parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help="Where generated data goes (default: a temp dir).")
+    parser.add_argument('--map-businesses', type=int, default=MAP_BUSINESSES)
+    parser.add_argument('--output', default="benchmark.json", help="JSON report path.")
+    parser.add_argument('--compare', help="Baseline JSON report; exit 1 on regressions.")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.suites, parse_count(args.rows), args.repeat, args.seed,
+                            args.workdir, args.map_businesses)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for r in report["results"]:
+        timing = f"{r['median_s'] * 1000:10.1f} ms" if "median_s" in r else r.get("skipped") or r.get("error")
+        if "max_rss_mb" in r:
+            timing += f"  (import {r['import_s'] * 1000:.1f} ms, max RSS {r['max_rss_mb']:.0f} MB)"
+        print(f"{r['suite']:10} {r['name'][:60]:60} {timing}")
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for (suite, name), before, after in regressions:
+            print(f"REGRESSION {suite} {name}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms")
+        sys.exit(1 if regressions else 0)
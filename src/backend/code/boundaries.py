@@ -0,0 +1,148 @@
+import os
+import json
+import logging
+import argparse
+
+import numpy as np
+import shapely
+import geopandas as gpd
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Configuration
+# =========================
+
+BOUNDARY_DIR = os.getenv("HSA_BOUNDARY_DIR", "backend/data/boundaries")
+BOUNDARY_CRS = "EPSG:4326"
+# Highest map zoom each level is drawn at -> (simplify tolerance in degrees,
+# coordinate decimals). At zoom 7 a pixel is ~0.01 degrees.
+BOUNDARY_LEVELS = {
+    7: (0.005, 3),
+    10: (0.0008, 4),
+    13: (0.0001, 5),
+}
+# Attributes the maps show; everything else is dropped from the artifacts
+BOUNDARY_COLUMNS = {
+    "Counties": ["statefp", "countyfp", "geoid", "name", "namelsad", "GEOID"],
+    "HSAs": ["hsanum", "hsacity", "hsastate", "HSANUM"],
+    "HRRs": ["hrrnum", "hrrcity", "hrrstate", "HRRNUM"],
+}
+MANIFEST_NAME = "manifest.json"
+
+
+def boundary_level(zoom):
+    """Smallest level drawn at ``zoom`` or beyond (the finest past the last)."""
+    for max_zoom in sorted(BOUNDARY_LEVELS):
+        if zoom <= max_zoom:
+            return max_zoom
+    return max(BOUNDARY_LEVELS)
+
+
+def boundary_path(layer, zoom=7, out_dir=BOUNDARY_DIR):
+    return os.path.join(out_dir, f"{layer.lower()}_z{boundary_level(zoom)}.geojson")
+
+
+# =========================
+# Simplification
+# =========================
+
+def simplify_coverage(geometries, tolerance):
+    """Simplify polygons that tile an area, keeping shared edges shared.
+
+    ``shapely.coverage_simplify`` (Shapely 2.1+, GEOS 3.12+) simplifies each
+    shared edge once, so neighbours never gap or overlap. Older versions
+    fall back to per-polygon topology-preserving simplification.
+    """
+    geometries = shapely.make_valid(np.asarray(geometries))
+    if hasattr(shapely, "coverage_simplify"):
+        return shapely.coverage_simplify(geometries, tolerance)
+    return shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+
+def quantize(geometries, decimals):
+    """Snap coordinates to a ``10**-decimals`` grid without invalidating shapes."""
+    geometries = shapely.set_precision(geometries, 10.0 ** -decimals)
+    # Snapped values such as 35.123000000000005 are rounded so they print short
+    coords = shapely.get_coordinates(geometries)
+    return shapely.set_coordinates(geometries, np.round(coords, decimals))
+
+
+def simplify_layer(gdf, tolerance, decimals, columns=()):
+    """``gdf`` in WGS84, simplified, quantized and pruned to ``columns``."""
+    if gdf.crs is not None:
+        gdf = gdf.to_crs(BOUNDARY_CRS)
+    keep = [c for c in columns if c in gdf.columns]
+    geometries = quantize(simplify_coverage(gdf.geometry.values, tolerance), decimals)
+    simplified = gpd.GeoDataFrame(gdf[keep].reset_index(drop=True), geometry=geometries,
+                                  crs=BOUNDARY_CRS)
+    return simplified[~simplified.geometry.is_empty]
+
+
+def to_geojson(gdf):
+    """Compact GeoJSON text (no ids, bboxes or whitespace)."""
+    return gdf.to_json(drop_id=True, separators=(",", ":"))
+
+
+# =========================
+# Artifacts
+# =========================
+
+def prepare_boundaries(layers, out_dir=BOUNDARY_DIR, levels=BOUNDARY_LEVELS,
+                       source_paths=None, force=False):
+    """Write every level of every layer to ``out_dir`` and return the manifest.
+
+    ``layers`` maps a layer name ("Counties", "HSAs", "HRRs") to its
+    GeoDataFrame, or to a function returning it that is only called when the
+    layer is rebuilt. A layer is skipped when all its artifacts exist and are
+    newer than its file in ``source_paths`` (unless ``force``). The manifest
+    records each artifact's size next to the full-resolution GeoJSON size.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    for layer, gdf in layers.items():
+        paths = {zoom: boundary_path(layer, zoom, out_dir) for zoom in levels}
+        source = (source_paths or {}).get(layer)
+        source_mtime = os.path.getmtime(source) if source and os.path.exists(source) else 0
+        if not force and layer in manifest and all(
+                os.path.exists(p) and os.path.getmtime(p) >= source_mtime for p in paths.values()):
+            continue
+
+        if callable(gdf):
+            gdf = gdf()
+        full = gdf.to_crs(BOUNDARY_CRS) if gdf.crs is not None else gdf
+        entry = {"features": len(gdf), "full_bytes": len(to_geojson(full)), "levels": {}}
+        for zoom, (tolerance, decimals) in sorted(levels.items()):
+            text = to_geojson(simplify_layer(gdf, tolerance, decimals, BOUNDARY_COLUMNS.get(layer, ())))
+            with open(paths[zoom], "w") as f:
+                f.write(text)
+            entry["levels"][str(zoom)] = {"path": os.path.basename(paths[zoom]),
+                                          "tolerance": tolerance, "decimals": decimals,
+                                          "bytes": len(text)}
+        manifest[layer] = entry
+        sizes = ", ".join(f"{level['bytes']:,}" for level in entry["levels"].values())
+        logger.info(f"Boundaries for {layer}: {entry['full_bytes']:,} bytes -> {sizes}")
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build simplified boundary artifacts.")
+    parser.add_argument('--out-dir', default=BOUNDARY_DIR)
+    parser.add_argument('--force', action='store_true', help="Rebuild even if up to date.")
+    parser.add_argument('layers', nargs='+', metavar='LAYER=SHAPEFILE',
+                        help="e.g. HSAs=backend/data/hsa/01_hsa-shape-file.shp")
+    args = parser.parse_args()
+
+    sources = dict(spec.split("=", 1) for spec in args.layers)
+    manifest = prepare_boundaries({layer: gpd.read_file(path) for layer, path in sources.items()},
+                                  args.out_dir, source_paths=sources, force=args.force)
+    print(json.dumps(manifest, indent=2))
@@ -0,0 +1,140 @@
+import os
+import re
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# =========================
+# Rules
+# =========================
+
+# (label, patterns) in priority order: a name takes the label of the first
+# rule with a pattern found in it (case-insensitive substring)
+BUSINESS_TYPE_RULES = [
+    ("Autozone", ["Autozone"]),
+    ("Napa Auto", ["Napa Auto Parts"]),
+    ("Firestone", ["Firestone Complete Auto Care"]),
+    ("O'Reilly Auto", ["O'Reilly Auto Parts"]),
+    ("Advance Auto", ["Advance Auto Parts"]),
+    ("Car Dealership", ["Toyota", "Honda", "Kia", "Nissan", "Chevy", "Ford", "Carmax", "GMC"]),
+]
+DEFAULT_BUSINESS_TYPE = "Other Auto Repair Shops"
+# Optional label,pattern CSV replacing the rules above (e.g. a national brand list)
+BUSINESS_TYPE_RULES_PATH = os.getenv("HSA_BUSINESS_TYPE_RULES_PATH")
+
+
+def _trie_regex(words):
+    """One regex matching any of ``words``, factored into a prefix trie.
+
+    A flat ``a|b|c`` alternation retries every word at every position; the
+    trie shares common prefixes, so matching cost barely grows with the
+    number of words.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # end of a word
+
+    def emit(node):
+        ends = "" in node
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends:
+            # Optional continuation: prefer the longer word, fall back to the shorter
+            return "(?:" + body + ")?"
+        return body
+
+    return emit(trie)
+
+
+# =========================
+# Classifier
+# =========================
+
+class BusinessTypeClassifier:
+    """Labels business names with ordered rules in one pass.
+
+    All patterns are compiled into a single trie regex. Distinct names
+    (lower-cased) are first filtered with one vectorized Arrow match, then
+    each name that contains a pattern is scanned for every pattern
+    occurrence and takes the label of the highest-priority rule among them,
+    which is what testing the rules one after another would give. The cost
+    stays flat as rules are added. Results are a ``pandas.Categorical`` over
+    ``labels``.
+    """
+
+    def __init__(self, rules=BUSINESS_TYPE_RULES, default=DEFAULT_BUSINESS_TYPE):
+        self.rules = [(label, list(patterns)) for label, patterns in rules]
+        self.default = default
+        self.labels = list(dict.fromkeys([label for label, _ in self.rules] + [default]))
+        label_codes = {label: i for i, label in enumerate(self.labels)}
+        priorities = {}
+        for priority, (_, patterns) in enumerate(self.rules):
+            for pattern in patterns:
+                priorities.setdefault(pattern.lower(), priority)
+        # The regex reports the longest pattern starting at each position; any
+        # shorter pattern starting there is a prefix of it, so a pattern's
+        # priority is the best among itself and its pattern prefixes.
+        self._priorities = {
+            word: min(p for prefix, p in priorities.items() if word.startswith(prefix))
+            for word in priorities
+        }
+        self._label_of_priority = np.array(
+            [label_codes[label] for label, _ in self.rules] + [label_codes[default]])
+        self._pattern = _trie_regex(priorities) if priorities else None
+        self._search = re.compile(self._pattern).search if priorities else None
+
+    @classmethod
+    def from_csv(cls, path, default=DEFAULT_BUSINESS_TYPE):
+        """Rules from a ``label,pattern`` CSV, one pattern per row, in priority order."""
+        df = pd.read_csv(path, dtype=str).dropna()
+        rules = {}
+        for label, pattern in zip(df["label"], df["pattern"]):
+            rules.setdefault(label, []).append(pattern)
+        return cls(list(rules.items()), default)
+
+    @property
+    def fingerprint(self):
+        """Changes whenever the rules do; part of cache keys for classified data."""
+        payload = json.dumps([self.rules, self.default])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _best_priority(self, name):
+        # Restart one character past each match so overlapping patterns are seen
+        best = len(self.rules)
+        match = self._search(name)
+        while match is not None:
+            best = min(best, self._priorities[match.group()])
+            match = self._search(name, match.start() + 1)
+        return best
+
+    def classify(self, names):
+        """``pandas.Categorical`` of labels for ``names`` (missing -> default)."""
+        codes, uniques = pd.factorize(pd.Series(names, dtype="object").str.lower())
+        default_priority = len(self.rules)
+        priority = np.full(len(uniques), default_priority, dtype=np.int64)
+        if self._pattern is not None and len(uniques):
+            hits = pc.match_substring_regex(pa.array(uniques, pa.string()), self._pattern)
+            rows = np.flatnonzero(hits.to_numpy(zero_copy_only=False))
+            priority[rows] = np.fromiter(map(self._best_priority, uniques[rows]),
+                                         dtype=np.int64, count=len(rows))
+        label_codes = self._label_of_priority[priority]
+        # factorize marks missing names with -1; they fall to the default
+        label_codes = np.where(codes >= 0, label_codes[np.maximum(codes, 0)],
+                               self._label_of_priority[default_priority])
+        return pd.Categorical.from_codes(label_codes, categories=self.labels)
+
+
+def default_classifier():
+    """Classifier from ``BUSINESS_TYPE_RULES_PATH`` if set, else the built-in rules."""
+    if BUSINESS_TYPE_RULES_PATH:
+        return BusinessTypeClassifier.from_csv(BUSINESS_TYPE_RULES_PATH)
+    return BusinessTypeClassifier()
@@ -0,0 +1,173 @@
+import os
+import shutil
+import logging
+
+import duckdb
+
+from duckdb_pool import dataset_source
+from rollups import BASE_VIEW, ROLLUP_MEASURES
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Configuration
+# =========================
+
+# Dartmouth Atlas ZIP -> HSA -> HRR file (e.g. ZipHsaHrr18.csv)
+CROSSWALK_CSV_PATH = 'data/ZipHsaHrr.csv'
+CROSSWALK_PARQUET_PATH = 'data/processed/zip_hsa_hrr.parquet'
+CROSSWALK_TABLE = "zip_hsa_hrr"
+ZIP_COLUMN = "zip_cd_of_residence"  # crosswalk key, named as in hsa_data
+# Region level -> (id column, name columns) in the crosswalk
+REGION_LEVELS = {
+    "hsa": ("hsanum", ["hsacity", "hsastate"]),
+    "hrr": ("hrrnum", ["hrrcity", "hrrstate"]),
+}
+# Claims columns as 5-digit strings; a numeric zip column loses its leading zeros
+_CLAIMS_ZIP = f"lpad(CAST(h.{ZIP_COLUMN} AS VARCHAR), 5, '0')"
+
+
+def region_aggregate_table(level):
+    return f"{level}_aggregates"
+
+
+def region_aggregate_path(level, out_dir=os.path.dirname(CROSSWALK_PARQUET_PATH)):
+    return os.path.join(out_dir, f"{region_aggregate_table(level)}.parquet")
+
+
+def region_table_schemas():
+    """Columns of the crosswalk and aggregate tables, for the SQL prompt."""
+    schemas = {CROSSWALK_TABLE: [ZIP_COLUMN] + [c for id_column, names in REGION_LEVELS.values()
+                                                for c in [id_column, *names]]}
+    for level, (id_column, names) in REGION_LEVELS.items():
+        schemas[region_aggregate_table(level)] = [
+            id_column, *names, "zip_count", "provider_count", "row_count", *ROLLUP_MEASURES]
+    return schemas
+
+
+# =========================
+# Crosswalk
+# =========================
+
+def crosswalk_select(con, csv_path):
+    """SELECT normalizing a crosswalk CSV: one row per 5-digit ZIP.
+
+    The ZIP column is the first whose name starts with "zip" (Dartmouth
+    files call it ``zipcode18`` and the like); ids become integers.
+    """
+    escaped = str(csv_path).replace("'", "''")
+    source = f"read_csv('{escaped}', header = true, all_varchar = true)"
+    columns = {row[0].strip().lower(): row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()}
+    zips = [c for c in columns if c.startswith("zip")]
+    required = [id_column for id_column, _ in REGION_LEVELS.values()]
+    if not zips or any(c not in columns for c in required):
+        raise KeyError(f"{csv_path} needs a zip column and {required}; found {list(columns)}.")
+
+    def quoted(name):
+        return '"' + columns[name].replace('"', '""') + '"'
+
+    select = [f"lpad(regexp_extract({quoted(zips[0])}, '\\d+'), 5, '0') AS {ZIP_COLUMN}"]
+    for id_column, names in REGION_LEVELS.values():
+        select.append(f"TRY_CAST({quoted(id_column)} AS INTEGER) AS {id_column}")
+        select += [f"{quoted(n)} AS {n}" if n in columns else f"CAST(NULL AS VARCHAR) AS {n}"
+                   for n in names]
+    # A ZIP listed twice would double its claims in every join
+    return (f"SELECT {', '.join(select)} FROM {source} "
+            f"WHERE regexp_matches({quoted(zips[0])}, '\\d') "
+            f"QUALIFY row_number() OVER (PARTITION BY {ZIP_COLUMN} ORDER BY hsanum, hrrnum) = 1")
+
+
+def region_aggregates_select(con, level, source=BASE_VIEW, crosswalk=CROSSWALK_TABLE):
+    """SELECT of ``source``'s measures summed per region of ``level``.
+
+    Claims are matched to the crosswalk on their 5-digit ZIP; the row,
+    ZIP and provider counts let averages be derived from the sums.
+    """
+    id_column, names = REGION_LEVELS[level]
+    columns = {row[0] for row in con.execute(f"DESCRIBE {source}").fetchall()}
+    measures = ", ".join(f"sum(h.{m}) AS {m}" for m in ROLLUP_MEASURES if m in columns)
+    providers = ("count(DISTINCT h.medicare_prov_num)" if "medicare_prov_num" in columns
+                 else "CAST(NULL AS BIGINT)")
+    return (
+        f"SELECT x.{id_column}, {', '.join(f'any_value(x.{n}) AS {n}' for n in names)}, "
+        f"count(DISTINCT x.{ZIP_COLUMN}) AS zip_count, {providers} AS provider_count, "
+        f"count(*) AS row_count{', ' + measures if measures else ''} "
+        f"FROM {source} AS h JOIN {crosswalk} AS x ON {_CLAIMS_ZIP} = x.{ZIP_COLUMN} "
+        f"WHERE x.{id_column} IS NOT NULL "
+        f"GROUP BY x.{id_column} ORDER BY x.{id_column}"
+    )
+
+
+def unmatched_rows(con, source=BASE_VIEW, crosswalk=CROSSWALK_TABLE):
+    """Claims rows whose ZIP is not in the crosswalk."""
+    return con.execute(
+        f"SELECT count(*) FROM {source} AS h ANTI JOIN {crosswalk} AS x "
+        f"ON {_CLAIMS_ZIP} = x.{ZIP_COLUMN}"
+    ).fetchone()[0]
+
+
+# =========================
+# ETL
+# =========================
+
+def build_crosswalk(csv_path, dataset_path, crosswalk_path=CROSSWALK_PARQUET_PATH,
+                    out_dir=None, memory_limit=None):
+    """Write the crosswalk and the per-HSA and per-HRR aggregates as Parquet.
+
+    ``dataset_path`` is the cleaned claims Parquet file (or hive dataset)
+    the aggregates are computed from. Returns the written paths.
+    """
+    out_dir = out_dir or os.path.dirname(crosswalk_path) or '.'
+    os.makedirs(out_dir, exist_ok=True)
+    temp_directory = f"{crosswalk_path}.tmp"
+    config = {'temp_directory': temp_directory}
+    if memory_limit:
+        config['memory_limit'] = memory_limit
+    con = duckdb.connect(config=config)
+    try:
+        con.execute(f"CREATE TABLE {CROSSWALK_TABLE} AS {crosswalk_select(con, csv_path)} "
+                    f"ORDER BY {ZIP_COLUMN}")
+        con.execute(f"CREATE VIEW {BASE_VIEW} AS SELECT * FROM {dataset_source(str(dataset_path))}")
+        written = [crosswalk_path]
+        con.execute(f"COPY {CROSSWALK_TABLE} TO '{crosswalk_path}' (FORMAT parquet)")
+        for level in REGION_LEVELS:
+            path = region_aggregate_path(level, out_dir)
+            con.execute(f"COPY ({region_aggregates_select(con, level)}) TO '{path}' (FORMAT parquet)")
+            written.append(path)
+        zips = con.execute(f"SELECT count(*) FROM {CROSSWALK_TABLE}").fetchone()[0]
+        print(f"Crosswalk of {zips} ZIP codes saved at {crosswalk_path}; "
+              f"{unmatched_rows(con)} claims rows have a ZIP outside it.")
+        print(f"Per-region aggregates saved at {written[1:]}.")
+        return written
+    finally:
+        con.close()
+        shutil.rmtree(temp_directory, ignore_errors=True)
+
+
+# =========================
+# DuckDB Tables
+# =========================
+
+def register_crosswalk(con, crosswalk_path, source=BASE_VIEW):
+    """(Re)create the crosswalk and per-region aggregate tables on ``con``.
+
+    Meant as a connection refresh hook next to ``build_rollups``: the
+    aggregates are rebuilt from ``source`` whenever the dataset changes and
+    each table is indexed on its key, so HSA- and HRR-level questions are
+    lookups rather than joins over the claims. Does nothing (and returns
+    ``[]``) when ``crosswalk_path`` is missing.
+    """
+    if not os.path.exists(crosswalk_path):
+        logger.warning(f"{crosswalk_path} not found; HSA/HRR tables are not available.")
+        return []
+    escaped = str(crosswalk_path).replace("'", "''")
+    con.execute(f"CREATE OR REPLACE TABLE {CROSSWALK_TABLE} AS SELECT * FROM '{escaped}'")
+    con.execute(f"CREATE UNIQUE INDEX {CROSSWALK_TABLE}_{ZIP_COLUMN} ON {CROSSWALK_TABLE} ({ZIP_COLUMN})")
+    tables = [CROSSWALK_TABLE]
+    for level, (id_column, _) in REGION_LEVELS.items():
+        table = region_aggregate_table(level)
+        con.execute(f"CREATE OR REPLACE TABLE {table} AS {region_aggregates_select(con, level, source)}")
+        con.execute(f"CREATE UNIQUE INDEX {table}_{id_column} ON {table} ({id_column})")
+        tables.append(table)
+    logger.info(f"Built region tables {tables}")
+    return tables
@@ -0,0 +1,264 @@
+import os
+import json
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from datasette.app import Datasette
+from datasette.inspect import inspect_hash
+from pathlib import Path
+
+# =========================
+# Configuration
+# =========================
+
+DATASETTE_SETTINGS = {"sql_time_limit_ms": 10000}
+CACHE_MAX_AGE = int(os.getenv("HSA_DATASETTE_MAX_AGE", "3600"))
+CACHE_MAX_BYTES = int(os.getenv("HSA_DATASETTE_CACHE_BYTES", str(64 * 1024 * 1024)))
+INSPECT_SUFFIX = ".inspect.json"
+
+# Pages requested by nearly every visitor; ``{db}`` is the database name
+PREWARM_PATHS = [
+    "/",
+    "/{db}",
+    "/{db}/hsa_data",
+    "/{db}/hsa_data.json",
+]
+
+
+# =========================
+# Immutable Database
+# =========================
+
+def inspect_database(db_path):
+    """Return Datasette ``inspect_data`` (content hash and table counts).
+
+    The result is cached in a ``<db>.inspect.json`` sidecar keyed on the file's
+    size and mtime, so a cold start only hashes and counts a new database once.
+    """
+    path = Path(db_path)
+    stat = path.stat()
+    sidecar = path.with_name(path.name + INSPECT_SUFFIX)
+    if sidecar.exists():
+        cached = json.loads(sidecar.read_text())
+        if cached.get("size") == stat.st_size and cached.get("mtime_ns") == stat.st_mtime_ns:
+            return cached["inspect_data"]
+
+    uri = f"file:{path}?mode=ro&immutable=1"
+    with sqlite3.connect(uri, uri=True) as conn:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        counts = {t: conn.execute(f'SELECT count(*) FROM "{t}"').fetchone()[0] for t in tables}
+    inspect_data = {
+        path.stem: {
+            "hash": inspect_hash(path),
+            "size": stat.st_size,
+            "file": str(path),
+            "tables": {t: {"count": n} for t, n in counts.items()},
+        }
+    }
+    try:
+        sidecar.write_text(json.dumps({
+            "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "inspect_data": inspect_data,
+        }))
+    except OSError:
+        pass  # read-only volume: recompute next time
+    return inspect_data
+
+
+def build_datasette(db_path, settings=None):
+    """Datasette serving ``db_path`` as an immutable database.
+
+    Immutable databases are opened read-only without locking, and the
+    precomputed ``inspect_data`` supplies table counts up front.
+    """
+    return Datasette(
+        immutables=[str(db_path)],
+        inspect_data=inspect_database(db_path),
+        settings=settings or DATASETTE_SETTINGS,
+    )
+
+
+# =========================
+# HTTP Response Cache
+# =========================
+
+class ResponseCache:
+    """ASGI middleware caching GET responses of an immutable Datasette.
+
+    Because the database cannot change, a URL always renders the same bytes:
+    responses are kept in an LRU bounded by ``max_bytes`` and tagged with an
+    ETag derived from the database content hash and the URL, so a new
+    database build invalidates every ETag. ``If-None-Match`` is answered with
+    ``304 Not Modified`` and responses carry ``Cache-Control: public``.
+    A response larger than ``max_bytes`` is streamed through uncached.
+
+    ``on_startup(cache)`` runs once on the serving event loop, at ASGI
+    lifespan startup or, if the server sends no lifespan events, before the
+    first request is handled.
+    """
+
+    def __init__(self, app, content_hash, max_age=CACHE_MAX_AGE, max_bytes=CACHE_MAX_BYTES,
+                 on_startup=None):
+        self.app = app
+        self.on_startup = on_startup
+        self._started = None
+        self.content_hash = content_hash
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def etag(self, key):
+        digest = hashlib.sha256(f"{self.content_hash}:{key}".encode()).hexdigest()
+        return f'"{digest[:32]}"'
+
+    def _cache_headers(self, etag):
+        return [
+            (b"etag", etag.encode()),
+            (b"cache-control", f"public, max-age={self.max_age}".encode()),
+        ]
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry):
+        size = len(entry[2])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous[2])
+            self._entries[key] = entry
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted[2])
+
+    async def startup(self):
+        """Run ``on_startup`` (once, however many callers await it)."""
+        if self._started is None:
+            self._started = asyncio.ensure_future(
+                self.on_startup(self) if self.on_startup else asyncio.sleep(0))
+        await self._started
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        await self.startup()
+        await self._serve(scope, receive, send)
+
+    async def _serve(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        key = scope["path"] + "?" + scope.get("query_string", b"").decode("latin-1")
+        etag = self.etag(key)
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"if-none-match", b"").decode("latin-1") == etag:
+            await send({"type": "http.response.start", "status": 304,
+                        "headers": self._cache_headers(etag)})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        entry = self._get(key)
+        if entry is not None:
+            self.hits += 1
+            status, response_headers, body = entry
+            await send({"type": "http.response.start", "status": status,
+                        "headers": response_headers})
+            await send({"type": "http.response.body",
+                        "body": b"" if scope["method"] == "HEAD" else body})
+            return
+
+        self.misses += 1
+        captured = {"status": None, "headers": None, "body": [], "size": 0}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                if message["status"] == 200:
+                    response_headers = [
+                        (k, v) for k, v in message.get("headers", [])
+                        if k.lower() not in (b"etag", b"cache-control")
+                    ] + self._cache_headers(etag)
+                    message = dict(message, headers=response_headers)
+                captured["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body" and captured["body"] is not None:
+                chunk = message.get("body", b"")
+                captured["size"] += len(chunk)
+                if captured["size"] > self.max_bytes:
+                    captured["body"] = None  # too large to cache; stop copying
+                else:
+                    captured["body"].append(chunk)
+            await send(message)
+
+        await self.app(scope, receive, capture)
+        if captured["status"] == 200 and scope["method"] == "GET" and captured["body"] is not None:
+            self._put(key, (200, captured["headers"], b"".join(captured["body"])))
+
+    async def prewarm(self, paths):
+        """Render ``paths`` once so their first real request is a cache hit."""
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def discard(message):
+            pass
+
+        for path in paths:
+            path, _, query = path.partition("?")
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+                "method": "GET", "scheme": "http", "path": path,
+                "raw_path": path.encode(), "query_string": query.encode(),
+                "root_path": "", "headers": [(b"host", b"localhost")],
+                "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+            }
+            await self._serve(scope, receive, discard)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self._entries), "bytes": self.current_bytes}
+
+
+def create_app(db_path, prewarm_paths=PREWARM_PATHS, settings=None):
+    """Build the cached, immutable Datasette ASGI app for ``db_path``.
+
+    Nothing is awaited here; Datasette's startup hooks and the prewarm run
+    from the app's startup on the event loop that serves it.
+    """
+    ds = build_datasette(db_path, settings)
+    name = Path(db_path).stem
+    paths = [p.format(db=name) for p in prewarm_paths or []]
+
+    async def startup(app):
+        await ds.invoke_startup()
+        await app.prewarm(paths)
+
+    return ResponseCache(ds.app(), content_hash=ds.inspect_data[name]["hash"],
+                         on_startup=startup)
@@ -3,6 +3,9 @@ import sqlite3
 import asyncio
 import modal
 
+# Imported at module level so Modal mounts it alongside this file
+from datasette_serving import create_app
+
 # Define the Modal App
 app = modal.App("hsas-datasette")
 
@@ -16,6 +19,11 @@ datasette_image = (
 VOLUME_DIR = "/cache-vol"
 DB_PATH = f"{VOLUME_DIR}/backend/databases/hsas.db"
 
+# "immutable" (default) serves the read-only production database with
+# precomputed counts, an ETag/Cache-Control response cache and pre-warmed
+# pages; "mutable" keeps the previous behavior for development.
+SERVING_MODE = os.getenv("HSA_DATASETTE_MODE", "immutable")
+
 # Mount the volume for database access
 volume = modal.Volume.from_name("hsas-datasette-cache-vol")
 
@@ -43,7 +51,13 @@ def initialize_database(db_path):
 @modal.asgi_app()
 def ui():
     from datasette.app import Datasette
-    
+
+    if SERVING_MODE == "immutable":
+        if not os.path.exists(DB_PATH):
+            raise FileNotFoundError(f"Database file {DB_PATH} not found. Build it with load_hsa_data.py.")
+        # Startup and prewarm run at ASGI lifespan startup on the serving loop
+        return create_app(DB_PATH)
+
     # Ensure the database is initialized or fallback to in-memory if not
     initialize_database(DB_PATH)
 
@@ -0,0 +1,249 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import duckdb
+
+from query_guard import QUERY_MAX_MEMORY_MB
+
+# =========================
+# Configuration
+# =========================
+
+DUCKDB_POOL_SIZE = int(os.getenv("HSA_DUCKDB_POOL_SIZE", "4"))
+DUCKDB_THREADS = os.getenv("HSA_DUCKDB_THREADS")  # None lets DuckDB pick
+# e.g. "2GB"; by default every pooled cursor gets HSA_QUERY_MAX_MEMORY_MB
+DUCKDB_MEMORY_LIMIT = os.getenv("HSA_DUCKDB_MEMORY_LIMIT")
+# refresh() looks at the files on disk at most this often (a partitioned
+# dataset is walked to fingerprint it)
+REFRESH_INTERVAL_S = float(os.getenv("HSA_REFRESH_INTERVAL_S", "2"))
+# How long detached_cursor() waits for a cursor held by an open result
+CURSOR_WAIT_S = float(os.getenv("HSA_CURSOR_WAIT_S", "5"))
+VIEW_NAME = "hsa_data"
+
+
+def dataset_fingerprint(path):
+    """Return ``(path, mtime_ns, size)`` for ``path`` or ``None`` if missing.
+
+    For a partitioned dataset directory the newest mtime, the total size and
+    the number of parquet files are combined instead.
+    """
+    if os.path.isdir(path):
+        mtime, size, count = 0, 0, 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                if not name.endswith(".parquet"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                mtime = max(mtime, stat.st_mtime_ns)
+                size += stat.st_size
+                count += 1
+        if not count:
+            return None
+        return (os.path.abspath(path), mtime, size, count)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def dataset_source(path):
+    """SQL table expression reading ``path``: one file or a hive dataset."""
+    escaped = path.replace("'", "''")
+    if os.path.isdir(path):
+        # Keep partition values as VARCHAR: "037" must not become 37
+        return (
+            f"read_parquet('{escaped}/**/*.parquet', hive_partitioning = true,"
+            f" hive_types_autocast = false)"
+        )
+    return f"'{escaped}'"
+
+
+def check_single_select(con, sql_query):
+    """Raise ``ValueError`` unless ``sql_query`` is exactly one SELECT."""
+    statements = con.extract_statements(sql_query)
+    if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+        kinds = [s.type.name for s in statements]
+        raise ValueError(f"Only a single SELECT statement can be run; got {kinds}.")
+
+
+# =========================
+# Connection Manager
+# =========================
+
+class DuckDBConnectionManager:
+    """Process-wide DuckDB database serving pooled cursors over ``hsa_data``.
+
+    A single in-memory database is opened once and the ``hsa_data`` view is
+    registered on it, so DuckDB keeps its parquet metadata and buffer caches
+    between queries. Each query, including one whose result is left open
+    for paging, checks out one of ``pool_size`` cursors; the view is recreated when the parquet file (or an ``add_source`` file)
+    changes on disk, after which the registered refresh hooks (e.g. rollup
+    builders) run on the connection.
+
+    Once the view and hooks are first built, external access is disabled
+    except for the dataset and the ``add_source`` files, and the
+    configuration is locked so queries cannot turn it back on.
+    """
+
+    def __init__(self, dataset_path, pool_size=DUCKDB_POOL_SIZE,
+                 threads=DUCKDB_THREADS, memory_limit=DUCKDB_MEMORY_LIMIT,
+                 refresh_interval_s=REFRESH_INTERVAL_S):
+        self.dataset_path = dataset_path
+        self.refresh_interval_s = refresh_interval_s
+        self.pool_size = max(1, int(pool_size))
+        self.threads = threads
+        self.memory_limit = memory_limit
+        self._lock = threading.Lock()
+        self._con = None
+        self._pool = None
+        self._fingerprint = None
+        self._next_check = 0.0
+        self._refresh_hooks = []
+        self._sources = []
+        self._locked = False
+
+    def add_refresh_hook(self, hook):
+        """Call ``hook(connection)`` every time the view is (re)registered."""
+        with self._lock:
+            self._refresh_hooks.append(hook)
+            if self._fingerprint is not None:
+                hook(self._con)
+
+    def add_source(self, path):
+        """Register a file (or directory) the refresh hooks read.
+
+        It stays readable once access is locked down, and a change to it
+        reruns the hooks just like a change to the dataset.
+        """
+        with self._lock:
+            if self._locked:
+                raise RuntimeError("add_source() must be called before the first refresh.")
+            self._sources.append(path)
+
+    def _open(self):
+        config = {}
+        if self.threads:
+            config["threads"] = int(self.threads)
+        # Set before the configuration is locked, so queries cannot raise it
+        config["memory_limit"] = str(
+            self.memory_limit or f"{self.pool_size * QUERY_MAX_MEMORY_MB}MiB")
+        self._con = duckdb.connect(database=":memory:", config=config)
+        self._pool = queue.Queue(maxsize=self.pool_size)
+        for _ in range(self.pool_size):
+            cur = self._con.cursor()
+            # Profiles are read back by QueryProfile; PRAGMAs are locked later
+            cur.execute("PRAGMA enable_profiling = 'no_output'")
+            self._pool.put(cur)
+
+    def _register_view(self, fingerprint):
+        self._con.execute(
+            f"CREATE OR REPLACE VIEW {VIEW_NAME} AS "
+            f"SELECT * FROM {dataset_source(self.dataset_path)}"
+        )
+        for hook in self._refresh_hooks:
+            hook(self._con)
+        self._fingerprint = fingerprint
+
+    def _lock_down(self):
+        paths = [os.path.abspath(p).replace("'", "''")
+                 for p in [self.dataset_path, *self._sources]]
+        files = ", ".join(f"'{p}'" for p in paths)
+        directories = ", ".join(f"'{os.path.join(p, '')}'" for p in paths)
+        self._con.execute(f"SET allowed_paths = [{files}]")
+        self._con.execute(f"SET allowed_directories = [{directories}]")
+        self._con.execute("SET enable_external_access = false")
+        self._con.execute("SET lock_configuration = true")
+        self._locked = True
+
+    def _current_fingerprint(self):
+        fingerprint = dataset_fingerprint(self.dataset_path)
+        if fingerprint is None or not self._sources:
+            return fingerprint
+        return (fingerprint, *(dataset_fingerprint(p) for p in self._sources))
+
+    def refresh(self, force=False):
+        """Open the database and (re)create the view if a file changed.
+
+        The files are looked at no more than once per ``refresh_interval_s``
+        unless ``force`` is set. Returns the fingerprint of the dataset
+        (combined with those of the ``add_source`` files, if any), or
+        ``None`` if the dataset is missing.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._con is not None and not force and now < self._next_check:
+                return self._fingerprint
+            fingerprint = self._current_fingerprint()
+            if self._con is None:
+                self._open()
+            if force or fingerprint != self._fingerprint:
+                self._register_view(fingerprint)
+            if not self._locked:
+                self._lock_down()
+            self._next_check = now + self.refresh_interval_s
+        return fingerprint
+
+    @property
+    def fingerprint(self):
+        return self._fingerprint
+
+    @contextmanager
+    def cursor(self):
+        """Borrow a pooled cursor for the ``with`` block, waiting while all are in use."""
+        cur = self.detached_cursor(timeout=None)
+        try:
+            yield cur
+        finally:
+            self.release(cur)
+
+    def detached_cursor(self, timeout=CURSOR_WAIT_S):
+        """Check out a pooled cursor, e.g. for a result left open across requests.
+
+        Raises ``TimeoutError`` if none is returned within ``timeout``
+        seconds (``0``: do not wait, ``None``: wait indefinitely); the caller
+        must hand the cursor back with ``release``.
+        """
+        self.refresh()
+        try:
+            if timeout == 0:
+                return self._pool.get_nowait()
+            return self._pool.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"All {self.pool_size} cursors are held by open results."
+            ) from None
+
+    def release(self, cur):
+        """Return a cursor from ``detached_cursor`` to the pool."""
+        self._pool.put(cur)
+
+    def close(self):
+        with self._lock:
+            if self._con is None:
+                return
+            while not self._pool.empty():
+                self._pool.get_nowait().close()
+            self._con.close()
+            self._con = None
+            self._pool = None
+            self._fingerprint = None
+            self._next_check = 0.0
+            self._locked = False
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(dataset_path):
+    """Return the shared manager for ``dataset_path``, creating it once."""
+    with _managers_lock:
+        manager = _managers.get(dataset_path)
+        if manager is None:
+            manager = DuckDBConnectionManager(dataset_path)
+            _managers[dataset_path] = manager
+        return manager
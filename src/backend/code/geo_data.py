@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import logging
+import functools
+import threading
+
+import pandas as pd
+import geopandas as gpd
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Configuration
+# =========================
+
+GEO_CACHE_DIR = os.getenv("HSA_GEO_CACHE_DIR", "backend/data/cache")
+# Files a shapefile is read with; a change to any of them changes the data
+SHAPEFILE_SIDECARS = [".dbf", ".shx", ".prj", ".cpg"]
+
+
+def lazy(fn):
+    """Compute ``fn(*args)`` on first use and reuse the result (thread safe)."""
+    results = {}
+    lock = threading.Lock()
+
+    @functools.wraps(fn)
+    def wrapper(*args):
+        if args not in results:
+            with lock:
+                if args not in results:
+                    start = time.perf_counter()
+                    results[args] = fn(*args)
+                    logger.info(f"Loaded {fn.__name__}{args if args else ''} "
+                                f"in {time.perf_counter() - start:.2f}s")
+        return results[args]
+
+    wrapper.cache_clear = results.clear
+    return wrapper
+
+
+# =========================
+# Binary Frame Cache
+# =========================
+
+def source_signature(sources, version=""):
+    """Size and mtime of every file in ``sources`` (shapefile sidecars too)."""
+    files = []
+    for path in sources:
+        files.append(path)
+        stem, ext = os.path.splitext(path)
+        if ext.lower() == ".shp":
+            files += [stem + s for s in SHAPEFILE_SIDECARS if os.path.exists(stem + s)]
+    signature = {"version": version, "files": {}}
+    for path in files:
+        stat = os.stat(path)
+        signature["files"][path] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def cached_frame(name, sources, load, version="", cache_dir=GEO_CACHE_DIR):
+    """Return ``load()`` through a Parquet copy in ``cache_dir``.
+
+    The copy (GeoParquet for a GeoDataFrame) is reused while ``sources`` and
+    ``version`` are unchanged, so filtering and derived columns computed by
+    ``load`` are paid for once. If the sources are missing but a copy exists
+    the copy is used, so a deployment can ship the cache alone.
+    """
+    path = os.path.join(cache_dir, f"{name}.parquet")
+    meta_path = os.path.join(cache_dir, f"{name}.json")
+    missing = [p for p in sources if not os.path.exists(p)]
+    signature = None if missing else source_signature(sources, version)
+
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if missing or meta["signature"] == signature:
+            if missing:
+                logger.warning(f"{missing[0]} not found; using cached {name} from {path}")
+            return gpd.read_parquet(path) if meta["geo"] else pd.read_parquet(path)
+    if missing:
+        raise FileNotFoundError(f"{missing[0]} not found and no cached {name} in {cache_dir}. "
+                                f"Please ensure the file exists.")
+
+    frame = load()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        frame.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        with open(meta_path, "w") as f:
+            json.dump({"signature": signature,
+                       "geo": isinstance(frame, gpd.GeoDataFrame)}, f)
+    except OSError as e:
+        logger.warning(f"Could not cache {name} in {cache_dir}: {e}")
+    return frame
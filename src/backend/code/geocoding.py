@@ -0,0 +1,310 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Configuration
+# =========================
+
+GEOCODE_CACHE_PATH = os.getenv("HSA_GEOCODE_CACHE_PATH", "geocode_cache.db")
+ZIP_CENTROIDS_PATH = os.getenv("HSA_ZIP_CENTROIDS_PATH", "backend/data/zip_centroids.csv")
+GEOCODE_USER_AGENT = os.getenv("HSA_GEOCODE_USER_AGENT", "tn_auto_shops_app")
+GEOCODE_MIN_DELAY_S = float(os.getenv("HSA_GEOCODE_MIN_DELAY_S", "1"))  # Nominatim policy
+GEOCODE_TIMEOUT_S = float(os.getenv("HSA_GEOCODE_TIMEOUT_S", "5"))
+# Provider time a batch may spend before the remaining misses use ZIP centroids
+GEOCODE_BATCH_BUDGET_S = float(os.getenv("HSA_GEOCODE_BATCH_BUDGET_S", "30"))
+# After a provider error, skip it for this long instead of failing every lookup
+GEOCODE_RETRY_AFTER_S = float(os.getenv("HSA_GEOCODE_RETRY_AFTER_S", "60"))
+# "Not found" answers are remembered for a day; found addresses never expire
+GEOCODE_NEGATIVE_TTL_S = float(os.getenv("HSA_GEOCODE_NEGATIVE_TTL_S", str(24 * 3600)))
+
+_ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "road": "rd", "boulevard": "blvd", "drive": "dr",
+    "lane": "ln", "court": "ct", "place": "pl", "parkway": "pkwy", "highway": "hwy",
+    "north": "n", "south": "s", "east": "e", "west": "w", "suite": "ste",
+    "tennessee": "tn",
+}
+_ZIP_RE = re.compile(r"\b(\d{5})(?:-\d{4})?\b")
+_ZIP_COLUMNS = ["zip", "zip_code", "zipcode", "zcta", "zcta5", "postal_code", "zip_cd_of_residence"]
+_LAT_COLUMNS = ["latitude", "lat", "intptlat", "y"]
+_LON_COLUMNS = ["longitude", "lon", "lng", "intptlong", "x"]
+
+
+def normalize_address(address):
+    """Cache key form: lower-case, punctuation-free, common abbreviations."""
+    text = re.sub(r"[.,#;]", " ", str(address).lower())
+    words = [_ABBREVIATIONS.get(w, w) for w in text.split()]
+    return " ".join(words)
+
+
+def normalize_zip(values):
+    """5-digit ZIP strings: "37203-1234" -> "37203", 7010 -> "07010"."""
+    zips = pd.Series(values, dtype="object").astype(str).str.extract(r"^\s*(\d{1,5})", expand=False)
+    return zips.str.zfill(5)
+
+
+def extract_zip(address):
+    matches = _ZIP_RE.findall(str(address))
+    return matches[-1] if matches else None
+
+
+class Location:
+    """A geocoded point and where it came from ("cache", "provider", "zip_centroid")."""
+
+    def __init__(self, latitude, longitude, source, address=None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.source = source
+        self.address = address
+
+    @property
+    def approximate(self):
+        return self.source == "zip_centroid"
+
+
+# =========================
+# ZIP Centroids
+# =========================
+
+class ZipCentroids:
+    """Offline ZIP code -> (latitude, longitude) table."""
+
+    def __init__(self, table):
+        table = table.dropna(subset=["latitude", "longitude"])
+        table = table.assign(zip=normalize_zip(table["zip"]).to_numpy()).dropna(subset=["zip"])
+        self.table = table.drop_duplicates("zip").set_index("zip")[["latitude", "longitude"]]
+
+    @classmethod
+    def from_csv(cls, path):
+        """Read a centroid file (e.g. Census ZCTA gazetteer), guessing its columns."""
+        df = pd.read_csv(path, sep=None, engine="python", dtype=str)
+        columns = {c.strip().lower(): c for c in df.columns}
+
+        def pick(candidates, what):
+            for name in candidates:
+                if name in columns:
+                    return columns[name]
+            raise KeyError(f"No {what} column in {path}; expected one of {candidates}.")
+
+        return cls(pd.DataFrame({
+            "zip": df[pick(_ZIP_COLUMNS, "ZIP")],
+            "latitude": pd.to_numeric(df[pick(_LAT_COLUMNS, "latitude")], errors="coerce"),
+            "longitude": pd.to_numeric(df[pick(_LON_COLUMNS, "longitude")], errors="coerce"),
+        }))
+
+    @classmethod
+    def from_points(cls, df, zip_column, lat_column, lon_column):
+        """Centroids as the mean location of ``df``'s points in each ZIP."""
+        points = pd.DataFrame({
+            "zip": normalize_zip(df[zip_column]).to_numpy(),
+            "latitude": pd.to_numeric(df[lat_column], errors="coerce").to_numpy(),
+            "longitude": pd.to_numeric(df[lon_column], errors="coerce").to_numpy(),
+        })
+        return cls(points.groupby("zip", as_index=False)[["latitude", "longitude"]].mean())
+
+    def combine(self, other):
+        """Centroids from ``self``, with ``other`` filling the ZIPs it lacks."""
+        merged = self.table.combine_first(other.table).reset_index(names="zip")
+        return ZipCentroids(merged)
+
+    def __len__(self):
+        return len(self.table)
+
+    def lookup(self, zip_code):
+        if zip_code is None:
+            return None
+        key = normalize_zip([zip_code]).iloc[0]
+        if key not in self.table.index:
+            return None
+        row = self.table.loc[key]
+        return float(row["latitude"]), float(row["longitude"])
+
+    def lookup_many(self, zips):
+        """``(latitudes, longitudes)`` arrays, NaN where a ZIP is unknown."""
+        found = self.table.reindex(normalize_zip(zips))
+        return found["latitude"].to_numpy(), found["longitude"].to_numpy()
+
+    def missing(self, zips):
+        """Sorted distinct ZIPs in ``zips`` with no centroid."""
+        keys = normalize_zip(zips).dropna().unique()
+        return sorted(set(keys) - set(self.table.index))
+
+    def log_coverage(self, zips, label):
+        """Warn about the ZIPs in ``zips`` (named ``label``) with no centroid."""
+        missing = self.missing(zips)
+        if missing:
+            total = normalize_zip(zips).dropna().nunique()
+            logger.warning(f"{len(missing)} of {total} {label} ZIPs have no centroid and "
+                           f"cannot be placed on the map, e.g. {missing[:10]}")
+        return missing
+
+
+# =========================
+# Providers
+# =========================
+
+class NominatimProvider:
+    """OpenStreetMap Nominatim; a provider is any ``callable(address)``
+    returning ``(latitude, longitude)``, or ``None`` when not found, and
+    raising when the service fails."""
+
+    name = "nominatim"
+
+    def __init__(self, user_agent=GEOCODE_USER_AGENT, timeout=GEOCODE_TIMEOUT_S):
+        from geopy.geocoders import Nominatim
+
+        self._geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def __call__(self, address):
+        location = self._geolocator.geocode(address)
+        return None if location is None else (location.latitude, location.longitude)
+
+
+# =========================
+# Geocoder
+# =========================
+
+class Geocoder:
+    """Cached, batched geocoding with an offline ZIP-centroid fallback.
+
+    Answers are stored in SQLite keyed on ``normalize_address``, so each
+    distinct address reaches the provider once (and an address the provider
+    could not find is retried after ``negative_ttl``). ``geocode_batch``
+    serves every cache hit at once and sends only the misses to the
+    provider, at most one call per ``min_delay_s``. A bare ZIP, an address
+    the provider cannot find, and every miss once the provider has failed
+    or the batch has spent ``budget_s`` fall back to ``zip_centroids``.
+    Fallback answers are not cached, so the provider is tried again later.
+    """
+
+    def __init__(self, provider, path=GEOCODE_CACHE_PATH, zip_centroids=None,
+                 min_delay_s=GEOCODE_MIN_DELAY_S, budget_s=GEOCODE_BATCH_BUDGET_S,
+                 retry_after_s=GEOCODE_RETRY_AFTER_S, negative_ttl=GEOCODE_NEGATIVE_TTL_S):
+        self.provider = provider
+        self.provider_name = getattr(provider, "name", type(provider).__name__)
+        self.zip_centroids = zip_centroids
+        self.min_delay_s = min_delay_s
+        self.budget_s = budget_s
+        self.retry_after_s = retry_after_s
+        self.negative_ttl = negative_ttl
+        self.counts = {"cache": 0, "provider": 0, "zip_centroid": 0, "not_found": 0}
+        self._last_call = 0.0
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self._provider_lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocodes ("
+            " key TEXT PRIMARY KEY,"
+            " address TEXT NOT NULL,"
+            " latitude REAL,"
+            " longitude REAL,"
+            " provider TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _cached(self, keys):
+        """Cached answers for ``keys``: ``(lat, lon)`` or ``None`` (not found)."""
+        found = {}
+        expired = time.time() - self.negative_ttl
+        keys = list(keys)
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT key, latitude, longitude, created_at FROM geocodes"
+                    f" WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, lat, lon, created_at in rows:
+                    if lat is not None:
+                        found[key] = (lat, lon)
+                    elif created_at >= expired:
+                        found[key] = None
+        return found
+
+    def _store(self, key, address, point):
+        lat, lon = point if point else (None, None)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocodes"
+                " (key, address, latitude, longitude, provider, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, address, lat, lon, self.provider_name, time.time()),
+            )
+            self._conn.commit()
+
+    def _call_provider(self, address):
+        # One call at a time, ``min_delay_s`` apart, across all threads
+        with self._provider_lock:
+            wait = self._last_call + self.min_delay_s - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return self.provider(address)
+            finally:
+                self._last_call = time.monotonic()
+
+    def _fallback(self, address):
+        point = self.zip_centroids.lookup(extract_zip(address)) if self.zip_centroids else None
+        return Location(*point, "zip_centroid", address) if point else None
+
+    def geocode_batch(self, addresses, budget_s=None):
+        """``Location`` (or ``None``) for each address, in input order."""
+        budget_s = self.budget_s if budget_s is None else budget_s
+        keys = [normalize_address(a) for a in addresses]
+        first = {}
+        for key, address in zip(keys, addresses):
+            first.setdefault(key, address)
+
+        cached = self._cached(first)
+        answers = {key: Location(*point, "cache", first[key]) if point else self._fallback(first[key])
+                   for key, point in cached.items()}
+        deadline = time.monotonic() + budget_s
+        for key, address in first.items():
+            if key in answers:
+                continue
+            if extract_zip(address) == address.strip():
+                # A bare ZIP is answered by its centroid when there is one
+                answers[key] = self._fallback(address)
+                if answers[key] is not None:
+                    continue
+            now = time.monotonic()
+            if now < self._down_until or now >= deadline:
+                answers[key] = self._fallback(address)
+                continue
+            try:
+                point = self._call_provider(address)
+            except Exception as e:
+                logger.warning(f"Geocoding provider failed, using ZIP centroids for "
+                               f"{self.retry_after_s:.0f}s: {type(e).__name__}: {e}")
+                self._down_until = time.monotonic() + self.retry_after_s
+                answers[key] = self._fallback(address)
+                continue
+            self._store(key, address, point)
+            answers[key] = Location(*point, "provider", address) if point else self._fallback(address)
+
+        results = [answers[key] for key in keys]
+        for location in results:
+            self.counts[location.source if location else "not_found"] += 1
+        return results
+
+    def geocode(self, address):
+        return self.geocode_batch([address])[0]
+
+    def stats(self):
+        return dict(self.counts)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
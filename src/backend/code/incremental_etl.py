@@ -0,0 +1,209 @@
+import os
+import re
+import json
+import glob
+import shutil
+import sqlite3
+import hashlib
+import argparse
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from crosswalk import CROSSWALK_CSV_PATH, CROSSWALK_PARQUET_PATH, build_crosswalk
+from load_hsa_data import (
+    DB_FILE_PATH,
+    ETL_CHUNK_SIZE,
+    ETL_MEMORY_LIMIT,
+    TABLE_NAME,
+    stage_clean_csv,
+    write_optimized_parquet,
+)
+from sqlite_writer import SQLITE_INDEX_COLUMNS, SQLiteBulkWriter
+
+INPUT_GLOB = 'data/Hospital_Service_Area_*.csv'
+INCREMENTAL_PARQUET_PATH = 'data/processed/hsas_incremental'
+MANIFEST_FILE_NAME = 'manifest.json'
+SOURCE_COLUMN = 'source'
+
+# Bump when the cleaning rules change so every input is rebuilt once
+ETL_VERSION = 2
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Content hash of ``path``, read in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_id(path):
+    """Partition key for an input file, e.g. ``Hospital_Service_Area_2022``."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', stem)
+
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {'version': ETL_VERSION, 'inputs': {}}
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != ETL_VERSION:
+        print(f"ETL version changed ({manifest.get('version')} -> {ETL_VERSION}); rebuilding all inputs.")
+        return {'version': ETL_VERSION, 'inputs': {}}
+    return manifest
+
+
+def save_manifest(manifest, manifest_path):
+    # Write-then-rename so an interrupted build never leaves a torn manifest
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def manifest_schema(manifest):
+    """The column schema pinned by the first build, or ``None`` before it."""
+    fields = manifest.get('schema')
+    if fields is None:
+        return None
+    return pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in fields])
+
+
+def plan_changes(input_paths, manifest):
+    """Returns ``(changed, removed)``: inputs whose content hash differs from the
+    manifest (or that are new), and source ids no longer among the inputs."""
+    changed = []
+    for path in input_paths:
+        entry = manifest['inputs'].get(source_id(path))
+        stat = os.stat(path)
+        # Cheap check first; only hash when size or mtime moved
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            continue
+        digest = file_sha256(path)
+        if entry and entry['sha256'] == digest:
+            entry['mtime_ns'] = stat.st_mtime_ns
+            continue
+        changed.append((path, digest))
+    current = {source_id(path) for path in input_paths}
+    removed = [sid for sid in manifest['inputs'] if sid not in current]
+    return changed, removed
+
+
+def _sqlite_has_source_column(conn, table_name):
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+    return not columns or SOURCE_COLUMN in columns
+
+
+def incremental_build(input_paths, db_file_path=DB_FILE_PATH, table_name=TABLE_NAME,
+                      dataset_path=INCREMENTAL_PARQUET_PATH, chunk_size=ETL_CHUNK_SIZE,
+                      memory_limit=ETL_MEMORY_LIMIT):
+    """Rebuilds only the inputs whose content changed since the last run.
+
+    Each input becomes its own ``source=<id>`` partition under ``dataset_path``
+    (which ``app.py`` reads through ``HSA_DATASET_PATH``) and its own set of rows,
+    tagged with a ``source`` column, in the SQLite table. Partitions and rows of
+    removed inputs are dropped. The manifest of content hashes lives next to the
+    dataset, along with the column schema inferred from the first input built: every
+    later input is cast to it, so partitions and SQLite rows never disagree on types.
+    Returns the list of rebuilt source ids."""
+    # Work files live outside ``dataset_path`` so readers never glob them
+    work_path = f"{dataset_path}.staging"
+    os.makedirs(dataset_path, exist_ok=True)
+    os.makedirs(work_path, exist_ok=True)
+    os.makedirs(os.path.dirname(db_file_path), exist_ok=True)
+    manifest_path = os.path.join(dataset_path, MANIFEST_FILE_NAME)
+    manifest = load_manifest(manifest_path)
+    if not manifest['inputs']:
+        manifest.pop('schema', None)  # nothing built yet: the next input sets it
+    schema = manifest_schema(manifest)
+    changed, removed = plan_changes(input_paths, manifest)
+    print(f"{len(changed)} changed/new input(s), {len(removed)} removed, "
+          f"{len(input_paths) - len(changed)} unchanged.")
+
+    with sqlite3.connect(db_file_path) as conn:
+        if not _sqlite_has_source_column(conn, table_name) or not manifest['inputs']:
+            # Table from a full (non-incremental) build: start over
+            conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+
+        for sid in removed:
+            shutil.rmtree(os.path.join(dataset_path, f"{SOURCE_COLUMN}={sid}"), ignore_errors=True)
+            conn.execute(f'DELETE FROM "{table_name}" WHERE {SOURCE_COLUMN} = ?', (sid,))
+            conn.commit()
+            del manifest['inputs'][sid]
+            save_manifest(manifest, manifest_path)
+            print(f"Removed partition for deleted input '{sid}'.")
+    conn.close()
+
+    for path, digest in changed:
+        sid = source_id(path)
+        print(f"\nRebuilding partition '{sid}' from {path}.")
+        partition_dir = os.path.join(dataset_path, f"{SOURCE_COLUMN}={sid}")
+        staging_path = os.path.join(work_path, f"{sid}.parquet")
+        new_partition = os.path.join(work_path, sid)
+
+        # One transaction per input: on failure its old rows are restored and
+        # the manifest entry is left untouched, so it is rebuilt next run.
+        # Indexes already exist, so VACUUM (a full-file rewrite) is skipped.
+        with SQLiteBulkWriter(db_file_path, table_name, replace=False,
+                              index_columns=SQLITE_INDEX_COLUMNS + [SOURCE_COLUMN],
+                              vacuum=False) as writer:
+            if writer.execute("SELECT count(*) FROM sqlite_master WHERE name = ?",
+                              (table_name,)).fetchone()[0]:
+                writer.execute(f'DELETE FROM "{table_name}" WHERE {SOURCE_COLUMN} = ?', (sid,))
+            try:
+                rows = stage_clean_csv(
+                    path, staging_path, chunk_size,
+                    on_chunk=lambda chunk: writer.write(chunk.assign(**{SOURCE_COLUMN: sid})),
+                    schema=schema,
+                )
+                staged_schema = pq.read_schema(staging_path).remove_metadata()
+                write_optimized_parquet(staging_path, os.path.join(new_partition, 'data.parquet'),
+                                        memory_limit=memory_limit)
+            finally:
+                if os.path.exists(staging_path):
+                    os.remove(staging_path)
+        # Swap the partition in only once it is complete
+        shutil.rmtree(partition_dir, ignore_errors=True)
+        os.replace(new_partition, partition_dir)
+        if schema is None:
+            schema = staged_schema
+            manifest['schema'] = [[field.name, str(field.type)] for field in schema]
+
+        stat = os.stat(path)
+        manifest['inputs'][sid] = {
+            'path': path,
+            'sha256': digest,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'rows': rows,
+        }
+        save_manifest(manifest, manifest_path)
+
+    save_manifest(manifest, manifest_path)
+    shutil.rmtree(work_path, ignore_errors=True)
+    print(f"\nIncremental build complete: {dataset_path} ({len(manifest['inputs'])} partition(s)).")
+    return [source_id(path) for path, _ in changed]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally rebuild the HSA dataset.")
+    parser.add_argument('inputs', nargs='*',
+                        help=f"Input CSV files (default: {INPUT_GLOB}).")
+    parser.add_argument('--chunk-size', type=int, default=ETL_CHUNK_SIZE,
+                        help="Rows per CSV chunk.")
+    parser.add_argument('--memory-limit', default=ETL_MEMORY_LIMIT,
+                        help="DuckDB memory limit for sorting, e.g. '1GB'.")
+    parser.add_argument('--crosswalk', default=CROSSWALK_CSV_PATH,
+                        help="ZIP -> HSA/HRR crosswalk CSV for the per-HSA/HRR aggregates.")
+    args = parser.parse_args()
+
+    incremental_build(
+        sorted(args.inputs or glob.glob(INPUT_GLOB)),
+        chunk_size=args.chunk_size, memory_limit=args.memory_limit,
+    )
+    if os.path.exists(args.crosswalk):
+        build_crosswalk(args.crosswalk, INCREMENTAL_PARQUET_PATH, CROSSWALK_PARQUET_PATH,
+                        memory_limit=args.memory_limit)
@@ -1,109 +1,47 @@
 import os
-import sqlite3
+import argparse
+import shutil
+from collections import Counter
+
+import duckdb
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from crosswalk import CROSSWALK_CSV_PATH, CROSSWALK_PARQUET_PATH, build_crosswalk
+from sqlite_writer import SQLiteBulkWriter
 
 CSV_FILE_PATH = 'data/Hospital_Service_Area_2022.csv'
 DB_FILE_PATH = 'databases/hsas.db'
 TABLE_NAME = 'hsa_data'
 PARQUET_FILE_PATH = 'data/processed/hsas.parquet'
+PARTITIONED_PARQUET_PATH = 'data/processed/hsas_partitioned'
 
-def load_csv_to_sqlite_and_save_parquet(csv_file_path, db_file_path, table_name, parquet_file_path):
-    """Loads a CSV file into a SQLite database, summarizes the data, handles missing values,
-    converts specific columns to numeric, filters the dataset, and saves it as a Parquet file."""
-    
-    # Load CSV into DataFrame with '*' as NaN
-    df = pd.read_csv(csv_file_path, na_values='*')
-    print("Original DataFrame loaded:")
-    print(df.head())
-
-    print("\nDataFrame Info:")
-    print(df.info())
-
-    print("\nDataFrame Description:")
-    print(df.describe(include='all'))
-
-    print("\nMissing Values in Each Column:")
-    print(df.isnull().sum())
-
-    # Handle Specific Missing Value Representations
-    # Columns where '*' should be replaced with 0
-    columns_replace_star = ['TOTAL_DAYS_OF_CARE', 'TOTAL_CHARGES', 'TOTAL_CASES']
-    
-    for column in columns_replace_star:
-        if column in df.columns:
-            # Replace '*' with 0 (already handled by na_values during read_csv)
-            df[column] = df[column].replace('*', 0)
-            print(f"\nReplaced '*' with 0 in column '{column}'.")
-
-            # Convert column to numeric (if not already)
-            df[column] = pd.to_numeric(df[column], errors='coerce')
-            print(f"Converted column '{column}' to numeric type.")
-        else:
-            print(f"\nWarning: Column '{column}' not found in DataFrame.")
-
-    # Handle Missing Values
-    # Strategy: Remove columns with all missing values and impute or remove rows with missing values in remaining columns
-    # Step 1: Drop columns where all values are NaN
-    initial_columns = df.shape[1]
-    df.dropna(axis=1, how='all', inplace=True)
-    dropped_columns = initial_columns - df.shape[1]
-    if dropped_columns > 0:
-        print(f"\nDropped {dropped_columns} columns with all missing values.")
-
-    # Step 2: Identify remaining columns with missing values
-    missing_values = df.isnull().sum()
-    columns_with_missing = missing_values[missing_values > 0].index.tolist()
-    
-    if columns_with_missing:
-        print(f"\nColumns with missing values: {columns_with_missing}")
-        # Define columns that were processed to replace '*' with 0
-        for column in columns_with_missing:
-            if column in columns_replace_star:
-                # These columns have already had '*' replaced with 0 and converted to numeric
-                # Now, handle any remaining missing values by imputing with 0
-                df[column].fillna(0, inplace=True)
-                print(f"Imputed remaining missing values in column '{column}' with 0.")
-            elif df[column].dtype in ['float64', 'int64']:
-                median_value = df[column].median()
-                df[column].fillna(median_value, inplace=True)
-                print(f"Imputed missing values in numerical column '{column}' with median: {median_value}.")
-            else:
-                mode_value = df[column].mode()[0]
-                df[column].fillna(mode_value, inplace=True)
-                print(f"Imputed missing values in categorical column '{column}' with mode: {mode_value}.")
-    else:
-        print("\nNo missing values detected.")
-
-    print("\nDataFrame after handling missing values:")
-    print(df.head())
+# Parquet layout: rows clustered on the columns queries filter and group by,
+# so row-group min/max statistics let DuckDB skip most of the file.
+PARQUET_SORT_COLUMNS = ['zip_cd_of_residence', 'medicare_prov_num']
+PARQUET_ROW_GROUP_SIZE = 122_880  # matches DuckDB's own row group size
+PARQUET_COMPRESSION = 'zstd'
+PARQUET_COMPRESSION_LEVEL = 3
+PARTITION_COLUMN = 'zip3'
 
-    print("\nSummary after handling missing values:")
-    print(df.info())
-    print(df.describe(include='all'))
+# Streaming ETL: peak memory is bounded by the chunk size and by the DuckDB
+# memory limit used for the final out-of-core sort, not by the input size.
+ETL_CHUNK_SIZE = int(os.getenv("HSA_ETL_CHUNK_SIZE", "100000"))
+ETL_MEMORY_LIMIT = os.getenv("HSA_ETL_MEMORY_LIMIT", "1GB")
+ETL_MEDIAN_SAMPLE_SIZE = 100_000  # reservoir size for approximate medians
+ETL_MODE_CAPACITY = 10_000  # distinct values tracked for approximate modes
 
-    # Convert specified columns to numeric (if not already)
-    numeric_columns = ['total_days_of_care', 'total_charges', 'total_cases']
-    for column in numeric_columns:
-        if column in df.columns:
-            df[column] = pd.to_numeric(df[column], errors='coerce')
-            print(f"Ensured column '{column}' is of numeric type.")
-        else:
-            print(f"Warning: Column '{column}' not found for numeric conversion.")
-
-    # Filter the dataset to keep only rows where at least one of the three variables is greater than zero
-    condition = (df['total_days_of_care'] > 0) | (df['total_charges'] > 0) | (df['total_cases'] > 0)
-    initial_rows = df.shape[0]
-    df = df[condition]
-    filtered_rows = df.shape[0]
-    print(f"\nFiltered dataset to keep rows where at least one of 'total_days_of_care', 'total_charges', or 'total_cases' is greater than zero.")
-    print(f"Rows before filtering: {initial_rows}, Rows after filtering: {filtered_rows}")
+# Columns where '*' should be replaced with 0
+COLUMNS_REPLACE_STAR = ['TOTAL_DAYS_OF_CARE', 'TOTAL_CHARGES', 'TOTAL_CASES']
+NUMERIC_COLUMNS = ['total_days_of_care', 'total_charges', 'total_cases']
 
-    print("\nDataFrame after filtering:")
-    print(df.head())
 
-    # Clean column names
-    df.columns = (
-        df.columns
+def clean_column_names(columns):
+    """Lower-cases column names and replaces separators with underscores."""
+    return (
+        pd.Index(columns)
         .str.lower()
         .str.replace(' ', '_', regex=False)
         .str.replace('.', '_', regex=False)
@@ -112,19 +50,332 @@ def load_csv_to_sqlite_and_save_parquet(csv_file_path, db_file_path, table_name,
         .str.replace('#', '', regex=False)
         .str.replace('$', '', regex=False)
     )
-    print("\nDataFrame with cleaned column names:")
-    print(df.head())
 
-    # Create SQLite database and insert data
-    os.makedirs(os.path.dirname(db_file_path), exist_ok=True)
-    with sqlite3.connect(db_file_path) as conn:
-        df.to_sql(table_name, conn, if_exists='replace', index=False)
-    print(f"\nData successfully loaded into {db_file_path} in table '{table_name}'.")
 
-    # Save DataFrame as Parquet file
+def read_csv_chunks(csv_file_path, chunk_size=ETL_CHUNK_SIZE):
+    """Yields the CSV in chunks of ``chunk_size`` rows with '*' read as NaN."""
+    return pd.read_csv(csv_file_path, na_values='*', chunksize=chunk_size)
+
+
+# =========================
+# Pass 1: Streaming Profile
+# =========================
+
+class ColumnProfile:
+    """Bounded-memory summary of one column: counts, dtype, numeric moments,
+    a reservoir sample for the median and heavy hitters for the mode."""
+
+    def __init__(self, name, sample_size=ETL_MEDIAN_SAMPLE_SIZE,
+                 mode_capacity=ETL_MODE_CAPACITY, seed=0):
+        self.name = name
+        self.count = 0
+        self.non_null = 0
+        self.numeric = True
+        self.integral = True
+        self.min = None
+        self.max = None
+        self.total = 0.0
+        self.sample = np.empty(0)
+        self.sample_size = sample_size
+        self.seen = 0
+        self.counts = Counter()
+        self.mode_capacity = mode_capacity
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, series):
+        self.count += len(series)
+        values = series.dropna()
+        self.non_null += len(values)
+        if len(values) < len(series):
+            self.integral = False
+        if values.empty:
+            return
+        if not pd.api.types.is_numeric_dtype(values):
+            self.numeric = False
+        elif not pd.api.types.is_integer_dtype(values):
+            self.integral = False
+
+        if self.numeric:
+            batch_min, batch_max = values.min(), values.max()
+            self.min = batch_min if self.min is None else min(self.min, batch_min)
+            self.max = batch_max if self.max is None else max(self.max, batch_max)
+            self.total += float(values.sum())
+            self._update_sample(values.to_numpy())
+
+        self.counts.update(values.value_counts().to_dict())
+        if len(self.counts) > 2 * self.mode_capacity:
+            # Keep only the heaviest hitters (approximate, Misra-Gries style)
+            self.counts = Counter(dict(self.counts.most_common(self.mode_capacity)))
+
+    def _update_sample(self, values):
+        # Reservoir sampling (Algorithm R), vectorized over the chunk
+        values = values.astype('float64')
+        free = self.sample_size - len(self.sample)
+        if free > 0:
+            self.sample = np.concatenate([self.sample, values[:free]])
+            self.seen += min(free, len(values))
+            values = values[free:]
+        if len(values):
+            positions = np.arange(self.seen + 1, self.seen + len(values) + 1)
+            slots = self._rng.integers(0, positions)
+            keep = slots < self.sample_size
+            self.sample[slots[keep]] = values[keep]
+            self.seen += len(values)
+
+    @property
+    def median(self):
+        return float(np.median(self.sample)) if len(self.sample) else 0.0
+
+    @property
+    def mode(self):
+        return self.counts.most_common(1)[0][0] if self.counts else None
+
+    @property
+    def mean(self):
+        return self.total / self.non_null if self.numeric and self.non_null else None
+
+
+def profile_csv(csv_file_path, chunk_size=ETL_CHUNK_SIZE):
+    """First lightweight pass: builds a ``ColumnProfile`` per column."""
+    profiles = {}
+    for i, chunk in enumerate(read_csv_chunks(csv_file_path, chunk_size)):
+        if i == 0:
+            print("Original DataFrame (first rows):")
+            print(chunk.head())
+        for column in COLUMNS_REPLACE_STAR:
+            if column in chunk.columns:
+                chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+        for column in chunk.columns:
+            profiles.setdefault(column, ColumnProfile(column)).update(chunk[column])
+    return profiles
+
+
+def print_profile(profiles):
+    """Streaming stand-in for ``df.info()``, ``describe()`` and ``isnull().sum()``."""
+    rows = [
+        {
+            'column': p.name,
+            'dtype': ('int64' if p.integral else 'float64') if p.numeric else 'object',
+            'non_null': p.non_null,
+            'missing': p.count - p.non_null,
+            'min': p.min,
+            'max': p.max,
+            'mean': p.mean,
+            'approx_median': p.median if p.numeric else None,
+            'approx_mode': p.mode,
+        }
+        for p in profiles.values()
+    ]
+    print("\nDataFrame Summary:")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+def build_cleaning_plan(profiles):
+    """Derives per-column rules (drop, dtype, fill value) from the profile,
+    applying the same rules the in-memory ETL used."""
+    plan = {}
+    for column, profile in profiles.items():
+        if profile.non_null == 0:
+            print(f"Dropping column '{column}' with all missing values.")
+            continue
+        missing = profile.count - profile.non_null
+        if column in COLUMNS_REPLACE_STAR:
+            fill = 0 if missing else None
+            dtype = 'int64' if profile.integral else 'float64'
+        elif profile.numeric:
+            fill = profile.median if missing else None
+            dtype = 'int64' if profile.integral else 'float64'
+        else:
+            fill = profile.mode if missing else None
+            dtype = 'str'
+        if missing:
+            print(f"Imputing {missing} missing values in column '{column}' with {fill}.")
+        plan[column] = {'dtype': dtype, 'fill': fill}
+    return plan
+
+
+# =========================
+# Pass 2: Clean and Write
+# =========================
+
+def arrow_schema(plan):
+    types = {'int64': pa.int64(), 'float64': pa.float64(), 'str': pa.string()}
+    return pa.schema([
+        (name, types[rule['dtype']])
+        for name, rule in zip(clean_column_names(list(plan)), plan.values())
+    ])
+
+
+def clean_chunk(chunk, plan):
+    """Applies the cleaning plan, the '> 0' filter and column renaming to a chunk."""
+    chunk = chunk[list(plan)].copy()
+    for column, rule in plan.items():
+        values = chunk[column]
+        if column in COLUMNS_REPLACE_STAR or rule['dtype'] != 'str':
+            values = pd.to_numeric(values, errors='coerce')
+        if rule['fill'] is not None:
+            values = values.fillna(rule['fill'])
+        chunk[column] = values.astype(rule['dtype'])
+    chunk.columns = clean_column_names(chunk.columns)
+
+    # Keep only rows where at least one of the three variables is greater than zero
+    present = [c for c in NUMERIC_COLUMNS if c in chunk.columns]
+    if present:
+        chunk = chunk[(chunk[present] > 0).any(axis=1)]
+    return chunk
+
+
+def conform_chunk(chunk, schema):
+    """Gives a cleaned chunk the columns of ``schema``: missing ones become nulls, extra
+    ones are dropped and text columns hold strings. Numeric values are cast (and a
+    lossy cast refused) when the chunk is converted to Arrow."""
+    chunk = chunk.reindex(columns=schema.names)
+    for field in schema:
+        if pa.types.is_string(field.type):
+            values = chunk[field.name]
+            chunk[field.name] = values.where(values.isna(), values.astype(str))
+    return chunk
+
+
+def stage_clean_csv(csv_file_path, staging_path, chunk_size=ETL_CHUNK_SIZE, on_chunk=None,
+                    schema=None):
+    """Runs both streaming passes over ``csv_file_path``: profiles it, then writes the
+    cleaned, filtered chunks to an unsorted staging Parquet file, calling
+    ``on_chunk(chunk)`` for each non-empty chunk. Returns the number of rows kept.
+
+    Column types are inferred from the file unless a pinned ``schema`` is given, in
+    which case every chunk is conformed to it."""
+
+    # Pass 1: summary statistics used for imputation
+    profiles = profile_csv(csv_file_path, chunk_size)
+    print_profile(profiles)
+    plan = build_cleaning_plan(profiles)
+    inferred = arrow_schema(plan)
+    if schema is None:
+        schema = inferred
+    else:
+        extra = [name for name in inferred.names if name not in schema.names]
+        if extra:
+            print(f"Dropping columns {extra} that are not in the pinned schema.")
+
+    # Pass 2: clean each chunk and append it to the staging Parquet file
+    initial_rows = filtered_rows = 0
+    try:
+        with pq.ParquetWriter(staging_path, schema) as writer:
+            for chunk in read_csv_chunks(csv_file_path, chunk_size):
+                initial_rows += len(chunk)
+                chunk = clean_chunk(chunk, plan)
+                if schema is not inferred:
+                    chunk = conform_chunk(chunk, schema)
+                filtered_rows += len(chunk)
+                if chunk.empty:
+                    continue
+                if on_chunk is not None:
+                    on_chunk(chunk)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    except Exception:
+        # Don't leave a partial staging file behind
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+        raise
+    print("\nFiltered dataset to keep rows where at least one of 'total_days_of_care', "
+          "'total_charges', or 'total_cases' is greater than zero.")
+    print(f"Rows before filtering: {initial_rows}, Rows after filtering: {filtered_rows}")
+    return filtered_rows
+
+
+def _sql_string(path):
+    """``path`` as a quoted SQL string literal."""
+    return "'" + str(path).replace("'", "''") + "'"
+
+
+def write_optimized_parquet(staging_path, parquet_file_path, partitioned_path=None,
+                            memory_limit=ETL_MEMORY_LIMIT):
+    """Rewrites the unsorted staging Parquet file as a sorted, zstd-compressed,
+    dictionary-encoded Parquet file and, if ``partitioned_path`` is given, as a
+    hive dataset partitioned by the 3-digit ZIP prefix. DuckDB sorts out of core
+    within ``memory_limit``."""
+    os.makedirs(os.path.dirname(parquet_file_path) or '.', exist_ok=True)
+    temp_directory = f"{parquet_file_path}.tmp"
+    con = duckdb.connect(config={'memory_limit': memory_limit,
+                                 'temp_directory': temp_directory,
+                                 'preserve_insertion_order': True})
+    try:
+        source = f"read_parquet({_sql_string(staging_path)})"
+        columns = {row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()}
+        sort_columns = [c for c in PARQUET_SORT_COLUMNS if c in columns]
+        order_by = f" ORDER BY {', '.join(sort_columns)}" if sort_columns else ""
+        options = (f"FORMAT parquet, COMPRESSION {PARQUET_COMPRESSION}, "
+                   f"COMPRESSION_LEVEL {PARQUET_COMPRESSION_LEVEL}, "
+                   f"ROW_GROUP_SIZE {PARQUET_ROW_GROUP_SIZE}")
+
+        con.execute(f"COPY (SELECT * FROM {source}{order_by}) TO {_sql_string(parquet_file_path)} ({options})")
+        print(f"Data successfully saved as Parquet file at {parquet_file_path} "
+              f"(sorted by {sort_columns}).")
+
+        if partitioned_path and 'zip_cd_of_residence' in columns:
+            shutil.rmtree(partitioned_path, ignore_errors=True)
+            zip3 = "substr(lpad(CAST(zip_cd_of_residence AS VARCHAR), 5, '0'), 1, 3)"
+            con.execute(
+                f"COPY (SELECT *, {zip3} AS {PARTITION_COLUMN} "
+                f"FROM {_sql_string(parquet_file_path)}{order_by}) "
+                f"TO {_sql_string(partitioned_path)} ({options}, PARTITION_BY ({PARTITION_COLUMN}))"
+            )
+            print(f"Data successfully saved as partitioned Parquet dataset at {partitioned_path}.")
+    finally:
+        con.close()
+        shutil.rmtree(temp_directory, ignore_errors=True)
+
+
+def load_csv_to_sqlite_and_save_parquet(csv_file_path, db_file_path, table_name, parquet_file_path,
+                                        partitioned_path=None, chunk_size=ETL_CHUNK_SIZE,
+                                        memory_limit=ETL_MEMORY_LIMIT):
+    """Loads a CSV file into a SQLite database, summarizes the data, handles missing values,
+    converts specific columns to numeric, filters the dataset, and saves it as a Parquet file.
+
+    The CSV is streamed twice in chunks of ``chunk_size`` rows: a first pass collects
+    approximate statistics for imputation, the second cleans each chunk and appends it to
+    SQLite and a staging Parquet file, so peak memory does not depend on the input size."""
+
+    os.makedirs(os.path.dirname(db_file_path), exist_ok=True)
     os.makedirs(os.path.dirname(parquet_file_path), exist_ok=True)
-    df.to_parquet(parquet_file_path, index=False)
-    print(f"Data successfully saved as Parquet file at {parquet_file_path}.")
-        
+    staging_path = f"{parquet_file_path}.staging"
+    try:
+        with SQLiteBulkWriter(db_file_path, table_name) as writer:
+            stage_clean_csv(csv_file_path, staging_path, chunk_size, on_chunk=writer.write)
+        print(f"\nData successfully loaded into {db_file_path} in table '{table_name}' "
+              f"(indexed on {writer.index_columns}).")
+
+        # Save the sorted, compressed Parquet file(s)
+        write_optimized_parquet(staging_path, parquet_file_path, partitioned_path, memory_limit)
+    finally:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the HSA SQLite database and Parquet files.")
+    parser.add_argument('--partitioned', action='store_true',
+                        help=f"Also write a hive-partitioned dataset to {PARTITIONED_PARQUET_PATH}.")
+    parser.add_argument('--chunk-size', type=int, default=ETL_CHUNK_SIZE,
+                        help="Rows per CSV chunk.")
+    parser.add_argument('--memory-limit', default=ETL_MEMORY_LIMIT,
+                        help="DuckDB memory limit for the final sort, e.g. '1GB'.")
+    parser.add_argument('--crosswalk', default=CROSSWALK_CSV_PATH,
+                        help="ZIP -> HSA/HRR crosswalk CSV; when present, the crosswalk and "
+                             "per-HSA/HRR aggregates are written next to the Parquet file.")
+    args = parser.parse_args()
+
     # Load CSV into SQLite and save as Parquet
-    load_csv_to_sqlite_and_save_parquet(CSV_FILE_PATH, DB_FILE_PATH, TABLE_NAME, PARQUET_FILE_PATH)
\ No newline at end of file
+    load_csv_to_sqlite_and_save_parquet(
+        CSV_FILE_PATH, DB_FILE_PATH, TABLE_NAME, PARQUET_FILE_PATH,
+        partitioned_path=PARTITIONED_PARQUET_PATH if args.partitioned else None,
+        chunk_size=args.chunk_size, memory_limit=args.memory_limit,
+    )
+
+    # Join the claims to HSA/HRR geography once, here, instead of at query time
+    if os.path.exists(args.crosswalk):
+        build_crosswalk(args.crosswalk, PARQUET_FILE_PATH, CROSSWALK_PARQUET_PATH,
+                        memory_limit=args.memory_limit)
+    else:
+        print(f"\nNo crosswalk at {args.crosswalk}; skipping HSA/HRR aggregates.")
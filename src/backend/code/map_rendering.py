@@ -0,0 +1,195 @@
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from folium.plugins import FastMarkerCluster
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Configuration
+# =========================
+
+MARKER_COORD_DECIMALS = 5  # ~1 m, plenty for a storefront
+POPUP_FIELDS = ["name", "address", "city", "postal_code"]
+MAP_CACHE_MAX_BYTES = int(os.getenv("HSA_MAP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+MAP_PRERENDER = os.getenv("HSA_MAP_PRERENDER", "1") != "0"
+ALL_BUSINESSES = "All"
+
+# =========================
+# Business Markers
+# =========================
+
+# Markers are created in the browser; each popup is built from the shared
+# columns only when it is opened, so no per-marker HTML is embedded.
+_MARKER_CALLBACK = """(function (cols) {
+    var icon = L.AwesomeMarkers.icon({icon: "info-sign", markerColor: "blue", prefix: "glyphicon"});
+    function field(name, i) {
+        var column = cols[name];
+        return column ? column[i] : "N/A";
+    }
+    return function (row) {
+        var i = row[2];
+        var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+        marker.bindPopup(function () {
+            var div = document.createElement("div");
+            var title = document.createElement("b");
+            title.textContent = field("name", i);
+            div.appendChild(title);
+            div.appendChild(document.createElement("br"));
+            div.appendChild(document.createTextNode(
+                field("address", i) + ", " + field("city", i) + ", TN " + field("postal_code", i)));
+            return div;
+        });
+        return marker;
+    };
+})(%s)"""
+
+
+def business_marker_data(df):
+    """Return ``(rows, columns)`` for ``df`` built with array operations.
+
+    ``rows`` is ``[[lat, lon, i], ...]`` for businesses with valid
+    coordinates and ``columns`` maps each popup field to a list aligned with
+    ``i`` (fields missing from ``df`` are left out and shown as "N/A").
+    """
+    lat = pd.to_numeric(df["md_y"], errors="coerce").to_numpy(dtype="float64")
+    lon = pd.to_numeric(df["md_x"], errors="coerce").to_numpy(dtype="float64")
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    rows = np.column_stack([
+        lat[valid].round(MARKER_COORD_DECIMALS),
+        lon[valid].round(MARKER_COORD_DECIMALS),
+        np.arange(valid.sum()),
+    ]).tolist()
+    columns = {
+        field: df[field][valid].fillna("N/A").astype(str).tolist()
+        for field in POPUP_FIELDS if field in df.columns
+    }
+    return rows, columns
+
+
+def add_business_markers(m, df, name="Businesses"):
+    """Add ``df``'s businesses to map ``m`` as one browser-clustered layer."""
+    rows, columns = business_marker_data(df)
+    # ``</`` would end the inline <script> early if it appeared in a name
+    payload = json.dumps(columns, separators=(",", ":")).replace("</", "<\\/")
+    cluster = FastMarkerCluster([], callback=_MARKER_CALLBACK % payload, name=name)
+    # Rows are already validated and rounded above; skip per-row validation
+    cluster.data = rows
+    return cluster.add_to(m)
+
+
+# =========================
+# Rendered Map Cache
+# =========================
+
+def map_cache_key(geo_layer, business_filters):
+    """Canonical ``(geo_layer, frozenset)`` key; empty or "All" mean all."""
+    filters = frozenset(business_filters or ())
+    if not filters or ALL_BUSINESSES in filters:
+        filters = frozenset([ALL_BUSINESSES])
+    return geo_layer, filters
+
+
+class MapCache:
+    """LRU cache of rendered map HTML bounded by ``max_bytes``.
+
+    ``render(geo_layer, business_filters)`` is deterministic for a given
+    dataset, so each (layer, filter set) is rendered once; concurrent
+    requests for the same key wait for that one render. ``prerender`` warms
+    the cache from a background thread. Call ``clear`` when the data behind
+    ``render`` changes.
+    """
+
+    def __init__(self, render, max_bytes=MAP_CACHE_MAX_BYTES):
+        self.render = render
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key, html):
+        size = len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[key] = (html, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted
+
+    def _load(self, key):
+        """Return ``(html, hit)`` for ``key``, rendering at most once per key."""
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry[0], True
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another caller may have rendered it while we waited
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry[0], True
+            geo_layer, filters = key
+            html = self.render(geo_layer, sorted(filters))
+            self._store(key, html)
+            return html, False
+
+    def get(self, geo_layer, business_filters):
+        """Return the map HTML, rendering it on a miss."""
+        html, hit = self._load(map_cache_key(geo_layer, business_filters))
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        registry.inc("hsa_cache_lookups_total", cache="map", result="hit" if hit else "miss")
+        return html
+
+    def prerender(self, combinations):
+        """Render ``(geo_layer, business_filters)`` pairs on a daemon thread."""
+        def run():
+            for geo_layer, business_filters in combinations:
+                try:
+                    self._load(map_cache_key(geo_layer, business_filters))
+                except Exception as e:
+                    logger.error(f"Pre-rendering map {geo_layer} {business_filters} failed: {e}")
+
+        thread = threading.Thread(target=run, name="map-prerender", daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+        }
@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import bisect
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =========================
+# Configuration
+# =========================
+
+METRICS_PORT = int(os.getenv("HSA_METRICS_PORT", "0"))  # off unless set
+METRICS_HOST = os.getenv("HSA_METRICS_HOST", "127.0.0.1")
+TRACE_LOG_PATH = os.getenv("HSA_TRACE_LOG")  # JSON lines; "-" for stderr
+SLOW_QUERY_MS = float(os.getenv("HSA_SLOW_QUERY_MS", "2000"))
+PROFILE_DIR = os.getenv("HSA_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "hsa_profiles"))
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+trace_logger = logging.getLogger("hsa.trace")
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+# =========================
+# Metrics Registry
+# =========================
+
+class MetricsRegistry:
+    """Counters, histograms and callback gauges in Prometheus text format."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def gauge(self, name, fn):
+        """Report ``fn()`` as gauge ``name`` at every scrape."""
+        self._gauges[name] = fn
+
+    def value(self, name, **labels):
+        """Current value of counter ``name`` (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def render(self):
+        lines = []
+
+        def header(name, kind):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                header(name, "counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                header(name, "histogram")
+                for key, (counts, total, count) in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(self.buckets, counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', f'{bound:g}')])} "
+                                     f"{cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {total:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+        for name, fn in sorted(self._gauges.items()):
+            header(name, "gauge")
+            lines.append(f"{name} {fn():g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.describe("hsa_stage_duration_seconds", "Latency of one stage of a request.")
+registry.describe("hsa_request_duration_seconds", "End-to-end latency of a request.")
+registry.describe("hsa_errors_total", "Exceptions raised, by stage and type.")
+registry.describe("hsa_cache_lookups_total", "Cache lookups by cache and hit/miss.")
+registry.describe("hsa_translations_total", "NL-to-SQL translations by serving path.")
+registry.describe("hsa_rows_read_total", "Rows read from DuckDB into result pages.")
+registry.describe("hsa_bytes_materialized_total", "Arrow bytes read into result pages.")
+registry.describe("hsa_slow_queries_total", "Queries slower than HSA_SLOW_QUERY_MS.")
+
+
+# =========================
+# Request Tracing
+# =========================
+
+class Trace:
+    """Times the stages of one request into ``registry``.
+
+    Each ``with trace.stage(name)`` block is observed in
+    ``hsa_stage_duration_seconds``; an exception escaping a stage is counted
+    in ``hsa_errors_total`` with its type before it propagates. ``finish``
+    records the total latency and, if trace logging is on, writes the whole
+    trace (stages, fields, error) as one JSON line.
+    """
+
+    def __init__(self, operation, metrics=None, **fields):
+        self.operation = operation
+        self.metrics = metrics or registry
+        self.fields = fields
+        self.stages = {}
+        self.error = None
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.error = {"stage": name, "type": type(e).__name__, "message": str(e)}
+            self.metrics.inc("hsa_errors_total", operation=self.operation, stage=name,
+                             error=type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            self.metrics.observe("hsa_stage_duration_seconds", elapsed,
+                                 operation=self.operation, stage=name)
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def finish(self, outcome=None):
+        elapsed = self.elapsed
+        outcome = outcome or ("error" if self.error else "ok")
+        self.metrics.observe("hsa_request_duration_seconds", elapsed,
+                             operation=self.operation, outcome=outcome)
+        if trace_logger.isEnabledFor(logging.INFO):
+            trace_logger.info(json.dumps({
+                "ts": time.time(),
+                "operation": self.operation,
+                "outcome": outcome,
+                "duration_ms": round(elapsed * 1000, 3),
+                "stages_ms": {k: round(v * 1000, 3) for k, v in self.stages.items()},
+                "error": self.error,
+                **self.fields,
+            }, default=str))
+        return elapsed
+
+
+def configure_trace_log(path=TRACE_LOG_PATH):
+    """Write finished traces as JSON lines to ``path`` ("-" for stderr)."""
+    if not path:
+        return
+    handler = logging.StreamHandler() if path == "-" else logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_logger.addHandler(handler)
+    trace_logger.setLevel(logging.INFO)
+    trace_logger.propagate = False
+
+
+# =========================
+# Slow Query Profiles
+# =========================
+
+class QueryProfile:
+    """Profile of one query, kept only for slow queries.
+
+    ``con`` must already collect profiles (``PRAGMA enable_profiling =
+    'no_output'``); the connection manager sets this on its cursors before
+    it locks the configuration. ``stop`` records the latency once execution
+    and the first page are done. ``finish(outcome)`` runs when the result is
+    closed, cancelled or fails; if the latency was at least ``slow_ms`` it
+    writes a JSON record with the outcome into ``profile_dir`` and returns
+    its path (or ``None``). DuckDB only completes its profile for a result
+    read to the end, so for any other outcome the planner's plan is kept.
+    """
+
+    def __init__(self, con, sql_query, slow_ms=SLOW_QUERY_MS, profile_dir=PROFILE_DIR):
+        self.con = con
+        self.sql_query = sql_query
+        self.slow_ms = slow_ms
+        self.profile_dir = profile_dir
+        self.elapsed_ms = None
+        self._start = None
+
+    def start(self):
+        if self.slow_ms is not None and self.slow_ms >= 0:
+            self._start = time.perf_counter()
+        return self
+
+    def stop(self):
+        """Record the latency; later paging does not count towards it."""
+        if self._start is not None and self.elapsed_ms is None:
+            self.elapsed_ms = (time.perf_counter() - self._start) * 1000
+        return self.elapsed_ms
+
+    def _plan(self):
+        try:
+            _, plan = self.con.execute(f"EXPLAIN (FORMAT JSON) {self.sql_query}").fetchone()
+            return json.loads(plan)
+        except Exception:
+            return None
+
+    def finish(self, outcome="complete"):
+        if self._start is None:
+            return None
+        elapsed_ms = self.stop()
+        self._start = None
+        if elapsed_ms < self.slow_ms:
+            return None
+        record = {"sql": self.sql_query, "outcome": outcome,
+                  "duration_ms": round(elapsed_ms, 3), "profile": None, "plan": None}
+        if outcome == "complete":
+            profile = json.loads(self.con.get_profiling_information(format="json"))
+            if profile.get("query_name"):
+                record["profile"] = profile
+        if record["profile"] is None:
+            record["plan"] = self._plan()
+        os.makedirs(self.profile_dir, exist_ok=True)
+        digest = hashlib.sha1(self.sql_query.encode()).hexdigest()[:12]
+        kept = os.path.join(self.profile_dir, f"{int(time.time() * 1000)}-{digest}.json")
+        with open(kept, "w") as f:
+            json.dump(record, f)
+        registry.inc("hsa_slow_queries_total", outcome=outcome)
+        if trace_logger.isEnabledFor(logging.INFO):
+            trace_logger.info(json.dumps({
+                "ts": time.time(), "operation": "slow_query",
+                "duration_ms": round(elapsed_ms, 3), "sql": self.sql_query,
+                "outcome": outcome, "profile": kept,
+            }))
+        return kept
+
+
+# =========================
+# Metrics Endpoint
+# =========================
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = registry
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the console
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST, metrics=registry):
+    """Serve ``GET /metrics`` from a daemon thread; returns the server."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
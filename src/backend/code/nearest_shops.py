@@ -0,0 +1,146 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import folium
+
+# =========================
+# Configuration
+# =========================
+
+EARTH_RADIUS_MILES = 3958.8
+NEAREST_K = 5
+RESULT_COLUMNS = ["name", "address", "city", "postal_code", "business_type", "md_y", "md_x"]
+
+
+def _to_radians(lats, lons):
+    points = np.column_stack([np.atleast_1d(np.asarray(lats, dtype="float64")),
+                              np.atleast_1d(np.asarray(lons, dtype="float64"))])
+    if not np.isfinite(points).all():
+        raise ValueError("Query locations must be finite latitude/longitude pairs.")
+    return np.radians(points)
+
+
+# =========================
+# Nearest Shop Index
+# =========================
+
+class NearestShops:
+    """Batch nearest-shop and radius queries in miles.
+
+    One haversine ``BallTree`` covers every business and one more per
+    ``business_type`` is built the first time that type is asked for, so a
+    type filter searches only matching shops. Queries take arrays of
+    latitudes and longitudes and answer all of them in one call; results are
+    long DataFrames with one row per (query, shop) pair.
+    """
+
+    def __init__(self, businesses, lat="md_y", lon="md_x", type_column="business_type"):
+        lats = pd.to_numeric(businesses[lat], errors="coerce").to_numpy(dtype="float64")
+        lons = pd.to_numeric(businesses[lon], errors="coerce").to_numpy(dtype="float64")
+        valid = np.isfinite(lats) & np.isfinite(lons)
+        self.businesses = businesses[valid].reset_index(drop=True)
+        self.type_column = type_column
+        self._radians = np.radians(np.column_stack([lats[valid], lons[valid]]))
+        self._trees = {}
+        self._lock = threading.Lock()
+
+    def _tree(self, business_type=None):
+        """``(tree, rows)`` over ``business_type`` (all shops for ``None``)."""
+        if business_type not in self._trees:
+            with self._lock:
+                if business_type not in self._trees:
+                    # scikit-learn is slow to import; only pay for it when a tree is used
+                    from sklearn.neighbors import BallTree
+
+                    if business_type is None:
+                        rows = np.arange(len(self.businesses))
+                    else:
+                        mask = (self.businesses[self.type_column] == business_type).to_numpy()
+                        rows = np.flatnonzero(mask)
+                    tree = BallTree(self._radians[rows], metric="haversine") if len(rows) else None
+                    self._trees[business_type] = (tree, rows)
+        return self._trees[business_type]
+
+    def _trees_for(self, business_types):
+        if not business_types or "All" in business_types:
+            return [self._tree()]
+        return [self._tree(t) for t in dict.fromkeys(business_types)]
+
+    def _result(self, query, rows, distances):
+        result = self.businesses.iloc[rows][
+            [c for c in RESULT_COLUMNS if c in self.businesses.columns]].reset_index(drop=True)
+        result.insert(0, "query", query)
+        result.insert(1, "distance_miles", distances * EARTH_RADIUS_MILES)
+        return result
+
+    def nearest(self, lats, lons, k=NEAREST_K, business_types=None):
+        """The ``k`` closest shops to each point, nearest first (``rank`` 1..k)."""
+        points = _to_radians(lats, lons)
+        distances, rows = [], []
+        for tree, tree_rows in self._trees_for(business_types):
+            if tree is None:
+                continue
+            d, i = tree.query(points, k=min(k, len(tree_rows)))
+            distances.append(d)
+            rows.append(tree_rows[i])
+        if not distances:
+            return self._result(np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0))
+
+        # Merge the per-type candidates and keep the k best of each point
+        distances, rows = np.hstack(distances), np.hstack(rows)
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        distances = np.take_along_axis(distances, order, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        n, width = distances.shape
+        result = self._result(np.repeat(np.arange(n), width), rows.ravel(), distances.ravel())
+        result.insert(1, "rank", np.tile(np.arange(1, width + 1), n))
+        return result
+
+    def within(self, lats, lons, radius_miles, business_types=None):
+        """Every shop within ``radius_miles`` of each point, nearest first."""
+        points = _to_radians(lats, lons)
+        radius = radius_miles / EARTH_RADIUS_MILES
+        queries, distances, rows = [], [], []
+        for tree, tree_rows in self._trees_for(business_types):
+            if tree is None:
+                continue
+            i, d = tree.query_radius(points, r=radius, return_distance=True)
+            counts = np.fromiter((len(x) for x in i), dtype=np.int64, count=len(i))
+            queries.append(np.repeat(np.arange(len(points)), counts))
+            rows.append(tree_rows[np.concatenate(i).astype(np.int64)] if counts.sum() else
+                        np.empty(0, dtype=np.int64))
+            distances.append(np.concatenate(d) if counts.sum() else np.empty(0))
+        if not queries:
+            return self._result(np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0))
+        queries, distances, rows = np.concatenate(queries), np.concatenate(distances), np.concatenate(rows)
+        order = np.lexsort((distances, queries))
+        return self._result(queries[order], rows[order], distances[order])
+
+
+# =========================
+# Map Overlay
+# =========================
+
+def nearest_overlay(lats, lons, result, name="Nearest shops"):
+    """A layer with the query points and a line from each to its shops."""
+    lats = np.atleast_1d(np.asarray(lats, dtype="float64"))
+    lons = np.atleast_1d(np.asarray(lons, dtype="float64"))
+    group = folium.FeatureGroup(name=name)
+    q = result["query"].to_numpy()
+    lines = np.stack([np.column_stack([lons[q], lats[q]]),
+                      result[["md_x", "md_y"]].to_numpy(dtype="float64")], axis=1)
+    folium.GeoJson(
+        {"type": "Feature", "properties": {},
+         "geometry": {"type": "MultiLineString", "coordinates": lines.round(5).tolist()}},
+        style_function=lambda _: {"color": "red", "weight": 2, "opacity": 0.7},
+        control=False,
+    ).add_to(group)
+    folium.GeoJson(
+        {"type": "Feature", "properties": {},
+         "geometry": {"type": "MultiPoint",
+                      "coordinates": np.column_stack([lons, lats]).round(5).tolist()}},
+        marker=folium.CircleMarker(radius=6, color="red", fill=True, fill_opacity=0.9),
+        control=False,
+    ).add_to(group)
+    return group
@@ -0,0 +1,269 @@
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+import pyarrow as pa
+
+# =========================
+# Configuration
+# =========================
+
+PAGE_SIZE = int(os.getenv("HSA_PAGE_SIZE", "500"))
+MAX_RESULT_ROWS = int(os.getenv("HSA_MAX_RESULT_ROWS", "100000"))
+MAX_OPEN_RESULTS = int(os.getenv("HSA_MAX_OPEN_RESULTS", "32"))
+# Completed results up to this size are handed to ``on_complete`` (caching)
+MAX_COMPLETE_ROWS = int(os.getenv("HSA_MAX_COMPLETE_ROWS", "50000"))
+SPILL_DIR = os.getenv("HSA_SPILL_DIR")  # None uses the system temp dir
+
+
+def arrow_reader(result, rows_per_batch=PAGE_SIZE):
+    """Return a ``pyarrow.RecordBatchReader`` over a DuckDB result."""
+    if hasattr(result, "to_arrow_reader"):
+        return result.to_arrow_reader(rows_per_batch)
+    return result.fetch_record_batch(rows_per_batch)
+
+
+# =========================
+# Paged Result
+# =========================
+
+class PagedResult:
+    """Lazily paged view over a query result.
+
+    Pages are pulled from the still-open DuckDB ``reader`` only when first
+    requested, and every page that has been read is spilled to its own Arrow
+    IPC file so that going back is a memory-mapped read. At most ``max_rows``
+    rows are ever read; beyond that the result is marked ``truncated``. The
+    owning cursor is released as soon as the reader is exhausted or capped,
+    or when ``release_cursor`` gives it up early (``evicted``). A closed
+    result is ``exhausted`` and returns empty pages; closing it before the
+    reader was done marks it ``abandoned``.
+    """
+
+    def __init__(self, reader, page_size=PAGE_SIZE, max_rows=MAX_RESULT_ROWS,
+                 spill_dir=SPILL_DIR, on_close=None, on_complete=None,
+                 complete_max_rows=MAX_COMPLETE_ROWS):
+        self.page_size = max(1, int(page_size))
+        self.max_rows = max_rows
+        self.schema = reader.schema
+        self.rows_read = 0
+        self.bytes_read = 0
+        self.exhausted = False
+        self.truncated = False
+        self.evicted = False
+        self.abandoned = False
+        self._reader = reader
+        self._pending = []
+        self._pending_rows = 0
+        self._pages = []
+        self._spill_dir = spill_dir
+        self._tmpdir = None
+        self._on_close = on_close
+        self._on_complete = on_complete
+        self._complete_max_rows = complete_max_rows
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_table(cls, table, page_size=PAGE_SIZE):
+        """Wrap an already materialized ``pyarrow.Table``."""
+        result = cls(pa.RecordBatchReader.from_batches(table.schema, []),
+                     page_size=page_size)
+        result._reader = None
+        result.exhausted = True
+        result.rows_read = table.num_rows
+        result.bytes_read = table.nbytes
+        result._pages = [
+            table.slice(offset, result.page_size)
+            for offset in range(0, table.num_rows, result.page_size)
+        ]
+        return result
+
+    @property
+    def pages_read(self):
+        return len(self._pages)
+
+    @property
+    def page_count(self):
+        """Number of pages, or ``None`` while more rows may follow."""
+        return max(1, len(self._pages)) if self.exhausted else None
+
+    def _spill(self, table):
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="hsa_pages_",
+                                            dir=self._spill_dir)
+        path = os.path.join(self._tmpdir, f"{len(self._pages)}.arrow")
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        self._pages.append(path)
+
+    def _load(self, index):
+        page = self._pages[index]
+        if isinstance(page, pa.Table):
+            return page
+        with pa.memory_map(page, "r") as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def _finish(self):
+        self.exhausted = True
+        self._reader = None
+        if self._pending_rows:
+            self._spill(pa.Table.from_batches(self._pending, self.schema))
+            self._pending, self._pending_rows = [], 0
+        if self._on_close is not None:
+            self._on_close()
+            self._on_close = None
+        if self._on_complete is not None and not self.truncated \
+                and self.rows_read <= self._complete_max_rows:
+            self._on_complete(self._concat())
+        self._on_complete = None
+
+    def _read_page(self):
+        while not self.exhausted and self._pending_rows < self.page_size:
+            budget = self.max_rows - self.rows_read
+            if budget <= 0:
+                self.truncated = True
+                self._finish()
+                break
+            try:
+                batch = self._reader.read_next_batch()
+            except StopIteration:
+                self._finish()
+                break
+            if batch.num_rows > budget:
+                batch = batch.slice(0, budget)
+            self.rows_read += batch.num_rows
+            self.bytes_read += batch.nbytes
+            self._pending.append(batch)
+            self._pending_rows += batch.num_rows
+        if self._pending_rows >= self.page_size:
+            table = pa.Table.from_batches(self._pending, self.schema)
+            self._spill(table.slice(0, self.page_size))
+            rest = table.slice(self.page_size)
+            self._pending = rest.to_batches()
+            self._pending_rows = rest.num_rows
+
+    def page(self, index):
+        """Return page ``index`` as a ``pyarrow.Table`` (empty past the end)."""
+        with self._lock:
+            while index >= len(self._pages) and not self.exhausted:
+                self._read_page()
+            if index < len(self._pages):
+                return self._load(index)
+            return self.schema.empty_table()
+
+    def read_all(self):
+        """Concatenate every page (bounded by ``max_rows``)."""
+        with self._lock:
+            while not self.exhausted:
+                self._read_page()
+            return self._concat()
+
+    def _concat(self):
+        tables = [self._load(i) for i in range(len(self._pages))]
+        if not tables:
+            return self.schema.empty_table()
+        return pa.concat_tables(tables)
+
+    @property
+    def streaming(self):
+        """Whether the result still holds its cursor."""
+        return self._reader is not None
+
+    @property
+    def outcome(self):
+        """How reading ended: complete, truncated, evicted or abandoned."""
+        if self.evicted:
+            return "evicted"
+        if self.truncated:
+            return "truncated"
+        if self.abandoned:
+            return "abandoned"
+        return "complete"
+
+    def release_cursor(self):
+        """Stop reading and release the cursor, keeping the pages read so far.
+
+        The rest of the result is dropped: it is marked ``truncated`` and
+        ``evicted``. Returns whether the result was still streaming.
+        """
+        with self._lock:
+            if not self.streaming:
+                return False
+            self.truncated = True
+            self.evicted = True
+            self._finish()
+            return True
+
+    def close(self):
+        with self._lock:
+            self.abandoned = self.streaming
+            self._reader = None
+            self.exhausted = True
+            self._on_complete = None
+            if self._on_close is not None:
+                self._on_close()
+                self._on_close = None
+            if self._tmpdir is not None:
+                shutil.rmtree(self._tmpdir, ignore_errors=True)
+                self._tmpdir = None
+            self._pages = []
+
+
+# =========================
+# Open Result Registry
+# =========================
+
+class PagedResultStore:
+    """Bounded registry of open ``PagedResult`` objects, closed LRU-first.
+
+    Several ids may refer to one result (coalesced requests share it); a
+    result is only closed once no id refers to it any more.
+    """
+
+    def __init__(self, max_open=MAX_OPEN_RESULTS):
+        self.max_open = max_open
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._results[result_id] = result
+            while len(self._results) > self.max_open:
+                _, evicted = self._results.popitem(last=False)
+                self._release(evicted)
+        return result_id
+
+    def _release(self, result):
+        if not any(other is result for other in self._results.values()):
+            result.close()
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, result_id):
+        with self._lock:
+            result = self._results.get(result_id)
+            if result is not None:
+                self._results.move_to_end(result_id)
+            return result
+
+    def release_oldest_streaming(self):
+        """Release the cursor of the least recently used streaming result.
+
+        Returns whether one was released; the result keeps serving the
+        pages it already read.
+        """
+        with self._lock:
+            results = list(self._results.values())
+        return any(result.release_cursor() for result in results)
+
+    def discard(self, result_id):
+        with self._lock:
+            result = self._results.pop(result_id, None)
+            if result is not None:
+                self._release(result)
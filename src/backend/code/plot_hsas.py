@@ -5,20 +5,34 @@ import plotly.express as px
 import folium
 import numpy as np
 import geopandas as gpd
-from folium.plugins import MarkerCluster
-from sklearn.neighbors import BallTree
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
-import math
+import html
 import os
 
+from boundaries import boundary_path, prepare_boundaries
+from business_types import default_classifier
+from crosswalk import region_aggregate_path
+from geo_data import cached_frame, lazy
+from geocoding import ZIP_CENTROIDS_PATH, Geocoder, NominatimProvider, ZipCentroids
+from map_rendering import MAP_PRERENDER, MapCache, add_business_markers
+from nearest_shops import NEAREST_K, NearestShops, nearest_overlay
+from regions import assign_regions, region_counts, region_id_column
+from tile_serving import MAP_TILES, TILE_PORT, ViewportLayers, create_tile_app, start_tile_server
+
 # Logger setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load datasets
-df_md_final1 = pd.read_csv("backend/data/location-of-auto-businesses.csv")
-cbg_geographic_data = pd.read_csv("backend/data/cbg_geographic_data.csv")
+# Data sources. Nothing is read at import: each dataset is loaded on first use
+# and cached, already filtered to Tennessee, as (Geo)Parquet in HSA_GEO_CACHE_DIR.
+businesses_csv_path = "backend/data/location-of-auto-businesses.csv"
+cbg_csv_path = "backend/data/cbg_geographic_data.csv"
+county_shapefile_path = "backend/data/county/01_county-shape-file.shp"
+hsa_shapefile_path = "backend/data/hsa/01_hsa-shape-file.shp"
+hrr_shapefile_path = "backend/data/hrr/01_hrr-shape-file.shp"
+# Medicare claims summed per HSA/HRR by the ETL's crosswalk step
+region_aggregates_dir = "backend/data/processed"
+hsa_dataset_path = "backend/data/processed/hsas.parquet"
+GEO_CACHE_VERSION = "1"  # bump when a loader below changes what it returns
 
 # Create DataFrames for the 2020 and 2010 populations
 population_2020_data = {
@@ -29,60 +43,91 @@ population_2020_data = {
 }
 df_population_2020 = pd.DataFrame(population_2020_data)
 
-df_population_2010 = cbg_geographic_data.groupby('cntyname')['pop10'].sum().reset_index().sort_values(by='pop10', ascending=False)
-df_population_2010.rename(columns={'cntyname': 'County', 'pop10': 'Population_2010'}, inplace=True)
+@lazy
+def load_population_comparison():
+    """2010 (from the census block groups) and 2020 population by county."""
+    def load():
+        cbg_geographic_data = pd.read_csv(cbg_csv_path)
+        df_population_2010 = cbg_geographic_data.groupby('cntyname')['pop10'].sum().reset_index().sort_values(by='pop10', ascending=False)
+        df_population_2010.rename(columns={'cntyname': 'County', 'pop10': 'Population_2010'}, inplace=True)
+        return df_population_2010
 
-# Merge the 2010 and 2020 population data for side-by-side comparison
-df_population_comparison = pd.merge(df_population_2010, df_population_2020, on='County')
+    df_population_2010 = cached_frame("population_2010", [cbg_csv_path], load, GEO_CACHE_VERSION)
+    # Merge the 2010 and 2020 population data for side-by-side comparison
+    return pd.merge(df_population_2010, df_population_2020, on='County')
 
 # Define Business Types
-df_md_final1['business_type'] = np.where(df_md_final1['name'].str.contains("Autozone", case=False, na=False), "Autozone", 
-    np.where(df_md_final1['name'].str.contains("Napa Auto Parts", case=False, na=False), "Napa Auto", 
-        np.where(df_md_final1['name'].str.contains("Firestone Complete Auto Care", case=False, na=False), "Firestone",                                 
-            np.where(df_md_final1['name'].str.contains("O'Reilly Auto Parts", case=False, na=False), "O'Reilly Auto",
-                np.where(df_md_final1['name'].str.contains("Advance Auto Parts", case=False, na=False), "Advance Auto",
-                    np.where(df_md_final1['name'].str.contains("Toyota|Honda|Kia|Nissan|Chevy|Ford|Carmax|GMC", case=False, na=False), 
-                             "Car Dealership", 
-                             "Other Auto Repair Shops")
-                )
-            )
-        )
-    )
-)
+business_classifier = default_classifier()
+BUSINESS_TYPES = sorted(business_classifier.labels)
+
+@lazy
+def load_businesses():
+    """Auto businesses with their ``business_type``."""
+    def load():
+        df = pd.read_csv(businesses_csv_path)
+        df['business_type'] = business_classifier.classify(df['name'])
+        return df
+
+    # Re-classified whenever the rules change
+    version = f"{GEO_CACHE_VERSION}-{business_classifier.fingerprint}"
+    return cached_frame("businesses", [businesses_csv_path], load, version)
+
+def read_tn_shapefile(path, state_filters):
+    """Read ``path`` keeping Tennessee, by the first ``(column, value)`` present."""
+    gdf = gpd.read_file(path)
+    for column, value in state_filters:
+        if column in gdf.columns:
+            return gdf[gdf[column] == value]
+    raise KeyError(f"Column to filter state in {path} not found.")
 
 # Load the County shapefile
-county_shapefile_path = "backend/data/county/01_county-shape-file.shp"
-if not os.path.exists(county_shapefile_path):
-    raise FileNotFoundError(f"County shapefile not found at {county_shapefile_path}. Please ensure the file exists.")
-    
-counties_geo = gpd.read_file(county_shapefile_path)
-counties_geo = counties_geo[counties_geo['statefp'] == '47']  # Tennessee FIPS code
+@lazy
+def load_counties():
+    return cached_frame("counties_tn", [county_shapefile_path], lambda: read_tn_shapefile(
+        county_shapefile_path, [('statefp', '47')]), GEO_CACHE_VERSION)  # Tennessee FIPS code
 
 # Load the HSA shapefile
-hsa_shapefile_path = "backend/data/hsa/01_hsa-shape-file.shp"
-if not os.path.exists(hsa_shapefile_path):
-    raise FileNotFoundError(f"HSA shapefile not found at {hsa_shapefile_path}. Please ensure the file exists.")
-    
-hsa_geo = gpd.read_file(hsa_shapefile_path)
-if 'hsastate' in hsa_geo.columns:
-    hsa_geo = hsa_geo[hsa_geo['hsastate'].isin(['TN'])]
-elif 'STATEFP' in hsa_geo.columns:
-    hsa_geo = hsa_geo[hsa_geo['STATEFP'].isin(['47'])]
-else:
-    raise KeyError("Column to filter state in HSA shapefile not found.")
+@lazy
+def load_hsas():
+    return cached_frame("hsas_tn", [hsa_shapefile_path], lambda: read_tn_shapefile(
+        hsa_shapefile_path, [('hsastate', 'TN'), ('STATEFP', '47')]), GEO_CACHE_VERSION)
 
 # Load the HRR shapefile
-hrr_shapefile_path = "backend/data/hrr/01_hrr-shape-file.shp"
-if not os.path.exists(hrr_shapefile_path):
-    raise FileNotFoundError(f"HRR shapefile not found at {hrr_shapefile_path}. Please ensure the file exists.")
-    
-hrr_geo = gpd.read_file(hrr_shapefile_path)
-if 'hrrstate' in hrr_geo.columns:
-    hrr_geo = hrr_geo[hrr_geo['hrrstate'].isin(['TN'])]
-elif 'STATEFP' in hrr_geo.columns:
-    hrr_geo = hrr_geo[hrr_geo['STATEFP'].isin(['47'])]
-else:
-    raise KeyError("Column to filter state in HRR shapefile not found.")
+@lazy
+def load_hrrs():
+    return cached_frame("hrrs_tn", [hrr_shapefile_path], lambda: read_tn_shapefile(
+        hrr_shapefile_path, [('hrrstate', 'TN'), ('STATEFP', '47')]), GEO_CACHE_VERSION)
+
+boundary_loaders = {"Counties": load_counties, "HSAs": load_hsas, "HRRs": load_hrrs}
+boundary_sources = {"Counties": county_shapefile_path, "HSAs": hsa_shapefile_path, "HRRs": hrr_shapefile_path}
+
+@lazy
+def boundary_artifact(geo_layer):
+    """Simplified, quantized boundaries for ``geo_layer`` (rebuilt when its shapefile changes).
+
+    Falls back to the full-resolution layer if the artifact cannot be built.
+    """
+    try:
+        prepare_boundaries({geo_layer: boundary_loaders[geo_layer]},
+                           source_paths={geo_layer: boundary_sources[geo_layer]})
+        return boundary_path(geo_layer, zoom=7)
+    except Exception as e:
+        logger.error(f"Could not prepare simplified boundaries for {geo_layer}, using full resolution: {e}")
+        return boundary_loaders[geo_layer]()
+
+@lazy
+def load_business_regions():
+    """Businesses with the county, HSA and HRR each one lies in (one bulk spatial join per layer)."""
+    return cached_frame("business_regions", [businesses_csv_path, *boundary_sources.values()],
+                        lambda: assign_regions(load_businesses(), {layer: load() for layer, load in boundary_loaders.items()}),
+                        GEO_CACHE_VERSION)
+
+@lazy
+def load_region_counts(geo_layer):
+    """Shops per region of ``geo_layer`` by business type, with every region listed."""
+    region_ids = boundary_loaders[geo_layer]()[region_id_column(geo_layer, boundary_loaders[geo_layer]())]
+    counts = region_counts(load_business_regions(), geo_layer)
+    return counts.reindex(region_ids.unique(), fill_value=0)
 
 # Function to create a Folium map with selected geographical boundaries and markers
 def create_map(geo_layer="Counties", business_filters=["All"]):
@@ -91,15 +136,10 @@ def create_map(geo_layer="Counties", business_filters=["All"]):
     m = folium.Map(location=[35.8601, -86.6602], zoom_start=7)
     
     try:
-        # Select the appropriate GeoDataFrame based on geo_layer
-        if geo_layer == "Counties":
-            geo_data = counties_geo
-        elif geo_layer == "HSAs":
-            geo_data = hsa_geo
-        elif geo_layer == "HRRs":
-            geo_data = hrr_geo
-        else:
-            geo_data = counties_geo  # Default to counties
+        # Select the appropriate boundaries based on geo_layer
+        if geo_layer not in boundary_loaders:
+            geo_layer = "Counties"  # Default to counties
+        geo_data = boundary_artifact(geo_layer)
         logger.info(f"Geo layer {geo_layer} selected.")
         
         # Add selected geographical boundaries
@@ -107,30 +147,111 @@ def create_map(geo_layer="Counties", business_filters=["All"]):
     except Exception as e:
         logger.error(f"Error loading GeoData for {geo_layer}: {e}")
     
-    # Initialize Marker Cluster
-    marker_cluster = MarkerCluster().add_to(m)
-    
-    # Filter based on Business 
+    # Filter based on Business (read-only below, so no copy is needed)
+    df_md_final1 = load_businesses()
     if "All" not in business_filters:
         filtered_df = df_md_final1[df_md_final1['business_type'].isin(business_filters)]
     else:
-        filtered_df = df_md_final1.copy()
+        filtered_df = df_md_final1
     
     logger.info(f"Filtered {len(filtered_df)} businesses based on filters: {business_filters}")
 
-    # Add markers to the map
-    for _, row in filtered_df.iterrows():
-        folium.Marker(
-            location=[row['md_y'], row['md_x']],
-            popup=f"<b>{row['name']}</b><br>{row.get('address', 'N/A')}, {row.get('city', 'N/A')}, TN {row.get('postal_code', 'N/A')}",
-            icon=folium.Icon(color='blue', icon='info-sign')
-        ).add_to(marker_cluster)
+    # Markers and popups are created client-side from one compact data array
+    add_business_markers(m, filtered_df)
     
     folium.LayerControl().add_to(m)
     
     logger.info("Map creation completed.")
     return m._repr_html_()
 
+# Function to create a choropleth of shop counts per region instead of individual markers
+def create_choropleth_map(geo_layer="HSAs", business_filters=["All"]):
+    logger.info(f"Creating choropleth with geo_layer: {geo_layer} and business_filters: {business_filters}")
+    if geo_layer not in boundary_loaders:
+        geo_layer = "Counties"  # Default to counties
+    counts = load_region_counts(geo_layer)
+    if "All" in business_filters:
+        selected = counts['total']
+    else:
+        selected = counts[[t for t in business_filters if t in counts.columns]].sum(axis=1)
+    id_column = region_id_column(geo_layer, boundary_loaders[geo_layer]())
+
+    m = folium.Map(location=[35.8601, -86.6602], zoom_start=7)
+    folium.Choropleth(
+        geo_data=boundary_artifact(geo_layer),
+        data=selected.rename('shops').rename_axis(id_column).reset_index(),
+        columns=[id_column, 'shops'],
+        key_on=f"feature.properties.{id_column}",
+        fill_color='YlOrRd',
+        fill_opacity=0.7,
+        line_opacity=0.3,
+        legend_name=f"Shops per {geo_layer[:-1]}",
+        name=geo_layer,
+    ).add_to(m)
+    folium.LayerControl().add_to(m)
+    return m._repr_html_()
+
+# Function to create a map that fetches boundaries and businesses for the visible area from the tile server
+def create_viewport_map(geo_layer="Counties", business_filters=["All"]):
+    if geo_layer not in boundary_loaders:
+        geo_layer = "Counties"  # Default to counties
+    m = folium.Map(location=[35.8601, -86.6602], zoom_start=7)
+    ViewportLayers(geo_layer, business_filters).add_to(m)
+    return m._repr_html_()
+
+def tile_boundaries(geo_layer):
+    """``load(zoom)`` for the tile server: the artifact simplified for ``zoom``."""
+    def load(zoom):
+        artifact = boundary_artifact(geo_layer)  # builds every level
+        return boundary_path(geo_layer, zoom) if isinstance(artifact, str) else artifact
+    return load
+
+# Tile server for viewport maps (HSA_MAP_TILES=1), started next to the Gradio app
+tile_app = create_tile_app({layer: tile_boundaries(layer) for layer in boundary_loaders}, load_businesses)
+
+# Function to create a choropleth of Medicare charges per region from the ETL's pre-joined aggregates
+def create_charges_map(geo_layer="HSAs", business_filters=["All"]):
+    level = {"HSAs": "hsa", "HRRs": "hrr"}[geo_layer]
+    regions = boundary_loaders[geo_layer]()
+    id_column = region_id_column(geo_layer, regions)
+    charges = pd.read_parquet(region_aggregate_path(level, region_aggregates_dir))
+    charges = charges.set_index(f"{level}num")['total_charges']
+    # Shapefile ids may be floats or strings; match them as integers
+    ids = pd.to_numeric(regions[id_column], errors='coerce').astype('Int64')
+    data = pd.DataFrame({id_column: regions[id_column].to_numpy(),
+                         'charges': charges.reindex(ids).to_numpy(dtype='float64')})
+
+    m = folium.Map(location=[35.8601, -86.6602], zoom_start=7)
+    folium.Choropleth(
+        geo_data=boundary_artifact(geo_layer),
+        data=data,
+        columns=[id_column, 'charges'],
+        key_on=f"feature.properties.{id_column}",
+        fill_color='YlGnBu',
+        fill_opacity=0.7,
+        line_opacity=0.3,
+        nan_fill_color='lightgray',
+        legend_name=f"Medicare total charges per {geo_layer[:-1]}",
+        name=geo_layer,
+    ).add_to(m)
+    folium.LayerControl().add_to(m)
+    return m._repr_html_()
+
+def has_region_charges(geo_layer="HSAs"):
+    level = {"HSAs": "hsa", "HRRs": "hrr"}[geo_layer]
+    return os.path.exists(region_aggregate_path(level, region_aggregates_dir))
+
+# Rendered maps are deterministic per (layer, filter set); serve repeats from memory
+map_cache = MapCache(create_viewport_map if MAP_TILES else create_map)
+choropleth_cache = MapCache(create_choropleth_map)
+charges_cache = MapCache(create_charges_map)
+
+def prerender_maps():
+    """Warm ``map_cache`` with each layer and the single-type HSA filters."""
+    combinations = [(layer, ["All"]) for layer in ["HSAs", "Counties", "HRRs"]]
+    combinations += [("HSAs", [business_type]) for business_type in BUSINESS_TYPES]
+    return map_cache.prerender(combinations)
+
 # Function to create the bar plot for 2020 Tennessee population (top 15 counties)
 def plot_2020_population_top15():
     fig = px.bar(df_population_2020, 
@@ -146,7 +267,7 @@ def plot_2020_population_top15():
 
 # Function to create a side-by-side bar chart for the 2010 and 2020 Tennessee population by county
 def plot_population_comparison():
-    df_melted = df_population_comparison.melt(id_vars='County', value_vars=['Population_2010', 'Population_2020'],
+    df_melted = load_population_comparison().melt(id_vars='County', value_vars=['Population_2010', 'Population_2020'],
                                               var_name='Year', value_name='Population')
     fig = px.bar(df_melted, 
                  x='County', 
@@ -161,19 +282,36 @@ def plot_population_comparison():
     return fig
 
 # Nearest Neighbor Search Setup
-# Prepare the data for nearest neighbor search
-def prepare_nearest_neighbor():
-    # Convert coordinates to radians for BallTree
-    coords = df_md_final1[['md_y', 'md_x']].to_numpy()
-    radians_coords = np.radians(coords)
-    tree = BallTree(radians_coords, metric='haversine')
-    return tree, radians_coords
+# Haversine BallTrees over the businesses, built on first use (per business type on demand)
+@lazy
+def nearest_shops():
+    return NearestShops(load_businesses())
 
-tree, radians_coords = prepare_nearest_neighbor()
+def create_nearest_map(lats, lons, result):
+    """Map of query locations linked to their nearest shops."""
+    lats, lons = np.atleast_1d(lats), np.atleast_1d(lons)
+    m = folium.Map(location=[float(np.mean(lats)), float(np.mean(lons))], zoom_start=11)
+    add_business_markers(m, result.drop_duplicates(subset=['name', 'md_y', 'md_x']), name="Shops")
+    nearest_overlay(lats, lons, result).add_to(m)
+    all_lats = np.concatenate([lats, result['md_y'].to_numpy()])
+    all_lons = np.concatenate([lons, result['md_x'].to_numpy()])
+    m.fit_bounds([[all_lats.min(), all_lons.min()], [all_lats.max(), all_lons.max()]])
+    folium.LayerControl().add_to(m)
+    return m._repr_html_()
 
-# Geocoder setup
-geolocator = Nominatim(user_agent="tn_auto_shops_app")
-geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)
+# Geocoder setup: Nominatim behind a persistent cache, with ZIP centroids (from
+# HSA_ZIP_CENTROIDS_PATH, else the mean location of the shops in each ZIP) as
+# the offline fallback. Shops only cover some of the claims' ZIPs, so the gap
+# is logged.
+@lazy
+def geocoder():
+    centroids = ZipCentroids.from_points(load_businesses(), 'postal_code', 'md_y', 'md_x')
+    if os.path.exists(ZIP_CENTROIDS_PATH):
+        centroids = ZipCentroids.from_csv(ZIP_CENTROIDS_PATH).combine(centroids)
+    if os.path.exists(hsa_dataset_path):
+        zips = pd.read_parquet(hsa_dataset_path, columns=['zip_cd_of_residence'])
+        centroids.log_coverage(zips['zip_cd_of_residence'].dropna().unique(), "HSA claims")
+    return Geocoder(NominatimProvider(), zip_centroids=centroids)
 
 # Gradio Interface
 with gr.Blocks(theme=gr.themes.Default()) as app:
@@ -203,28 +341,65 @@ with gr.Blocks(theme=gr.themes.Default()) as app:
         )
     
         gr.Markdown("### 📍 Interactive Map")
-        map_output_overview = gr.HTML(create_map(geo_layer="Counties", business_filters=["All"]))
+        map_output_overview = gr.HTML()
+        app.load(fn=lambda: map_cache.get("Counties", ["All"]), inputs=None, outputs=[map_output_overview])
         
     with gr.Tab("📍 Shops in TN HSAs"):
         with gr.Row():
             with gr.Column(scale=1):
                 gr.Markdown("### Filter Shops by Business Type")
-                business_options_hsa = ["All"] + sorted(df_md_final1['business_type'].unique())
+                business_options_hsa = ["All"] + BUSINESS_TYPES
                 business_filter_hsa = gr.CheckboxGroup(label="Select Business ", choices=business_options_hsa, value=["All"])
+                map_views_hsa = ["Shops", "Shops per HSA"] + (["Medicare charges per HSA"] if has_region_charges("HSAs") else [])
+                map_view_hsa = gr.Radio(label="Show", choices=map_views_hsa, value="Shops")
                 reset_button_hsa = gr.Button("Reset Filters")
             with gr.Column(scale=4):
                 shops_hsa_map = gr.HTML()
         
-        def update_hsa_map(business_filters):
-            if "All" in business_filters or not business_filters:
-                business_filters = ["All"]
-            return create_map(geo_layer="HSAs", business_filters=business_filters)
+        def update_hsa_map(business_filters, map_view):
+            if map_view == "Medicare charges per HSA":
+                return charges_cache.get("HSAs", ["All"])  # not filtered by business type
+            cache = choropleth_cache if map_view == "Shops per HSA" else map_cache
+            return cache.get("HSAs", business_filters)
         
-        business_filter_hsa.change(fn=update_hsa_map, inputs=[business_filter_hsa], outputs=[shops_hsa_map])
-        reset_button_hsa.click(fn=lambda: (["All"], create_map(geo_layer="HSAs", business_filters=["All"])),
-                               inputs=None, outputs=[business_filter_hsa, shops_hsa_map])
+        business_filter_hsa.change(fn=update_hsa_map, inputs=[business_filter_hsa, map_view_hsa], outputs=[shops_hsa_map])
+        map_view_hsa.change(fn=update_hsa_map, inputs=[business_filter_hsa, map_view_hsa], outputs=[shops_hsa_map])
+        reset_button_hsa.click(fn=lambda: (["All"], "Shops", map_cache.get("HSAs", ["All"])),
+                               inputs=None, outputs=[business_filter_hsa, map_view_hsa, shops_hsa_map])
         
     
+    with gr.Tab("🧭 Nearest Shop Finder"):
+        with gr.Row():
+            with gr.Column(scale=1):
+                address_input = gr.Textbox(label="Address", placeholder="e.g. 600 Charlotte Ave, Nashville, TN")
+                nearest_count = gr.Slider(1, 20, value=NEAREST_K, step=1, label="Number of shops")
+                business_filter_nearest = gr.CheckboxGroup(label="Select Business ", choices=business_options_hsa, value=["All"])
+                find_button = gr.Button("Find Nearest Shops")
+            with gr.Column(scale=4):
+                nearest_map_output = gr.HTML()
+                nearest_table = gr.Dataframe(interactive=False)
+
+        def find_nearest_shops(address, k, business_filters):
+            if not address or not address.strip():
+                return "<p>Enter an address to search from.</p>", None
+            location = geocoder().geocode(address)
+            if location is None:
+                return f"<p>Could not find the address: {html.escape(address)}</p>", None
+            result = nearest_shops().nearest([location.latitude], [location.longitude], k=int(k),
+                                             business_types=business_filters)
+            if result.empty:
+                return "<p>No shops match the selected business types.</p>", None
+            table = result.drop(columns=['query']).round({'distance_miles': 2})
+            map_html = create_nearest_map(location.latitude, location.longitude, result)
+            if location.approximate:
+                map_html = "<p>Exact address not found or lookup unavailable; distances are from the ZIP code's center.</p>" + map_html
+            return map_html, table
+
+        find_button.click(fn=find_nearest_shops, inputs=[address_input, nearest_count, business_filter_nearest],
+                          outputs=[nearest_map_output, nearest_table])
+        address_input.submit(fn=find_nearest_shops, inputs=[address_input, nearest_count, business_filter_nearest],
+                             outputs=[nearest_map_output, nearest_table])
+
     with gr.Tab("🔍 Help"):
         gr.Markdown("""
         ## How to Use This Dashboard
@@ -234,15 +409,22 @@ with gr.Blocks(theme=gr.themes.Default()) as app:
         - **Shops in TN Counties/HSAs/HRRs Tabs:**
             - **Filter by Business Type:** Use the checkboxes to select one or multiple business types to display on the map.
             - **Filter by Geographical Area:** Depending on the tab, you can filter businesses based on Counties, HSAs, or HRRs.
+            - **Shops per HSA:** Switch the view to color each HSA by its number of shops of the selected types.
             - **Reset Filters:** Click the reset button to clear all selected filters and view all businesses.
             - **Interactive Map:** Zoom in/out, click on markers to view business details, and use the search bar to find specific businesses.
         
         - **Nearest Shop Finder Tab:**
-            - **Enter Address:** Type your address in the textbox. As you type, address suggestions will appear. Select one or press Enter to find the nearest auto shop.
-            - **View Results:** The map will display your location and the nearest auto shop with a line connecting them.
+            - **Enter Address:** Type your address in the textbox and press Enter or click the button to find the nearest auto shops.
+            - **Narrow the Search:** Choose how many shops to show and, optionally, which business types to include.
+            - **View Results:** The map will display your location and the nearest auto shops with a line connecting them; the table lists them with their distance in miles.
         
         """)
     
     gr.Markdown("### 📄 Source: Yellow Pages")
 
-app.launch(server_name="0.0.0.0", server_port=7860, share=True)
+if __name__ == "__main__":
+    if MAP_TILES:
+        start_tile_server(tile_app, TILE_PORT)
+    if MAP_PRERENDER:
+        prerender_maps()
+    app.launch(server_name="0.0.0.0", server_port=7860, share=True)
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import threading
+
+from paged_results import MAX_RESULT_ROWS
+
+# =========================
+# Configuration
+# =========================
+
+QUERY_TIMEOUT_S = float(os.getenv("HSA_QUERY_TIMEOUT_S", "30"))
+# Sum of the planner's estimated rows over every operator in the plan
+QUERY_MAX_COST = int(float(os.getenv("HSA_QUERY_MAX_COST", "5e8")))
+# Estimated working memory of hash tables, sorts and windows. Admission only
+# checks the estimate; the hard cap is the connection-wide memory_limit the
+# connection manager sets from this budget before locking its configuration.
+QUERY_MAX_MEMORY_MB = int(os.getenv("HSA_QUERY_MAX_MEMORY_MB", "1024"))
+QUERY_ROW_BYTES = int(os.getenv("HSA_QUERY_ROW_BYTES", "64"))
+# One row past the paging cap so the result is still marked truncated
+AUTO_LIMIT_ROWS = MAX_RESULT_ROWS + 1
+
+# Operators that hold their input (or, for joins, the build side) in memory
+_MATERIALIZING = {
+    "HASH_GROUP_BY", "PERFECT_HASH_GROUP_BY", "ORDER_BY", "WINDOW",
+    "STREAMING_WINDOW",
+}
+_JOINS = {
+    "HASH_JOIN", "NESTED_LOOP_JOIN", "PIECEWISE_MERGE_JOIN", "BLOCKWISE_NL_JOIN",
+    "CROSS_PRODUCT",
+}
+
+
+# =========================
+# Plan Estimates
+# =========================
+
+def explain(con, sql_query):
+    """Root node of DuckDB's physical plan for ``sql_query`` as a dict."""
+    _, plan = con.execute(f"EXPLAIN (FORMAT JSON) {sql_query}").fetchone()
+    return json.loads(plan)[0]
+
+
+def _cardinality(node):
+    estimate = node.get("extra_info", {}).get("Estimated Cardinality")
+    if estimate is not None:
+        return int(estimate)
+    children = [_cardinality(child) for child in node.get("children", [])]
+    if node["name"] == "CROSS_PRODUCT":
+        # DuckDB does not annotate cross products; every pair is produced
+        return children[0] * children[1]
+    return max(children, default=0)
+
+
+def estimate_plan(plan):
+    """Return ``(rows, cost, memory_bytes)`` estimated for ``plan``.
+
+    ``rows`` is the root's cardinality; ``cost`` sums the cardinality of
+    every operator; ``memory_bytes`` charges ``QUERY_ROW_BYTES`` per row held
+    by materializing operators.
+    """
+    cost, memory_rows = 0, 0
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        children = node.get("children", [])
+        rows = _cardinality(node)
+        cost += rows
+        if node["name"] in _MATERIALIZING:
+            memory_rows += rows
+        elif node["name"] in _JOINS and len(children) > 1:
+            memory_rows += _cardinality(children[1])
+        stack.extend(children)
+    return _cardinality(plan), cost, memory_rows * QUERY_ROW_BYTES
+
+
+# =========================
+# Admission
+# =========================
+
+class Verdict:
+    """Outcome of admitting, rewriting or cancelling one query."""
+
+    def __init__(self, action, sql, rows=None, cost=None, memory_bytes=None, reason=""):
+        self.action = action
+        self.sql = sql
+        self.rows = rows
+        self.cost = cost
+        self.memory_bytes = memory_bytes
+        self.reason = reason
+        self.plan_ms = 0.0
+        self.run_ms = None
+
+    @property
+    def rejected(self):
+        return self.action in ("rejected", "cancelled")
+
+    def summary(self):
+        parts = [self.action.capitalize()]
+        if self.reason:
+            parts[0] += f": {self.reason}"
+        if self.rows is not None:
+            parts.append(f"~{self.rows:,} rows, cost {self.cost:,}, "
+                         f"~{self.memory_bytes / 2**20:,.0f} MB est.")
+        timing = f"plan {self.plan_ms:.0f} ms"
+        if self.run_ms is not None:
+            timing += f", run {self.run_ms:.0f} ms"
+        parts.append(timing)
+        return " · ".join(parts)
+
+
+def admit_query(con, sql_query, max_cost=QUERY_MAX_COST,
+                max_memory_mb=QUERY_MAX_MEMORY_MB, auto_limit=AUTO_LIMIT_ROWS):
+    """Decide from ``EXPLAIN`` estimates whether ``sql_query`` may run.
+
+    Queries over the cost or memory budget are rejected; queries expected to
+    return more than ``auto_limit`` rows are wrapped in a ``LIMIT`` so DuckDB
+    stops early instead of producing rows that would never be paged in.
+    """
+    start = time.perf_counter()
+    rows, cost, memory_bytes = estimate_plan(explain(con, sql_query))
+    verdict = Verdict("admitted", sql_query, rows, cost, memory_bytes)
+    if cost > max_cost:
+        verdict.action = "rejected"
+        verdict.reason = f"estimated cost exceeds budget of {max_cost:,}"
+    elif memory_bytes > max_memory_mb * 2**20:
+        verdict.action = "rejected"
+        verdict.reason = f"estimated memory exceeds budget of {max_memory_mb:,} MB"
+    elif rows > auto_limit:
+        verdict.action = "limited"
+        verdict.reason = f"LIMIT {auto_limit:,} added"
+        # Newline ends any trailing ``--`` comment in the original query
+        body = sql_query.strip().rstrip(";")
+        verdict.sql = f"SELECT * FROM (\n{body}\n) AS limited LIMIT {auto_limit}"
+    verdict.plan_ms = (time.perf_counter() - start) * 1000
+    return verdict
+
+
+class QueryDeadline:
+    """Interrupt ``con`` if the ``with`` block runs longer than ``timeout_s``."""
+
+    def __init__(self, con, timeout_s=QUERY_TIMEOUT_S):
+        self.con = con
+        self.timeout_s = timeout_s
+        self.expired = False
+        self._timer = None
+
+    def _interrupt(self):
+        self.expired = True
+        self.con.interrupt()
+
+    def __enter__(self):
+        if self.timeout_s and self.timeout_s > 0:
+            self._timer = threading.Timer(self.timeout_s, self._interrupt)
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._timer is not None:
+            self._timer.cancel()
+        return False
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+from boundaries import BOUNDARY_CRS
+
+# =========================
+# Configuration
+# =========================
+
+# Business column each layer's region id is stored in
+REGION_COLUMNS = {"Counties": "county", "HSAs": "hsa", "HRRs": "hrr"}
+# Candidate id attributes per layer, first present wins (all kept in the
+# boundary artifacts, so choropleths can key on them)
+REGION_ID_COLUMNS = {
+    "Counties": ["geoid", "GEOID", "countyfp", "name"],
+    "HSAs": ["hsanum", "HSANUM"],
+    "HRRs": ["hrrnum", "HRRNUM"],
+}
+
+
+def region_id_column(layer, gdf):
+    for column in REGION_ID_COLUMNS.get(layer, []):
+        if column in gdf.columns:
+            return column
+    raise KeyError(f"No region id column for {layer}; expected one of {REGION_ID_COLUMNS.get(layer)}.")
+
+
+# =========================
+# Point-in-Polygon Assignment
+# =========================
+
+def locate_points(lats, lons, polygons):
+    """Index into ``polygons`` of the polygon containing each point, or -1.
+
+    One bulk STRtree query tests every point against only the polygons whose
+    bounding boxes hold it. A point on a shared border goes to the polygon
+    listed first.
+    """
+    points = shapely.points(np.asarray(lons, dtype="float64"), np.asarray(lats, dtype="float64"))
+    tree = shapely.STRtree(np.asarray(polygons))
+    point_idx, polygon_idx = tree.query(points, predicate="intersects")
+    order = np.lexsort((polygon_idx, point_idx))
+    point_idx, polygon_idx = point_idx[order], polygon_idx[order]
+    first = np.unique(point_idx, return_index=True)[1]
+    located = np.full(len(points), -1, dtype=np.int64)
+    located[point_idx[first]] = polygon_idx[first]
+    return located
+
+
+def assign_regions(businesses, layers, lat="md_y", lon="md_x"):
+    """``businesses`` with a region id column per layer (``REGION_COLUMNS``).
+
+    ``layers`` maps a layer name to its GeoDataFrame; businesses outside
+    every polygon of a layer get a missing id.
+    """
+    lats = pd.to_numeric(businesses[lat], errors="coerce").to_numpy(dtype="float64")
+    lons = pd.to_numeric(businesses[lon], errors="coerce").to_numpy(dtype="float64")
+    result = businesses.copy()
+    for layer, gdf in layers.items():
+        if gdf.crs is not None:
+            gdf = gdf.to_crs(BOUNDARY_CRS)
+        ids = gdf[region_id_column(layer, gdf)].to_numpy()
+        if len(ids) == 0:
+            result[REGION_COLUMNS[layer]] = pd.NA
+            continue
+        located = locate_points(lats, lons, gdf.geometry.values)
+        values = pd.Series(ids[np.maximum(located, 0)], index=result.index).where(located >= 0)
+        if pd.api.types.is_integer_dtype(ids.dtype):
+            values = values.astype("Int64")  # keep integer ids despite the gaps
+        result[REGION_COLUMNS[layer]] = values
+    return result
+
+
+def region_counts(businesses, layer, type_column="business_type"):
+    """Businesses per region of ``layer``: one column per business type plus ``total``."""
+    column = REGION_COLUMNS[layer]
+    located = businesses[businesses[column].notna()]
+    counts = pd.crosstab(located[column], located[type_column].astype(str))
+    counts["total"] = counts.sum(axis=1)
+    counts.columns.name = None
+    return counts
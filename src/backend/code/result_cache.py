@@ -0,0 +1,160 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# =========================
+# Configuration
+# =========================
+
+RESULT_CACHE_MAX_BYTES = int(
+    os.getenv("HSA_RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+)
+
+# String literals, quoted identifiers, comments, numbers, then anything else
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<string>'(?:[^']|'')*')
+    | (?P<ident>"(?:[^"]|"")*")
+    | (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<number>\b\d+(?:\.\d*)?(?:[eE][+-]?\d+)?\b)
+    | (?P<space>\s+)
+    | (?P<other>[^\s'"\d-]+|-|\d)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_NON_DETERMINISTIC_RE = re.compile(
+    r"\b(random|uuid|gen_random_uuid|now|current_date|current_time"
+    r"|current_timestamp|today|setseed)\b"
+)
+# Whitespace after these (or before ``_TRAILING_TIGHT``) carries no meaning;
+# a space after ")" is kept so "sum(x) as s" does not become "sum(x)as s".
+_LEADING_TIGHT = set("(,=<>+*/")
+_TRAILING_TIGHT = set("(),;=<>+*/")
+
+
+def _normalize_number(text):
+    # Drop redundant leading zeros ("007" -> "7") but keep the literal's type:
+    # "40" and "40.0" are INTEGER and DECIMAL in DuckDB and may render apart.
+    integer, dot, rest = text.partition(".")
+    return (integer.lstrip("0") or "0") + dot + rest
+
+
+def canonicalize_sql(sql_query):
+    """Return a canonical form of ``sql_query`` for cache keys.
+
+    Comments are removed, whitespace is collapsed, keywords and unquoted
+    identifiers are lower-cased (DuckDB resolves them case-insensitively)
+    and numeric literals are normalized. Quoted strings and identifiers are
+    kept verbatim.
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(sql_query):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "comment":
+            continue
+        if kind == "space":
+            if tokens and tokens[-1] != " ":
+                tokens.append(" ")
+            continue
+        if kind == "number":
+            text = _normalize_number(text)
+        elif kind == "other":
+            text = text.lower()
+        tokens.append(text)
+
+    canonical = []
+    for i, token in enumerate(tokens):
+        if token == " ":
+            prev = canonical[-1] if canonical else ""
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else ""
+            if not prev or not nxt or prev[-1] in _LEADING_TIGHT \
+                    or nxt[0] in _TRAILING_TIGHT:
+                continue
+        canonical.append(token)
+    return "".join(canonical).rstrip(";").strip()
+
+
+def is_cacheable(canonical_sql):
+    """Only deterministic, read-only statements may be served from cache."""
+    if not canonical_sql.startswith(("select", "with", "from")):
+        return False
+    return not _NON_DETERMINISTIC_RE.search(canonical_sql)
+
+
+# =========================
+# Result Cache
+# =========================
+
+class ResultCache:
+    """LRU cache of Arrow query results bounded by ``max_bytes``.
+
+    Keys combine the canonical SQL with the fingerprint returned by
+    ``DuckDBConnectionManager.refresh`` (the dataset and the crosswalk), so
+    when ``load_hsa_data.py`` rewrites either file the old entries stop
+    matching; they are dropped the first time a newer fingerprint is seen.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    def _invalidate_if_stale(self, fingerprint):
+        if fingerprint != self._fingerprint:
+            self._entries.clear()
+            self.current_bytes = 0
+            self._fingerprint = fingerprint
+
+    def get(self, sql_query, fingerprint):
+        """Return the cached ``pyarrow.Table`` for ``sql_query`` or ``None``."""
+        key = canonicalize_sql(sql_query)
+        with self._lock:
+            self._invalidate_if_stale(fingerprint)
+            table = self._entries.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return table
+
+    def put(self, sql_query, fingerprint, table):
+        """Store ``table``; returns ``False`` if it was not cacheable."""
+        key = canonicalize_sql(sql_query)
+        if fingerprint is None or not is_cacheable(key):
+            return False
+        size = table.nbytes
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            self._invalidate_if_stale(fingerprint)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            self._entries[key] = table
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+        }
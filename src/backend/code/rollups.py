@@ -0,0 +1,197 @@
+import logging
+import re
+
+import duckdb
+
+from result_cache import canonicalize_sql
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Rollup Definitions
+# =========================
+
+BASE_VIEW = "hsa_data"
+ROLLUP_DIMENSIONS = ["zip_cd_of_residence", "medicare_prov_num"]
+ROLLUP_MEASURES = ["total_charges", "total_days_of_care", "total_cases"]
+
+
+def rollup_table_name(dimension):
+    return f"{BASE_VIEW}_by_{dimension}"
+
+
+def build_rollups(con, source=BASE_VIEW):
+    """(Re)create one aggregate table per dimension present in ``source``.
+
+    Each table holds, per dimension value, the row count and the SUM and
+    non-null COUNT of every measure, which is enough to answer SUM, AVG and
+    COUNT queries grouped by that dimension.
+    """
+    columns = {row[0] for row in con.execute(f"DESCRIBE {source}").fetchall()}
+    measures = [m for m in ROLLUP_MEASURES if m in columns]
+    built = []
+    for dimension in ROLLUP_DIMENSIONS:
+        if dimension not in columns:
+            continue
+        aggregates = ", ".join(
+            f"sum({m}) AS sum_{m}, count({m}) AS count_{m}" for m in measures
+        )
+        con.execute(
+            f"CREATE OR REPLACE TABLE {rollup_table_name(dimension)} AS "
+            f"SELECT {dimension}, count(*) AS row_count, {aggregates} "
+            f"FROM {source} GROUP BY {dimension}"
+        )
+        built.append(dimension)
+    logger.info(f"Built rollups for dimensions: {built}")
+    return built
+
+
+# =========================
+# Query Rewriting
+# =========================
+
+_QUERY_RE = re.compile(
+    rf"select (?P<select>.+?) from {BASE_VIEW}"
+    r"(?P<where> where .+?)?"
+    r" group by (?P<group>[a-z_][a-z0-9_]*)"
+    r"(?P<tail>(?: having .+?)?(?: order by .+?)?"
+    r"(?: limit \d+(?: offset \d+)?)?)"
+)
+_AGGREGATE_RE = re.compile(r"\b(sum|avg|count)\((\*|[a-z_][a-z0-9_]*)\)")
+_UNSUPPORTED_RE = re.compile(
+    r"\b(join|union|intersect|except|distinct|filter|over|qualify"
+    r"|grouping|rollup|cube)\b"
+)
+_ALIAS_RE = re.compile(
+    r"\s(as\s)?[a-z_][a-z0-9_]*$|\sas\s\"(?:[^\"]|\"\")*\"$"
+)
+
+
+def _split_top_level(text):
+    """Split a select list on commas outside parentheses and quotes."""
+    items, depth, quote, start = [], 0, None, 0
+    for i, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            items.append(text[start:i])
+            start = i + 1
+    items.append(text[start:])
+    return [item.strip() for item in items]
+
+
+def _rewritable(func, arg, measures, dimension):
+    if arg == "*":
+        return func == "count"
+    return arg in measures or (func == "count" and arg == dimension)
+
+
+def _rewrite_aggregates(text, measures, dimension):
+    def replace(match):
+        func, arg = match.groups()
+        if arg == "*":
+            return "sum(row_count)::BIGINT"
+        if arg == dimension:
+            # Rows of the NULL group have no dimension value to count
+            return f"coalesce(sum(row_count) filter (where {dimension} is not null), 0)::BIGINT"
+        if func == "sum":
+            return f"sum(sum_{arg})"
+        if func == "count":
+            return f"sum(count_{arg})::BIGINT"
+        return f"(sum(sum_{arg}) / nullif(sum(count_{arg}), 0))"
+
+    return _AGGREGATE_RE.sub(replace, text)
+
+
+def _has_alias(item):
+    # ``avg(x) as a`` / ``avg(x) a``; a bare column reference is its own name
+    return bool(_ALIAS_RE.search(item)) and not item.endswith(")")
+
+
+def rewrite_query(con, sql_query, columns=None):
+    """Return ``sql_query`` rewritten against a rollup, or ``None``.
+
+    Only single-table GROUP BY queries on one rollup dimension whose other
+    column references are SUM/AVG/COUNT over rollup measures (or COUNT of
+    the dimension) qualify.
+    Output column names are pinned to those of the original query.
+    """
+    canonical = canonicalize_sql(sql_query)
+    match = _QUERY_RE.fullmatch(canonical)
+    if match is None or canonical.count("select") != 1 \
+            or _UNSUPPORTED_RE.search(canonical):
+        return None
+    dimension = match["group"]
+    if dimension not in ROLLUP_DIMENSIONS:
+        return None
+    table = rollup_table_name(dimension)
+    exists = con.execute(
+        "SELECT count(*) FROM duckdb_tables() WHERE table_name = ?", [table]
+    ).fetchone()[0]
+    if not exists:
+        return None
+
+    if columns is None:
+        columns = ROLLUP_DIMENSIONS + ROLLUP_MEASURES
+    measures = [m for m in ROLLUP_MEASURES if m in columns]
+    aggregates = _AGGREGATE_RE.findall(f"{match['select']}{match['tail']}")
+    if not all(_rewritable(func, arg, measures, dimension) for func, arg in aggregates):
+        return None
+    select = _rewrite_aggregates(match["select"], measures, dimension)
+    where = match["where"] or ""
+    tail = _rewrite_aggregates(match["tail"], measures, dimension)
+
+    # Any base column left outside an aggregate must be the group dimension
+    residual = _AGGREGATE_RE.sub(
+        "", f"{match['select']}{where}{match['tail']}"
+    )
+    for column in columns:
+        if column != dimension and re.search(rf"\b{column}\b", residual):
+            return None
+    if re.search(r"\*", residual):
+        return None
+
+    try:
+        described = sql_query.strip().rstrip(";")
+        names = [
+            row[0] for row in con.execute(f"DESCRIBE {described}").fetchall()
+        ]
+    except duckdb.Error:
+        return None
+    items = _split_top_level(select)
+    original_items = _split_top_level(match["select"])
+    if len(items) != len(names):
+        return None
+    aliased = []
+    for item, original, name in zip(items, original_items, names):
+        if _has_alias(original) or original == dimension:
+            aliased.append(item)
+        else:
+            escaped = name.replace('"', '""')
+            aliased.append(f'{item} AS "{escaped}"')
+    return (
+        f"select {', '.join(aliased)} from {table}{where}"
+        f" group by {dimension}{tail}"
+    )
+
+
+def execute_with_rollups(con, sql_query):
+    """Execute ``sql_query``, answering it from a rollup when possible.
+
+    Falls back to the base ``hsa_data`` view if the query does not match a
+    rollup or the rewritten query fails.
+    """
+    rewritten = rewrite_query(con, sql_query)
+    if rewritten is not None:
+        try:
+            return con.execute(rewritten)
+        except duckdb.Error as e:
+            logger.warning(f"Rollup rewrite failed, using base view: {e}")
+    return con.execute(sql_query)
@@ -0,0 +1,121 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+# Columns the Datasette deployment filters on; indexed after the load
+SQLITE_INDEX_COLUMNS = ['zip_cd_of_residence', 'medicare_prov_num']
+SQLITE_BATCH_SIZE = 50_000
+SQLITE_CACHE_SIZE_KB = 262_144  # 256 MB page cache while loading
+
+
+def sqlite_type(dtype):
+    """Explicit SQLite column type for a pandas dtype."""
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+class SQLiteBulkWriter:
+    """Bulk loader that leaves a query-optimized SQLite table behind.
+
+    Rows are inserted with batched ``executemany`` calls inside a single
+    transaction under load-time pragmas (large page cache, exclusive locking).
+    The table is created with explicit column types from the first chunk. On
+    a clean exit the ``index_columns`` are indexed, ``ANALYZE`` refreshes the
+    planner statistics and, if ``vacuum`` is set, ``VACUUM`` compacts the
+    file.
+
+    Use ``replace=True`` for a full rebuild: the table is written, with the
+    journal turned off, into a new database next to ``db_file_path`` that
+    replaces it only on success, so on error the old database is left as it
+    was. With ``replace=False`` rows are appended to an existing table and an
+    in-memory journal lets an error roll the transaction back.
+    """
+
+    def __init__(self, db_file_path, table_name, replace=True,
+                 index_columns=SQLITE_INDEX_COLUMNS, batch_size=SQLITE_BATCH_SIZE,
+                 vacuum=True):
+        self.db_file_path = db_file_path
+        self.table_name = table_name
+        self.replace = replace
+        self.index_columns = index_columns
+        self.batch_size = batch_size
+        self.vacuum = vacuum
+        self.rows_written = 0
+        self.conn = None
+        self._columns = None
+        self._build_path = f"{db_file_path}.tmp" if replace else db_file_path
+
+    def __enter__(self):
+        if self.replace and os.path.exists(self._build_path):
+            os.remove(self._build_path)  # left over from an interrupted build
+        # Autocommit mode: transactions are managed explicitly below
+        self.conn = sqlite3.connect(self._build_path, isolation_level=None)
+        journal_mode = 'OFF' if self.replace else 'MEMORY'
+        self.conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+        self.conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+        self.conn.execute("PRAGMA temp_store = MEMORY")
+        self.conn.execute("BEGIN")
+        return self
+
+    def _create_table(self, df):
+        columns = ", ".join(f'"{c}" {sqlite_type(df[c].dtype)}' for c in df.columns)
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.table_name}" ({columns})')
+        self._columns = list(df.columns)
+
+    def execute(self, sql, parameters=()):
+        return self.conn.execute(sql, parameters)
+
+    def write(self, df):
+        """Appends the rows of ``df`` in batches of ``batch_size``."""
+        if self._columns is None:
+            self._create_table(df)
+        names = ", ".join(f'"{c}"' for c in self._columns)
+        placeholders = ", ".join("?" for _ in self._columns)
+        sql = f'INSERT INTO "{self.table_name}" ({names}) VALUES ({placeholders})'
+        for start in range(0, len(df), self.batch_size):
+            batch = df.iloc[start:start + self.batch_size]
+            # ``tolist`` converts numpy scalars into types sqlite3 can bind
+            rows = zip(*(batch[c].tolist() for c in self._columns))
+            self.conn.executemany(sql, rows)
+        self.rows_written += len(df)
+
+    def _finalize(self):
+        columns = {row[1] for row in
+                   self.conn.execute(f'PRAGMA table_info("{self.table_name}")')}
+        for column in self.index_columns:
+            if column in columns:
+                self.conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "idx_{self.table_name}_{column}" '
+                    f'ON "{self.table_name}" ("{column}")'
+                )
+        self.conn.execute("COMMIT")
+        self.conn.execute("ANALYZE")
+        # Back to serving defaults; the locking mode change applies on next access
+        self.conn.execute("PRAGMA locking_mode = NORMAL")
+        self.conn.execute("PRAGMA journal_mode = DELETE")
+        if self.vacuum:
+            self.conn.execute("VACUUM")
+
+    def __exit__(self, exc_type, exc, tb):
+        committed = False
+        try:
+            if exc_type is None:
+                self._finalize()
+                committed = True
+            elif not self.replace:
+                self.conn.execute("ROLLBACK")
+        finally:
+            self.conn.close()
+            self.conn = None
+            if self.replace:
+                if committed:
+                    os.replace(self._build_path, self.db_file_path)
+                elif os.path.exists(self._build_path):
+                    os.remove(self._build_path)
+        return False
@@ -0,0 +1,179 @@
+import os
+import re
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from load_hsa_data import ETL_CHUNK_SIZE, PARQUET_COMPRESSION, clean_column_names
+
+# =========================
+# Configuration
+# =========================
+
+SYNTHETIC_CHUNK_SIZE = ETL_CHUNK_SIZE
+SYNTHETIC_ZIPS = 30_000       # roughly the number of populated US zip codes
+SYNTHETIC_PROVIDERS = 6_000   # roughly the number of Medicare hospitals
+ZIP_SKEW = 1.0                # Zipf exponents: a few zips/providers dominate
+PROVIDER_SKEW = 1.1
+SUPPRESSION_THRESHOLD = 11    # CMS publishes counts below 11 as '*'
+
+BUSINESS_BRANDS = {
+    "Autozone": "AutoZone Auto Parts",
+    "Napa Auto": "Napa Auto Parts",
+    "Firestone": "Firestone Complete Auto Care",
+    "O'Reilly Auto": "O'Reilly Auto Parts",
+    "Advance Auto": "Advance Auto Parts",
+    "Car Dealership": "Toyota of",
+    "Other Auto Repair Shops": "Main Street Auto Repair",
+}
+# Tennessee bounding box (lon/lat)
+TN_BOUNDS = (-90.31, 34.98, -81.65, 36.68)
+
+
+def parse_count(text):
+    """``"10M"`` -> 10_000_000; accepts k/M/B suffixes and underscores."""
+    match = re.fullmatch(r"\s*([\d_.]+)\s*([kmb]?)\s*", str(text).lower())
+    if not match:
+        raise ValueError(f"Not a row count: {text!r}")
+    scale = {"": 1, "k": 1_000, "m": 1_000_000, "b": 1_000_000_000}[match[2]]
+    return int(float(match[1].replace("_", "")) * scale)
+
+
+def _zipf_weights(n, skew):
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+# =========================
+# HSA Rows
+# =========================
+
+class HSAGenerator:
+    """Deterministic generator of Hospital Service Area rows.
+
+    Each row is one provider/zip pair as in the CMS file. Zips and providers
+    are drawn from Zipf distributions so a handful of each carry most of the
+    volume; cases are log-normal, days and charges scale with cases, and
+    counts below ``SUPPRESSION_THRESHOLD`` are suppressed (NaN, written as
+    ``*``). Chunk ``i`` depends only on ``seed`` and ``i``, so any scale can
+    be regenerated identically chunk by chunk.
+    """
+
+    def __init__(self, rows, seed=0, chunk_size=SYNTHETIC_CHUNK_SIZE,
+                 zips=SYNTHETIC_ZIPS, providers=SYNTHETIC_PROVIDERS,
+                 zip_skew=ZIP_SKEW, provider_skew=PROVIDER_SKEW):
+        self.rows = int(rows)
+        self.seed = seed
+        self.chunk_size = max(1, int(chunk_size))
+        rng = np.random.default_rng(seed)
+        # Popularity rank is shuffled so busy zips are spread over the range
+        self.zip_codes = rng.choice(np.arange(1001, 99951), size=zips, replace=False)
+        states = rng.integers(1, 54, size=providers)
+        self.provider_nums = states * 10_000 + rng.integers(1, 9_999, size=providers)
+        self.zip_weights = _zipf_weights(zips, zip_skew)
+        self.provider_weights = _zipf_weights(providers, provider_skew)
+
+    def chunk(self, index):
+        """Rows of chunk ``index`` as a DataFrame with the raw CMS columns."""
+        start = index * self.chunk_size
+        n = min(self.chunk_size, self.rows - start)
+        rng = np.random.default_rng([self.seed, index])
+        cases = np.maximum(1, rng.lognormal(mean=2.5, sigma=1.2, size=n)).astype(np.int64)
+        days = np.maximum(cases, (cases * rng.lognormal(1.5, 0.5, size=n))).astype(np.int64)
+        charges = (days * rng.lognormal(8.0, 0.6, size=n)).round().astype(np.int64)
+        df = pd.DataFrame({
+            'MEDICARE_PROV_NUM': self.provider_nums[rng.choice(
+                len(self.provider_nums), size=n, p=self.provider_weights)],
+            'ZIP_CD_OF_RESIDENCE': self.zip_codes[rng.choice(
+                len(self.zip_codes), size=n, p=self.zip_weights)],
+            'TOTAL_DAYS_OF_CARE': days.astype('float64'),
+            'TOTAL_CHARGES': charges.astype('float64'),
+            'TOTAL_CASES': cases.astype('float64'),
+        })
+        suppressed = cases < SUPPRESSION_THRESHOLD
+        df.loc[suppressed, ['TOTAL_DAYS_OF_CARE', 'TOTAL_CHARGES', 'TOTAL_CASES']] = np.nan
+        return df
+
+    def __iter__(self):
+        for index in range((self.rows + self.chunk_size - 1) // self.chunk_size):
+            yield self.chunk(index)
+
+
+def write_csv(generator, csv_file_path):
+    """Write the raw CMS-style CSV (``*`` for suppressed values)."""
+    os.makedirs(os.path.dirname(csv_file_path) or '.', exist_ok=True)
+    with open(csv_file_path, 'w', newline='') as f:
+        for i, chunk in enumerate(generator):
+            chunk.to_csv(f, index=False, header=i == 0, na_rep='*', float_format='%.0f')
+    return csv_file_path
+
+
+def write_parquet(generator, parquet_file_path):
+    """Write rows already in the ``app.py`` schema, skipping the ETL.
+
+    Suppressed values become 0 and zips are 5-character strings, matching
+    what queries against ``hsa_data`` expect.
+    """
+    os.makedirs(os.path.dirname(parquet_file_path) or '.', exist_ok=True)
+    writer = None
+    try:
+        for chunk in generator:
+            chunk.columns = clean_column_names(chunk.columns)
+            measures = ['total_days_of_care', 'total_charges', 'total_cases']
+            chunk[measures] = chunk[measures].fillna(0).astype('int64')
+            chunk['zip_cd_of_residence'] = chunk['zip_cd_of_residence'].astype(str).str.zfill(5)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(parquet_file_path, table.schema,
+                                          compression=PARQUET_COMPRESSION)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return parquet_file_path
+
+
+# =========================
+# Businesses
+# =========================
+
+def generate_businesses(count, seed=0):
+    """Auto businesses scattered over Tennessee, shaped like the Yellow Pages
+    extract ``plot_hsas.py`` reads (``name``, address fields, ``md_x``/``md_y``
+    and ``business_type``)."""
+    rng = np.random.default_rng(seed)
+    types = np.array(list(BUSINESS_BRANDS))
+    business_type = rng.choice(types, size=count)
+    west, south, east, north = TN_BOUNDS
+    numbers = rng.integers(100, 9999, size=count)
+    return pd.DataFrame({
+        'name': [BUSINESS_BRANDS[t] for t in business_type],
+        'address': [f"{n} Main St" for n in numbers],
+        'city': "Nashville",
+        'postal_code': rng.integers(37010, 38590, size=count).astype(str),
+        'md_x': rng.uniform(west, east, size=count),
+        'md_y': rng.uniform(south, north, size=count),
+        'business_type': business_type,
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic HSA data.")
+    parser.add_argument('output', help="Output .csv (raw CMS format) or .parquet path.")
+    parser.add_argument('--rows', default="1M", help="Row count, e.g. 1M, 50M, 500M.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=SYNTHETIC_CHUNK_SIZE)
+    parser.add_argument('--zips', type=int, default=SYNTHETIC_ZIPS)
+    parser.add_argument('--providers', type=int, default=SYNTHETIC_PROVIDERS)
+    args = parser.parse_args()
+
+    generator = HSAGenerator(parse_count(args.rows), seed=args.seed, chunk_size=args.chunk_size,
+                             zips=args.zips, providers=args.providers)
+    if args.output.endswith('.parquet'):
+        write_parquet(generator, args.output)
+    else:
+        write_csv(generator, args.output)
+    print(f"Wrote {generator.rows:,} rows to {args.output}")
@@ -0,0 +1,245 @@
+import os
+import re
+
+from rollups import BASE_VIEW, ROLLUP_DIMENSIONS, ROLLUP_MEASURES
+from translation_cache import normalize_nl_query
+
+# =========================
+# Configuration
+# =========================
+
+# Share of the question's content words a template must account for
+TEMPLATE_MIN_CONFIDENCE = float(os.getenv("HSA_TEMPLATE_MIN_CONFIDENCE", "0.9"))
+DEFAULT_TOP_N = 10
+
+# Extra phrasings on top of the ones derived from the column names
+COLUMN_SYNONYMS = {
+    "total_charges": ["charges", "charge", "cost", "costs", "spending", "billed amount"],
+    "total_days_of_care": ["days of care", "care days", "days", "length of stay",
+                           "inpatient days"],
+    "total_cases": ["cases", "case count", "admissions", "discharges", "visits"],
+    "zip_cd_of_residence": ["zip code", "zip codes", "zipcode", "zipcodes", "zip", "zips",
+                            "residence zip", "postal code"],
+    "medicare_prov_num": ["provider", "providers", "provider number", "hospital",
+                          "hospitals", "facility", "facilities", "medicare provider"],
+    "hsanum": ["hsa", "hsas", "hospital service area", "hospital service areas",
+               "service area", "service areas"],
+    "hrrnum": ["hrr", "hrrs", "hospital referral region", "hospital referral regions",
+               "referral region", "referral regions"],
+}
+
+AGGREGATE_WORDS = {
+    "sum": "SUM", "total": "SUM",
+    "average": "AVG", "avg": "AVG", "mean": "AVG",
+    "count": "COUNT",
+    "maximum": "MAX", "max": "MAX",
+    "minimum": "MIN", "min": "MIN",
+}
+# Measures that already are counts: "count of cases" asks for their sum
+COUNTED_MEASURES = {"total_cases", "total_days_of_care"}
+COMPARATORS = {
+    "greater than": ">", "more than": ">", "over": ">", "above": ">", "exceeds": ">",
+    "exceeding": ">", ">": ">",
+    "at least": ">=", ">=": ">=",
+    "less than": "<", "fewer than": "<", "under": "<", "below": "<", "<": "<",
+    "at most": "<=", "<=": "<=",
+    "equal to": "=", "equals": "=", "exactly": "=", "=": "=",
+}
+DESCENDING_WORDS = {"top", "highest", "most", "largest", "biggest"}
+ASCENDING_WORDS = {"bottom", "lowest", "least", "fewest", "smallest"}
+GROUP_WORDS = ["grouped by", "group by", "broken down by", "each", "every", "by", "per",
+               "across"]
+# Words that carry no meaning for the templates (verbs, articles, "table")
+STOPWORDS = {
+    "show", "list", "give", "get", "calculate", "compute", "find", "display",
+    "return", "tell", "what", "which", "is", "are", "was", "the", "a", "an", "of",
+    "me", "please", "all", "and", "i", "want", "to", "see", "in", "for", "have",
+    "has", "had", "that", "their", "its", "data", "table", BASE_VIEW,
+    "number", "amount", "value", "values",
+}
+ROW_WORDS = {"rows", "records", "entries", "row", "record"}
+_MULTIPLIERS = {"k": 1_000, "thousand": 1_000, "m": 1_000_000, "million": 1_000_000}
+
+
+def _alternation(phrases):
+    # Longest phrase first so "days of care" wins over "days"
+    return "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+
+
+def _expand_number(g):
+    value = float(g[1]) * _MULTIPLIERS[g[2]]
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+class TemplateMatch:
+    """SQL produced by a template, with the intent and confidence behind it."""
+
+    def __init__(self, sql, intent, confidence):
+        self.sql = sql
+        self.intent = intent
+        self.confidence = confidence
+
+
+# =========================
+# Template Translator
+# =========================
+
+class TemplateTranslator:
+    """Deterministic NL-to-SQL for the common question shapes.
+
+    Column mentions (names and synonyms) are replaced by ``@column`` tokens,
+    threshold and equality filters are pulled out, and what is left is
+    matched against three shapes: aggregate a measure by a dimension, top-N
+    dimension values by a measure, and filtered rows. ``confidence`` is the
+    share of the question's content words the match accounts for; matches
+    below ``min_confidence`` are discarded so the caller can use the LLM.
+
+    ``region_tables`` maps region id columns (``hsanum``, ``hrrnum``) to
+    tables of measures already summed per region; unfiltered totals by
+    region are read from them, other region questions go to the LLM.
+    """
+
+    def __init__(self, schema, table=BASE_VIEW, min_confidence=TEMPLATE_MIN_CONFIDENCE,
+                 region_tables=None):
+        self.table = table
+        self.min_confidence = min_confidence
+        self.column_types = {c["column_name"]: c["column_type"] for c in schema}
+        self.measures = [c for c in ROLLUP_MEASURES if c in self.column_types]
+        self.dimensions = [c for c in ROLLUP_DIMENSIONS if c in self.column_types]
+        self.region_tables = dict(region_tables or {})
+
+        phrases = {}
+        for column in [*self.column_types, *self.region_tables]:
+            spaced = column.replace("_", " ")
+            for phrase in [column, spaced, *COLUMN_SYNONYMS.get(column, [])]:
+                phrases[phrase] = column
+        self._phrases = phrases
+        self._column_re = re.compile(rf"\b(?:{_alternation(phrases)})\b")
+
+        m = "@(?P<measure>{})".format("|".join(self.measures))
+        d = "@(?P<dim>{})".format("|".join(self.dimensions))
+        grouped = "@(?P<dim>{})".format("|".join(self.dimensions + list(self.region_tables)))
+        agg = "(?P<agg>{})".format(_alternation(AGGREGATE_WORDS))
+        by = "(?:{})".format(_alternation(GROUP_WORDS))
+        order = "(?P<order>{})".format(_alternation(DESCENDING_WORDS | ASCENDING_WORDS))
+        n = r"(?P<n>\d+)"
+        rows = "(?:{})".format(_alternation(ROW_WORDS))
+        number = r"-?\d+(?:\.\d+)?"
+
+        self._filter_re = re.compile(
+            rf"(?:(?:where|with|whose) )?@(?P<column>[a-z_]+) "
+            rf"(?P<cmp>{_alternation(COMPARATORS)}) (?P<value>{number})"
+        )
+        self._equals_re = re.compile(rf"(?:(?:where|with) )?{d} (?P<value>\d+)\b")
+        self._intents = [
+            ("top_n", re.compile(rf"{order} (?:{n} )?{grouped} (?:{by} |with )?(?:{agg} )?{m}")),
+            ("top_n", re.compile(rf"(?:{n} )?{grouped} (?:with )?{order} (?:{agg} )?{m}")),
+            ("top_rows", re.compile(rf"{order} (?:{n} )?{rows} (?:{by} )?{m}")),
+            ("aggregate", re.compile(rf"(?:{agg} )?{m} {by} {grouped}")),
+            ("aggregate", re.compile(rf"{by} {grouped} (?:{agg} )?{m}")),
+            ("aggregate_all", re.compile(rf"{agg} {m}")),
+            ("rows", re.compile(rf"{rows}")),
+        ]
+
+    # --- tokenizing ------------------------------------------------------
+
+    def _prepare(self, nl_query):
+        text = normalize_nl_query(nl_query)
+        text = re.sub(r"(?<=\d),(?=\d{3})", "", text)
+        text = re.sub(r"(\d+(?:\.\d+)?)\s*(k|m|thousand|million)\b", _expand_number, text)
+        text = re.sub(r"(>=|<=|[<>=])", r" \1 ", text)
+        text = re.sub(r"[^a-z0-9_.@<>= -]", " ", text)
+        text = self._column_re.sub(lambda g: f"@{self._phrases[g[0]]}", text)
+        return text.split()
+
+    def _literal(self, column, value):
+        if self.column_types[column].upper() in ("VARCHAR", "TEXT"):
+            return f"'{value}'"
+        return value
+
+    # --- translation -----------------------------------------------------
+
+    def match(self, nl_query):
+        """Return the best ``TemplateMatch`` for ``nl_query`` or ``None``."""
+        tokens = [t for t in self._prepare(nl_query) if t not in STOPWORDS]
+        if not tokens:
+            return None
+        text = " ".join(tokens)
+
+        conditions = []
+
+        def take_filter(g):
+            if g["column"] not in self.column_types:
+                return g[0]
+            value = g["value"]
+            if g["cmp"] == "=":
+                value = self._literal(g["column"], value)
+            conditions.append(f"{g['column']} {COMPARATORS[g['cmp']]} {value}")
+            return "~"
+
+        def take_equals(g):
+            conditions.append(f"{g['dim']} = {self._literal(g['dim'], g['value'])}")
+            return "~"
+
+        text = self._filter_re.sub(take_filter, text)
+        text = self._equals_re.sub(take_equals, text)
+        remaining = [t for t in text.split() if t != "~"]
+        explained = len(tokens) - len(remaining)
+        text = " ".join(remaining)
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        found = None
+        for intent, pattern in self._intents:
+            g = pattern.search(text)
+            if g:
+                found = intent, g
+                break
+        if found is None:
+            if not conditions or remaining:
+                return None
+            found = "rows", None
+        else:
+            explained += len(g[0].split())
+
+        confidence = explained / len(tokens)
+        if confidence < self.min_confidence:
+            return None
+        intent, g = found
+        sql = self._sql(intent, g, where)
+        if sql is None:
+            return None
+        return TemplateMatch(sql, intent, confidence)
+
+    def _sql(self, intent, g, where):
+        table = self.table
+        if intent == "rows":
+            return f"SELECT * FROM {table}{where};"
+        g = g.groupdict()
+        n = int(g["n"]) if g.get("n") else DEFAULT_TOP_N
+        direction = "ASC" if g.get("order") in ASCENDING_WORDS else "DESC"
+        if intent == "top_rows":
+            return (f"SELECT * FROM {table}{where} "
+                    f"ORDER BY {g['measure']} {direction} LIMIT {n};")
+
+        func = AGGREGATE_WORDS[g["agg"]] if g.get("agg") else "SUM"
+        measure = g["measure"]
+        if func == "COUNT" and measure in COUNTED_MEASURES:
+            func = "SUM"
+        alias = f"{func.lower()}_{measure}"
+        if intent == "aggregate_all":
+            return f"SELECT {func}({measure}) AS {alias} FROM {table}{where};"
+        dim = g["dim"]
+        if dim in self.region_tables:
+            if func != "SUM" or where:
+                return None  # the region tables only hold unfiltered sums
+            select = f"SELECT {dim}, {measure} AS {alias} FROM {self.region_tables[dim]}"
+        else:
+            select = f"SELECT {dim}, {func}({measure}) AS {alias} FROM {table}{where} GROUP BY {dim}"
+        if intent == "top_n":
+            return f"{select} ORDER BY {alias} {direction} LIMIT {n};"
+        return f"{select} ORDER BY {dim};"
+
+    def translate(self, nl_query):
+        """Return SQL for ``nl_query`` or ``None`` when no template is confident."""
+        found = self.match(nl_query)
+        return found.sql if found else None
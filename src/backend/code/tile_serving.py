@@ -0,0 +1,368 @@
+import os
+import json
+import math
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+import shapely
+from branca.element import MacroElement
+from jinja2 import Template
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from boundaries import BOUNDARY_LEVELS, boundary_level, to_geojson
+from map_rendering import ALL_BUSINESSES, MARKER_COORD_DECIMALS, POPUP_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Configuration
+# =========================
+
+MAP_TILES = os.getenv("HSA_MAP_TILES", "0") == "1"  # maps fetch features per viewport
+TILE_PORT = int(os.getenv("HSA_TILE_PORT", "7861"))
+# Base URL the browser reaches the tile server at
+TILE_URL = os.getenv("HSA_TILE_URL", f"http://localhost:{TILE_PORT}")
+TILE_MAX_AGE = int(os.getenv("HSA_TILE_MAX_AGE", "3600"))
+# Past this many businesses in a request they are returned as grid clusters
+TILE_MAX_POINTS = int(os.getenv("HSA_TILE_MAX_POINTS", "2000"))
+TILE_CLUSTER_CELLS = 32  # clusters per side of the requested area
+TILE_MAX_ZOOM = 22
+BUSINESS_LAYER = "businesses"
+
+
+def tile_bounds(z, x, y):
+    """``(west, south, east, north)`` in degrees of web-mercator tile z/x/y."""
+    if not 0 <= z <= TILE_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValueError(f"No tile {z}/{x}/{y}.")
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def parse_bbox(text):
+    """``"west,south,east,north"`` -> tuple of floats."""
+    try:
+        west, south, east, north = (float(v) for v in text.split(","))
+    except (AttributeError, ValueError):
+        raise ValueError("bbox must be west,south,east,north in degrees.")
+    if not (west <= east and south <= north) or not all(map(math.isfinite, (west, south, east, north))):
+        raise ValueError("bbox must be west,south,east,north in degrees.")
+    return west, south, east, north
+
+
+# =========================
+# Spatial Indexes
+# =========================
+
+class FeatureIndex:
+    """STRtree over one boundary artifact's features.
+
+    Each feature's GeoJSON text is kept as written (already simplified and
+    quantized), so a query only joins the strings of the features whose
+    geometry intersects the requested area.
+    """
+
+    def __init__(self, features):
+        self._text = [json.dumps(f, separators=(",", ":")) for f in features]
+        geometries = shapely.from_geojson([json.dumps(f["geometry"]) for f in features])
+        self._tree = shapely.STRtree(geometries)
+
+    @classmethod
+    def from_source(cls, source):
+        """From a GeoJSON path or a GeoDataFrame."""
+        if isinstance(source, (str, os.PathLike)):
+            with open(source) as f:
+                collection = json.load(f)
+        else:
+            collection = json.loads(to_geojson(source))
+        return cls(collection["features"])
+
+    def __len__(self):
+        return len(self._text)
+
+    def query(self, bbox):
+        """FeatureCollection text of the features intersecting ``bbox``."""
+        found = np.sort(self._tree.query(shapely.box(*bbox), predicate="intersects"))
+        features = ",".join(self._text[i] for i in found)
+        return '{"type":"FeatureCollection","features":[' + features + "]}"
+
+
+class PointIndex:
+    """STRtree over business locations, with clustering for crowded areas.
+
+    Up to ``max_points`` businesses in a request are returned one feature
+    each with their popup fields; more are binned into a
+    ``cells`` x ``cells`` grid over the request and returned as one point per
+    occupied cell (at its businesses' mean location) with a ``count``.
+    """
+
+    def __init__(self, businesses, lat="md_y", lon="md_x", type_column="business_type",
+                 max_points=TILE_MAX_POINTS, cells=TILE_CLUSTER_CELLS):
+        lats = pd.to_numeric(businesses[lat], errors="coerce").to_numpy(dtype="float64")
+        lons = pd.to_numeric(businesses[lon], errors="coerce").to_numpy(dtype="float64")
+        valid = np.isfinite(lats) & np.isfinite(lons)
+        self.lats, self.lons = lats[valid], lons[valid]
+        self.types = businesses[type_column][valid].astype(str).to_numpy()
+        self.fields = {field: businesses[field][valid].fillna("N/A").astype(str).to_numpy()
+                       for field in POPUP_FIELDS if field in businesses.columns}
+        self.max_points = max_points
+        self.cells = cells
+        self._tree = shapely.STRtree(shapely.points(self.lons, self.lats))
+
+    def __len__(self):
+        return len(self.lats)
+
+    def query(self, bbox, business_types=None):
+        """FeatureCollection text of the businesses (or clusters) in ``bbox``."""
+        found = np.sort(self._tree.query(shapely.box(*bbox), predicate="intersects"))
+        if business_types and ALL_BUSINESSES not in business_types:
+            found = found[np.isin(self.types[found], list(business_types))]
+        if len(found) <= self.max_points:
+            features = [self._feature(self.lons[i], self.lats[i], self._properties(i)) for i in found]
+        else:
+            features = self._clusters(found, bbox)
+        return json.dumps({"type": "FeatureCollection", "features": features}, separators=(",", ":"))
+
+    def _properties(self, i):
+        properties = {field: values[i] for field, values in self.fields.items()}
+        properties["business_type"] = self.types[i]
+        return properties
+
+    @staticmethod
+    def _feature(lon, lat, properties):
+        return {"type": "Feature", "properties": properties,
+                "geometry": {"type": "Point", "coordinates": [round(float(lon), MARKER_COORD_DECIMALS),
+                                                              round(float(lat), MARKER_COORD_DECIMALS)]}}
+
+    def _clusters(self, found, bbox):
+        west, south, east, north = bbox
+        lons, lats = self.lons[found], self.lats[found]
+        col = np.clip(((lons - west) / max(east - west, 1e-12) * self.cells).astype(np.int64), 0, self.cells - 1)
+        row = np.clip(((lats - south) / max(north - south, 1e-12) * self.cells).astype(np.int64), 0, self.cells - 1)
+        _, cell_of = np.unique(row * self.cells + col, return_inverse=True)
+        counts = np.bincount(cell_of)
+        mean_lon = np.bincount(cell_of, weights=lons) / counts
+        mean_lat = np.bincount(cell_of, weights=lats) / counts
+        return [self._feature(x, y, {"count": int(n)}) for x, y, n in zip(mean_lon, mean_lat, counts)]
+
+
+# =========================
+# Tile Server
+# =========================
+
+class TileServer:
+    """Viewport queries over boundary layers and businesses.
+
+    ``boundaries`` maps a layer name to ``load(zoom)``, returning the
+    artifact (GeoJSON path or GeoDataFrame) drawn at that ``BOUNDARY_LEVELS``
+    zoom; ``businesses`` returns the business DataFrame. Indexes are built
+    the first time a layer and level are asked for.
+    """
+
+    def __init__(self, boundaries, businesses, max_points=TILE_MAX_POINTS):
+        self.boundaries = boundaries
+        self.businesses = businesses
+        self.max_points = max_points
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def layers(self):
+        return list(self.boundaries) + [BUSINESS_LAYER]
+
+    def _index(self, layer, level):
+        key = (layer, level)
+        if key not in self._indexes:
+            with self._lock:
+                if key not in self._indexes:
+                    if layer == BUSINESS_LAYER:
+                        index = PointIndex(self.businesses(), max_points=self.max_points)
+                    else:
+                        index = FeatureIndex.from_source(self.boundaries[layer](level))
+                    logger.info(f"Indexed {len(index)} {layer} features"
+                                f"{f' at zoom {level}' if level is not None else ''}")
+                    self._indexes[key] = index
+        return self._indexes[key]
+
+    def query(self, layer, bbox, zoom, business_types=None):
+        """GeoJSON text of ``layer``'s features in ``bbox`` as drawn at ``zoom``."""
+        if layer == BUSINESS_LAYER:
+            return self._index(layer, None).query(bbox, business_types)
+        if layer not in self.boundaries:
+            raise KeyError(layer)
+        return self._index(layer, boundary_level(zoom)).query(bbox)
+
+    def tile(self, layer, z, x, y, business_types=None):
+        return self.query(layer, tile_bounds(z, x, y), z, business_types)
+
+
+def _types(request):
+    types = request.query_params.get("types")
+    return [t for t in types.split(",") if t] if types else None
+
+
+def _geojson(text, max_age):
+    return Response(text, media_type="application/geo+json",
+                    headers={"cache-control": f"public, max-age={max_age}"})
+
+
+def create_tile_app(boundaries, businesses, max_points=TILE_MAX_POINTS, max_age=TILE_MAX_AGE):
+    """Starlette app serving ``TileServer`` queries (``app.state.tiles``).
+
+    ``GET /tiles/{layer}/{z}/{x}/{y}.geojson`` answers one web-mercator tile
+    and ``GET /bbox/{layer}?bbox=w,s,e,n&zoom=z`` an arbitrary viewport; the
+    ``businesses`` layer also takes ``types=a,b``. ``GET /layers`` lists the
+    layers and simplification zooms.
+    """
+    tiles = TileServer(boundaries, businesses, max_points)
+
+    def answer(layer, compute):
+        if layer not in tiles.layers:
+            raise HTTPException(404, f"Unknown layer {layer!r}; expected one of {tiles.layers}.")
+        try:
+            return _geojson(compute(), max_age)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+    # Plain functions: Starlette runs them in its thread pool
+    def tile(request):
+        p = request.path_params
+        return answer(p["layer"], lambda: tiles.tile(p["layer"], p["z"], p["x"], p["y"], _types(request)))
+
+    def bbox(request):
+        layer = request.path_params["layer"]
+
+        def compute():
+            try:
+                zoom = int(request.query_params.get("zoom", min(BOUNDARY_LEVELS)))
+            except ValueError:
+                raise ValueError("zoom must be an integer.")
+            return tiles.query(layer, parse_bbox(request.query_params.get("bbox")), zoom, _types(request))
+
+        return answer(layer, compute)
+
+    def layers(request):
+        return JSONResponse({"layers": tiles.layers, "levels": sorted(BOUNDARY_LEVELS)})
+
+    app = Starlette(
+        routes=[
+            Route("/tiles/{layer}/{z:int}/{x:int}/{y:int}.geojson", tile),
+            Route("/bbox/{layer}", bbox),
+            Route("/layers", layers),
+        ],
+        # The dashboard page is served from another port
+        middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["GET"])],
+    )
+    app.state.tiles = tiles
+    return app
+
+
+def start_tile_server(app, port=TILE_PORT, host="0.0.0.0"):
+    """Serve ``app`` with uvicorn from a daemon thread; returns the server."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="tiles", daemon=True).start()
+    return server
+
+
+# =========================
+# Viewport Map Layer
+# =========================
+
+class ViewportLayers(MacroElement):
+    """Boundaries and businesses fetched from the tile server for the view.
+
+    On every pan or zoom the map requests the visible area (padded by half a
+    screen) and redraws it; a view still inside the last request at the same
+    simplification level is not fetched again.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function () {
+            var map = {{ this._parent.get_name() }};
+            var base = {{ this.url|tojson }};
+            var layer = {{ this.layer|tojson }};
+            var types = {{ this.types|tojson }};
+            var levels = {{ this.levels|tojson }};
+            var boundaries = L.geoJSON(null, {
+                style: function () { return {color: "#3388ff", weight: 2, fillOpacity: 0.1}; }
+            }).addTo(map);
+            var shops = L.geoJSON(null, {
+                pointToLayer: function (feature, latlng) {
+                    var n = feature.properties.count;
+                    if (n) {
+                        return L.circleMarker(latlng, {radius: 6 + 3 * Math.log10(n), color: "#d35400",
+                            fillOpacity: 0.6}).bindTooltip(n + " shops");
+                    }
+                    return L.circleMarker(latlng, {radius: 5, color: "#2a81cb", fillOpacity: 0.9});
+                },
+                onEachFeature: function (feature, marker) {
+                    var p = feature.properties;
+                    if (p.count) { return; }
+                    marker.bindPopup(function () {
+                        var div = document.createElement("div");
+                        var title = document.createElement("b");
+                        title.textContent = p.name || "N/A";
+                        div.appendChild(title);
+                        div.appendChild(document.createElement("br"));
+                        div.appendChild(document.createTextNode(
+                            (p.address || "N/A") + ", " + (p.city || "N/A") + ", TN " + (p.postal_code || "N/A")));
+                        return div;
+                    });
+                }
+            }).addTo(map);
+            function level(zoom) {
+                for (var i = 0; i < levels.length; i++) { if (zoom <= levels[i]) { return levels[i]; } }
+                return levels[levels.length - 1];
+            }
+            function loader(target, path, extra, byLevel) {
+                var loaded = null, request = 0;
+                return function () {
+                    var view = map.getBounds(), zoom = map.getZoom();
+                    var key = byLevel ? level(zoom) : zoom;
+                    if (loaded && loaded.key === key && loaded.bounds.contains(view)) { return; }
+                    var bounds = view.pad(0.5), current = ++request;
+                    var bbox = [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()]
+                        .map(function (v) { return v.toFixed(5); }).join(",");
+                    fetch(base + path + "?bbox=" + bbox + "&zoom=" + zoom + extra)
+                        .then(function (response) { return response.json(); })
+                        .then(function (data) {
+                            if (current !== request) { return; }
+                            target.clearLayers();
+                            target.addData(data);
+                            loaded = {key: key, bounds: bounds};
+                        });
+                };
+            }
+            var refreshers = [
+                loader(boundaries, "/bbox/" + encodeURIComponent(layer), "", true),
+                loader(shops, "/bbox/businesses",
+                       types.length ? "&types=" + types.map(encodeURIComponent).join(",") : "", false)
+            ];
+            function refresh() { refreshers.forEach(function (f) { f(); }); }
+            map.on("moveend", refresh);
+            map.whenReady(refresh);
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, layer, business_filters=None, url=TILE_URL):
+        super().__init__()
+        self._name = "ViewportLayers"
+        self.url = url.rstrip("/")
+        self.layer = layer
+        filters = list(business_filters or [])
+        self.types = [] if not filters or ALL_BUSINESSES in filters else filters
+        self.levels = sorted(BOUNDARY_LEVELS)
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# =========================
+# Configuration
+# =========================
+
+TRANSLATION_CACHE_PATH = os.getenv(
+    "HSA_TRANSLATION_CACHE_PATH", "translation_cache.db"
+)
+TRANSLATION_CACHE_TTL_SECONDS = float(
+    os.getenv("HSA_TRANSLATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600))
+)
+TRANSLATION_CACHE_MAX_ENTRIES = int(
+    os.getenv("HSA_TRANSLATION_CACHE_MAX_ENTRIES", "10000")
+)
+TRANSLATION_CACHE_MEMORY_ENTRIES = int(
+    os.getenv("HSA_TRANSLATION_CACHE_MEMORY_ENTRIES", "512")
+)
+
+
+def normalize_nl_query(nl_query):
+    """Lower-case, trim and collapse whitespace/trailing punctuation."""
+    text = re.sub(r"\s+", " ", nl_query.strip().lower())
+    return text.rstrip(" ?.!;")
+
+
+def cache_namespace(schema, model):
+    """Hash of everything besides the question that shapes a translation."""
+    payload = json.dumps({"schema": schema, "model": model}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# =========================
+# Translation Cache
+# =========================
+
+class TranslationCache:
+    """NL-to-SQL cache: in-memory LRU in front of a SQLite store on disk.
+
+    Entries are keyed on the normalized question within a namespace derived
+    from the schema and model, so a schema or model change drops every
+    previous translation. Entries expire after ``ttl`` seconds and the disk
+    store is trimmed to ``max_entries`` least recently used rows.
+    """
+
+    def __init__(self, path=TRANSLATION_CACHE_PATH, schema=None, model=None,
+                 ttl=TRANSLATION_CACHE_TTL_SECONDS,
+                 max_entries=TRANSLATION_CACHE_MAX_ENTRIES,
+                 memory_entries=TRANSLATION_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.namespace = cache_namespace(schema, model)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " namespace TEXT NOT NULL,"
+            " nl_query TEXT NOT NULL,"
+            " sql_query TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        # Translations made against another schema or model are stale.
+        self._conn.execute(
+            "DELETE FROM translations WHERE namespace != ?", (self.namespace,)
+        )
+        self._conn.commit()
+
+    def _key(self, nl_query):
+        normalized = normalize_nl_query(nl_query)
+        return hashlib.sha256(
+            f"{self.namespace}:{normalized}".encode("utf-8")
+        ).hexdigest()
+
+    def _remember(self, key, sql_query, created_at):
+        self._memory[key] = (sql_query, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, nl_query):
+        """Return the cached SQL for ``nl_query`` or ``None``."""
+        key = self._key(nl_query)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT sql_query, created_at FROM translations"
+                    " WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                entry = tuple(row) if row else None
+            if entry is not None and now - entry[1] > self.ttl:
+                self._memory.pop(key, None)
+                self._conn.execute(
+                    "DELETE FROM translations WHERE key = ?", (key,)
+                )
+                self._conn.commit()
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, *entry)
+            self._conn.execute(
+                "UPDATE translations SET accessed_at = ? WHERE key = ?",
+                (now, key),
+            )
+            self._conn.commit()
+            return entry[0]
+
+    def put(self, nl_query, sql_query):
+        key = self._key(nl_query)
+        now = time.time()
+        with self._lock:
+            self._remember(key, sql_query, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations"
+                " (key, namespace, nl_query, sql_query, created_at,"
+                " accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.namespace, normalize_nl_query(nl_query),
+                 sql_query, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute(
+            "DELETE FROM translations WHERE created_at < ?", (now - self.ttl,)
+        )
+        self._conn.execute(
+            "DELETE FROM translations WHERE key IN ("
+            " SELECT key FROM translations ORDER BY accessed_at DESC"
+            " LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM translations")
+            self._conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend modules live in a flat ``code`` directory (not a package, and
+# ``code`` would shadow the standard library), so expose it on ``sys.path``.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "code"))
@@ -0,0 +1,57 @@
+import importlib
+import inspect
+import os
+
+import pandas as pd
+import pytest
+
+from paged_results import PAGE_SIZE
+
+pytest.importorskip("openai")
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    root = tmp_path_factory.mktemp("app")
+    dataset = root / "hsas.parquet"
+    pd.DataFrame({
+        "zip_cd_of_residence": [f"37{i % 100:03d}" for i in range(1_200)],
+        "medicare_prov_num": [i % 7 for i in range(1_200)],
+        "total_charges": list(range(1_200)),
+        "total_days_of_care": [41 + i % 3 for i in range(1_200)],
+        "total_cases": [1] * 1_200,
+    }).to_parquet(dataset)
+    env = {
+        "HSA_DATASET_PATH": str(dataset),
+        "HSA_CROSSWALK_PATH": str(root / "zip_hsa_hrr.parquet"),
+        "HSA_TRANSLATION_CACHE_PATH": str(root / "translations.db"),
+        "HSA_METRICS_PORT": "0",
+    }
+    previous = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        import app
+        yield importlib.reload(app)
+    finally:
+        for k, v in previous.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+@pytest.mark.asyncio
+async def test_example_and_page_buttons_are_awaited(app) -> None:
+    example = app.example_click_handler("SELECT * FROM hsa_data ORDER BY total_charges;")
+    previous, following = app.page_handler(-1), app.page_handler(+1)
+    for handler in (example, previous, following):
+        assert inspect.iscoroutinefunction(handler)
+
+    sql, _, first, _, label, result_id, page = await example(None)
+    assert isinstance(first, pd.DataFrame) and len(first) == PAGE_SIZE
+    assert page == 0 and label.startswith("Page 1")
+
+    second, label, page = await following(result_id, page)
+    assert page == 1 and second["total_charges"].iloc[0] == len(first)
+    back, label, page = await previous(result_id, page)
+    assert page == 0 and back.equals(first)
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from async_pipeline import SingleFlight, run_blocking
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution() -> None:
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(True)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    results = await asyncio.gather(*(flight.do("q", work) for _ in range(5)))
+    assert results == [1] * 5
+    assert flight.stats() == {"calls": 1, "shared": 4, "in_flight": 0}
+
+    # The key is forgotten once the call finishes
+    assert await flight.do("q", work) == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_cached() -> None:
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*(flight.do("q", fail) for _ in range(3)),
+                                   return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.calls == 1
+    assert await flight.do("q", lambda: run_blocking(sum, [1, 2])) == 3
@@ -0,0 +1,65 @@
+import json
+import os
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import LineString, box
+from shapely.ops import split
+
+from boundaries import boundary_level, boundary_path, prepare_boundaries, simplify_layer
+
+
+def noisy_coverage():
+    """Two polygons sharing a 3,000-vertex border, plus an extra column."""
+    rng = np.random.default_rng(0)
+    x = np.linspace(-87.1, -84.9, 3_000)
+    y = 36 + np.cumsum(rng.normal(0, 0.002, x.size))
+    halves = split(box(-87, 35, -85, 37), LineString(np.column_stack([x, y])))
+    return gpd.GeoDataFrame({"hsanum": [1, 2], "hsacity": ["A", "B"], "unused": ["x", "y"]},
+                            geometry=list(halves.geoms), crs="EPSG:4326")
+
+
+def test_simplified_layer_keeps_shared_border_and_needed_columns() -> None:
+    full = noisy_coverage()
+    simplified = simplify_layer(full, 0.005, 3, ["hsanum", "hsacity"])
+
+    assert list(simplified.columns) == ["hsanum", "hsacity", "geometry"]
+    assert shapely.get_num_coordinates(simplified.geometry.values).sum() < 0.1 * \
+        shapely.get_num_coordinates(full.geometry.values).sum()
+    # No gaps or overlaps between the neighbours after simplification
+    areas = shapely.area(simplified.geometry.values)
+    union = shapely.union_all(simplified.geometry.values)
+    assert abs(union.area - areas.sum()) < 1e-9
+    assert abs(union.area - shapely.area(full.geometry.values).sum()) < 1e-3
+    assert simplified.is_valid.all()
+    coords = shapely.get_coordinates(simplified.geometry.values)
+    assert np.array_equal(coords, np.round(coords, 3))
+
+
+def test_prepare_boundaries_writes_levels_and_skips_up_to_date(tmp_path) -> None:
+    source = tmp_path / "hsa.shp"
+    source.write_text("")
+    out_dir = str(tmp_path / "boundaries")
+    manifest = prepare_boundaries({"HSAs": noisy_coverage()}, out_dir,
+                                  source_paths={"HSAs": str(source)})
+
+    levels = manifest["HSAs"]["levels"]
+    assert levels["7"]["bytes"] * 10 < manifest["HSAs"]["full_bytes"]
+    assert levels["7"]["bytes"] < levels["10"]["bytes"] < levels["13"]["bytes"]
+    path = boundary_path("HSAs", zoom=7, out_dir=out_dir)
+    with open(path) as f:
+        assert len(json.load(f)["features"]) == 2
+
+    assert boundary_level(3) == 7 and boundary_level(8) == 10 and boundary_level(18) == 13
+    built = os.path.getmtime(path)
+
+    def not_needed():
+        raise AssertionError("up-to-date layers are not loaded")
+
+    prepare_boundaries({"HSAs": not_needed}, out_dir, source_paths={"HSAs": str(source)})
+    assert os.path.getmtime(path) == built
+
+    os.utime(source, (built + 10, built + 10))
+    prepare_boundaries({"HSAs": noisy_coverage()}, out_dir, source_paths={"HSAs": str(source)})
+    assert os.path.getmtime(path) > built
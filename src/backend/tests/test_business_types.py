@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from business_types import BUSINESS_TYPE_RULES, DEFAULT_BUSINESS_TYPE, BusinessTypeClassifier
+
+
+def nested_where(names, rules=BUSINESS_TYPE_RULES, default=DEFAULT_BUSINESS_TYPE):
+    """The rules tested one after another, as ``plot_hsas`` used to."""
+    result = np.full(len(names), default, dtype=object)
+    decided = np.zeros(len(names), dtype=bool)
+    for label, patterns in rules:
+        hit = np.zeros(len(names), dtype=bool)
+        for pattern in patterns:
+            hit |= names.str.contains(pattern, case=False, regex=False, na=False).to_numpy()
+        result[hit & ~decided] = label
+        decided |= hit
+    return result
+
+
+def test_classify_matches_rules_in_order() -> None:
+    rng = np.random.default_rng(0)
+    words = ["Autozone", "NAPA AUTO PARTS", "firestone complete auto care", "O'Reilly Auto Parts",
+             "Advance Auto Parts", "Honda", "GMC", "kia", "Joe's", "Garage", "Tire", "Ford", "Body"]
+    names = pd.Series([" ".join(rng.choice(words, rng.integers(1, 4))) for _ in range(2_000)]
+                      + [None, np.nan, "", "Smith Repair"])
+    labels = BusinessTypeClassifier().classify(names)
+
+    assert isinstance(labels, pd.Categorical)
+    np.testing.assert_array_equal(np.asarray(labels, dtype=object), nested_where(names))
+    assert labels[-4] == labels[-3] == labels[-1] == DEFAULT_BUSINESS_TYPE
+
+
+def test_overlapping_and_prefix_patterns() -> None:
+    # "car" is a prefix of "carmax" and "max" starts inside it; the
+    # higher-priority rule must win however the patterns overlap.
+    rules = [("Max", ["max"]), ("Car", ["car"]), ("Carmax", ["carmax"]), ("Kia", ["kia motors"]),
+             ("Mo", ["motors"])]
+    names = pd.Series(["CarMax", "car wash", "kia motors", "kia motorsport", "kiamotors", "kia"])
+    classifier = BusinessTypeClassifier(rules, default="Other")
+    labels = classifier.classify(names)
+
+    np.testing.assert_array_equal(np.asarray(labels, dtype=object), nested_where(names, rules, "Other"))
+    assert list(labels.categories) == ["Max", "Car", "Carmax", "Kia", "Mo", "Other"]
+
+
+def test_rules_from_csv_and_fingerprint(tmp_path) -> None:
+    path = tmp_path / "rules.csv"
+    path.write_text("label,pattern\nTire Chain,Discount Tire\nDealer,Toyota\nTire Chain,Tire Kingdom\n")
+    classifier = BusinessTypeClassifier.from_csv(path, default="Other")
+
+    assert classifier.rules == [("Tire Chain", ["Discount Tire", "Tire Kingdom"]),
+                                ("Dealer", ["Toyota"])]
+    assert list(classifier.classify(["tire kingdom #4", "Toyota of Knoxville", "Garage"])) == [
+        "Tire Chain", "Dealer", "Other"]
+    assert classifier.fingerprint == BusinessTypeClassifier.from_csv(path, default="Other").fingerprint
+    assert classifier.fingerprint != BusinessTypeClassifier().fingerprint
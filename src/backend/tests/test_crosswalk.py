@@ -0,0 +1,79 @@
+import duckdb
+import pandas as pd
+import pytest
+
+from crosswalk import build_crosswalk, register_crosswalk, region_aggregate_path
+from template_sql import TemplateTranslator
+
+SCHEMA = [
+    {"column_name": "total_charges", "column_type": "BIGINT"},
+    {"column_name": "medicare_prov_num", "column_type": "BIGINT"},
+    {"column_name": "zip_cd_of_residence", "column_type": "VARCHAR"},
+    {"column_name": "total_days_of_care", "column_type": "BIGINT"},
+    {"column_name": "total_cases", "column_type": "BIGINT"},
+]
+
+CROSSWALK_CSV = """zipcode18,hsanum,hsacity,hsastate,hrrnum,hrrcity,hrrstate
+37201,44058,Nashville,TN,382,Nashville,TN
+37203,44058,Nashville,TN,382,Nashville,TN
+37204,44060,Franklin,TN,382,Nashville,TN
+7010,31010,Cliffside Park,NJ,303,Hackensack,NJ
+37201,44058,Nashville,TN,382,Nashville,TN
+"""
+
+
+@pytest.fixture
+def claims(tmp_path):
+    path = tmp_path / "hsas.parquet"
+    pd.DataFrame({
+        "zip_cd_of_residence": ["37201", "37201", "37203", "37204", "07010", "99999"],
+        "medicare_prov_num": [1, 2, 1, 3, 4, 5],
+        "total_charges": [100, 300, 50, 70, 20, 9],
+        "total_days_of_care": [1, 2, 3, 4, 5, 6],
+        "total_cases": [1, 1, 2, 2, 3, 1],
+    }).to_parquet(path)
+    csv_path = tmp_path / "ZipHsaHrr18.csv"
+    csv_path.write_text(CROSSWALK_CSV)
+    return path, csv_path
+
+
+def test_etl_writes_crosswalk_and_region_aggregates(tmp_path, claims) -> None:
+    dataset, csv_path = claims
+    crosswalk = tmp_path / "processed" / "zip_hsa_hrr.parquet"
+    build_crosswalk(csv_path, dataset, str(crosswalk))
+
+    zips = pd.read_parquet(crosswalk)
+    # Leading zeros restored, duplicate ZIPs dropped
+    assert list(zips["zip_cd_of_residence"]) == ["07010", "37201", "37203", "37204"]
+
+    hsas = pd.read_parquet(region_aggregate_path("hsa", tmp_path / "processed")).set_index("hsanum")
+    assert hsas.loc[44058, ["row_count", "zip_count", "provider_count", "total_charges"]].tolist() == [3, 2, 2, 450]
+    assert hsas["total_charges"].sum() == 540  # the unmatched ZIP is left out
+    hrrs = pd.read_parquet(region_aggregate_path("hrr", tmp_path / "processed")).set_index("hrrnum")
+    assert hrrs.loc[382, "total_cases"] == 6 and hrrs.loc[382, "hrrcity"] == "Nashville"
+
+
+def test_registered_tables_answer_region_questions(tmp_path, claims) -> None:
+    dataset, csv_path = claims
+    crosswalk = str(tmp_path / "zip_hsa_hrr.parquet")
+    build_crosswalk(csv_path, dataset, crosswalk)
+    con = duckdb.connect()
+    con.execute(f"CREATE VIEW hsa_data AS SELECT * FROM '{dataset}'")
+    for _ in range(2):  # refresh hooks run again whenever the dataset changes
+        assert register_crosswalk(con, crosswalk) == ["zip_hsa_hrr", "hsa_aggregates", "hrr_aggregates"]
+    indexes = {row[0] for row in con.execute("SELECT index_name FROM duckdb_indexes()").fetchall()}
+    assert indexes == {"zip_hsa_hrr_zip_cd_of_residence", "hsa_aggregates_hsanum", "hrr_aggregates_hrrnum"}
+
+    translator = TemplateTranslator(SCHEMA, region_tables={"hsanum": "hsa_aggregates", "hrrnum": "hrr_aggregates"})
+    sql = translator.translate("total charges by hsa")
+    assert "FROM hsa_aggregates" in sql
+    joined = con.execute(
+        "SELECT x.hsanum, sum(h.total_charges) FROM hsa_data h "
+        "JOIN zip_hsa_hrr x USING (zip_cd_of_residence) GROUP BY 1 ORDER BY 1").fetchall()
+    assert con.execute(sql).fetchall() == joined
+    assert con.execute(translator.translate("top 1 hospital referral regions by cases")).fetchall() == [(382, 6)]
+    # Averages and filtered totals need the claims, so they are left to the LLM
+    assert translator.translate("average charges per hsa") is None
+    assert TemplateTranslator(SCHEMA).translate("total charges by hsa") is None
+
+    assert register_crosswalk(con, str(tmp_path / "missing.parquet")) == []
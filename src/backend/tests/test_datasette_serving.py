@@ -0,0 +1,95 @@
+import sqlite3
+
+import httpx
+import pytest
+
+from datasette_serving import ResponseCache, create_app
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "hsas.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE hsa_data (zip_cd_of_residence TEXT, total_charges REAL)"
+        )
+        conn.executemany(
+            "INSERT INTO hsa_data VALUES (?, ?)",
+            [("37201", 10.0), ("37203", 20.0)],
+        )
+    return path
+
+
+def client(app):
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://localhost"
+    )
+
+
+@pytest.mark.asyncio
+async def test_immutable_database_with_precomputed_counts(db_path) -> None:
+    app = create_app(db_path, prewarm_paths=[])
+    async with client(app) as c:
+        response = await c.get("/hsas.json")
+    assert response.status_code == 200
+    assert db_path.with_name("hsas.db.inspect.json").exists()
+    tables = {t["name"]: t for t in response.json()["tables"]}
+    assert tables["hsa_data"]["count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_prewarm_etag_and_not_modified(db_path) -> None:
+    app = create_app(db_path)
+    await app.startup()
+    assert app.stats()["entries"] >= 3
+    misses = app.misses
+    async with client(app) as c:
+        response = await c.get("/hsas/hsa_data.json")
+        assert response.status_code == 200
+        assert app.misses == misses
+        assert response.headers["cache-control"].startswith("public")
+        etag = response.headers["etag"]
+
+        not_modified = await c.get(
+            "/hsas/hsa_data.json", headers={"if-none-match": etag}
+        )
+        assert not_modified.status_code == 304
+
+        other = await c.get("/hsas/hsa_data.json?zip_cd_of_residence=37201")
+        assert other.headers["etag"] != etag
+        assert len(other.json()["rows"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_lifespan_startup_prewarms(db_path) -> None:
+    app = create_app(db_path)
+    assert app.stats()["entries"] == 0
+    messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+    sent = []
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    await app({"type": "lifespan", "asgi": {"version": "3.0"}}, receive, send)
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert app.stats()["entries"] >= 3
+
+
+@pytest.mark.asyncio
+async def test_large_streamed_response_is_not_buffered() -> None:
+    async def streaming(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        size = int(scope["query_string"] or b"0")
+        for _ in range(size):
+            await send({"type": "http.response.body", "body": b"x" * 10, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = ResponseCache(streaming, "hash", max_bytes=100)
+    async with client(app) as c:
+        large = await c.get("/rows?50")
+        assert len(large.content) == 500
+        assert (await c.get("/rows?5")).content == b"x" * 50
+    assert app.stats()["entries"] == 1 and app.current_bytes == 50
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+
+import duckdb
+import pandas as pd
+import pytest
+
+from duckdb_pool import DuckDBConnectionManager, check_single_select
+
+
+def write_parquet(path, rows):
+    pd.DataFrame(
+        {"zip_cd_of_residence": [f"{i:05d}" for i in range(rows)],
+         "total_charges": range(rows)}
+    ).to_parquet(path, index=False)
+
+
+def test_view_registered_once_and_reused(tmp_path) -> None:
+    path = str(tmp_path / "hsas.parquet")
+    write_parquet(path, 3)
+    manager = DuckDBConnectionManager(path, pool_size=2)
+    with manager.cursor() as cur:
+        assert cur.execute("SELECT count(*) FROM hsa_data").fetchone()[0] == 3
+    fingerprint = manager.fingerprint
+    with manager.cursor() as cur:
+        cur.execute("SELECT 1").fetchone()
+    assert manager.fingerprint == fingerprint
+    manager.close()
+
+
+def test_view_recreated_when_file_changes(tmp_path) -> None:
+    path = str(tmp_path / "hsas.parquet")
+    write_parquet(path, 3)
+    manager = DuckDBConnectionManager(path, pool_size=1, refresh_interval_s=60)
+    with manager.cursor() as cur:
+        assert cur.execute("SELECT count(*) FROM hsa_data").fetchone()[0] == 3
+    fingerprint = manager.fingerprint
+    write_parquet(path, 5)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    # The files are not looked at again within the refresh interval
+    assert manager.refresh() == fingerprint
+    assert manager.refresh(force=True) != fingerprint
+    with manager.cursor() as cur:
+        assert cur.execute("SELECT count(*) FROM hsa_data").fetchone()[0] == 5
+    manager.close()
+
+
+def test_concurrent_cursors(tmp_path) -> None:
+    path = str(tmp_path / "hsas.parquet")
+    write_parquet(path, 10)
+    manager = DuckDBConnectionManager(path, pool_size=2, threads=1)
+    results = []
+
+    def worker():
+        with manager.cursor() as cur:
+            results.append(
+                cur.execute("SELECT sum(total_charges) FROM hsa_data")
+                .fetchone()[0]
+            )
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [45] * 8
+    manager.close()
+
+
+def test_partitioned_dataset_directory(tmp_path) -> None:
+    for zip3 in ("370", "372"):
+        partition = tmp_path / "hsas" / f"zip3={zip3}"
+        partition.mkdir(parents=True)
+        write_parquet(str(partition / "part-0.parquet"), 2)
+    manager = DuckDBConnectionManager(str(tmp_path / "hsas"))
+    with manager.cursor() as cur:
+        rows = cur.execute(
+            "SELECT zip3, count(*) FROM hsa_data GROUP BY zip3 ORDER BY zip3"
+        ).fetchall()
+    assert rows == [("370", 2), ("372", 2)]
+    assert manager.fingerprint[-1] == 2
+    manager.close()
+
+
+def test_detached_cursors_are_bounded_by_the_pool(tmp_path) -> None:
+    path = str(tmp_path / "hsas.parquet")
+    write_parquet(path, 3)
+    manager = DuckDBConnectionManager(path, pool_size=2)
+    held = [manager.detached_cursor(), manager.detached_cursor()]
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        manager.detached_cursor(timeout=0)
+    assert time.perf_counter() - start < 0.5  # no wait before evicting
+    manager.release(held.pop())
+    cur = manager.detached_cursor(timeout=0.01)
+    assert cur.execute("SELECT count(*) FROM hsa_data").fetchone()[0] == 3
+    manager.release(cur)
+    # cursor() borrows from the same pool
+    with manager.cursor() as pooled:
+        assert pooled.execute("SELECT 1").fetchone()[0] == 1
+        with pytest.raises(TimeoutError):
+            manager.detached_cursor(timeout=0)
+    manager.close()
+
+
+def test_only_single_selects_over_allowed_paths(tmp_path) -> None:
+    path = str(tmp_path / "hsas.parquet")
+    write_parquet(path, 3)
+    other = str(tmp_path / "other.parquet")
+    write_parquet(other, 4)
+    manager = DuckDBConnectionManager(path, pool_size=1)
+    manager.add_refresh_hook(lambda con: con.execute(f"CREATE OR REPLACE TABLE t AS SELECT * FROM '{other}'"))
+    cur = manager.detached_cursor()
+    check_single_select(cur, "WITH x AS (SELECT 1) SELECT * FROM x;")
+    for sql in ("SELECT 1; SELECT 2", f"COPY hsa_data TO '{tmp_path}/out.csv'",
+                "DROP VIEW hsa_data", "SET enable_external_access = true"):
+        with pytest.raises(ValueError):
+            check_single_select(cur, sql)
+    # The view still reads the dataset; nothing else on disk is reachable
+    assert cur.execute("SELECT count(*) FROM hsa_data").fetchone()[0] == 3
+    with pytest.raises(duckdb.PermissionException):
+        cur.execute(f"SELECT * FROM '{other}'")
+    with pytest.raises(duckdb.InvalidInputException):
+        cur.execute("SET enable_external_access = true")
+    # Every query runs under a memory cap it cannot lift
+    limit = cur.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+    with pytest.raises(duckdb.InvalidInputException):
+        cur.execute("SET memory_limit = '100GB'")
+    assert cur.execute("SELECT current_setting('memory_limit')").fetchone()[0] == limit
+    with pytest.raises(RuntimeError):
+        manager.add_source(other)
+    manager.release(cur)
+    manager.close()
+
+
+def test_source_change_reruns_hooks(tmp_path) -> None:
+    path = str(tmp_path / "hsas.parquet")
+    write_parquet(path, 3)
+    crosswalk = str(tmp_path / "zip_hsa_hrr.parquet")
+    manager = DuckDBConnectionManager(path, pool_size=1, refresh_interval_s=0)
+    manager.add_source(crosswalk)
+    runs = []
+    manager.add_refresh_hook(runs.append)
+    first = manager.refresh()
+    assert manager.refresh() == first and len(runs) == 1
+    # The crosswalk appearing (or being rebuilt) changes the fingerprint
+    write_parquet(crosswalk, 2)
+    second = manager.refresh()
+    assert second != first and second[0] == first[0] and len(runs) == 2
+    with manager.cursor() as cur:
+        assert cur.execute(f"SELECT count(*) FROM '{crosswalk}'").fetchone()[0] == 2
+    manager.close()
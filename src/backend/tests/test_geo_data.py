@@ -0,0 +1,60 @@
+import os
+import threading
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+from geo_data import cached_frame, lazy
+
+
+def test_cached_frame_reuses_copy_until_sources_change(tmp_path) -> None:
+    source = tmp_path / "shops.csv"
+    source.write_text("name\nA\n")
+    cache_dir = str(tmp_path / "cache")
+    calls = []
+
+    def load():
+        calls.append(1)
+        df = pd.read_csv(source)
+        return gpd.GeoDataFrame(df, geometry=[Point(-86.8, 36.2)] * len(df), crs="EPSG:4326")
+
+    first = cached_frame("shops", [str(source)], load, cache_dir=cache_dir)
+    second = cached_frame("shops", [str(source)], load, cache_dir=cache_dir)
+    assert len(calls) == 1
+    assert isinstance(second, gpd.GeoDataFrame) and second.crs == first.crs
+    pd.testing.assert_frame_equal(pd.DataFrame(second), pd.DataFrame(first))
+
+    cached_frame("shops", [str(source)], load, version="2", cache_dir=cache_dir)
+    assert len(calls) == 2
+    source.write_text("name\nA\nB\n")
+    assert len(cached_frame("shops", [str(source)], load, version="2", cache_dir=cache_dir)) == 2
+    assert len(calls) == 3
+
+    # Without the source the cached copy still serves; without either it fails
+    os.remove(source)
+    assert len(cached_frame("shops", [str(source)], load, version="2", cache_dir=cache_dir)) == 2
+    with pytest.raises(FileNotFoundError):
+        cached_frame("other", [str(source)], load, cache_dir=cache_dir)
+    assert len(calls) == 3
+
+
+def test_lazy_loads_once_per_argument_across_threads() -> None:
+    calls = []
+
+    @lazy
+    def load(name):
+        calls.append(name)
+        return name.upper()
+
+    threads = [threading.Thread(target=load, args=("hsas",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert load("hsas") == "HSAS" and load("hrrs") == "HRRS"
+    assert calls == ["hsas", "hrrs"]
+    load.cache_clear()
+    load("hsas")
+    assert calls == ["hsas", "hrrs", "hsas"]
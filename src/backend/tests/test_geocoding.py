@@ -0,0 +1,98 @@
+import pandas as pd
+import pytest
+
+from geocoding import Geocoder, ZipCentroids, normalize_address, normalize_zip
+
+
+class StubProvider:
+    """Local stand-in for Nominatim: known addresses, optional outage."""
+
+    name = "stub"
+
+    def __init__(self, known):
+        self.known = known
+        self.calls = []
+        self.down = False
+
+    def __call__(self, address):
+        self.calls.append(address)
+        if self.down:
+            raise TimeoutError("provider timed out")
+        return self.known.get(address)
+
+
+@pytest.fixture
+def centroids():
+    return ZipCentroids(pd.DataFrame({"zip": ["37203", "7010"], "latitude": [36.15, 40.8],
+                                      "longitude": [-86.79, -74.0]}))
+
+
+def make_geocoder(tmp_path, provider, centroids, **kwargs):
+    return Geocoder(provider, path=str(tmp_path / "geocode.db"), zip_centroids=centroids,
+                    min_delay_s=0, **kwargs)
+
+
+def test_normalization() -> None:
+    assert normalize_address(" 600 Charlotte Avenue,  Nashville, Tennessee ") == \
+        normalize_address("600 charlotte ave nashville TN")
+    assert normalize_zip(["37203-1234", 7010, "n/a"]).tolist()[:2] == ["37203", "07010"]
+
+
+def test_batch_serves_cache_hits_and_sends_only_misses(tmp_path, centroids) -> None:
+    provider = StubProvider({"600 Charlotte Ave, Nashville, TN 37203": (36.165, -86.784)})
+    geocoder = make_geocoder(tmp_path, provider, centroids)
+    addresses = ["600 Charlotte Ave, Nashville, TN 37203", "600 charlotte avenue nashville tn 37203",
+                 "1 Nowhere Rd, Nashville, TN 37203", "07010"]
+    first = geocoder.geocode_batch(addresses)
+    assert [loc.source for loc in first] == ["provider", "provider", "zip_centroid", "zip_centroid"]
+    assert (first[0].latitude, first[0].longitude) == (36.165, -86.784)
+    assert (first[2].latitude, first[3].latitude) == (36.15, 40.8)
+    assert len(provider.calls) == 2  # normalized duplicates and bare ZIPs skip the provider
+
+    # A new process reuses the on-disk answers, including "not found"
+    geocoder.close()
+    again = make_geocoder(tmp_path, provider, centroids)
+    second = again.geocode_batch(addresses + ["2 Unknown St, Nashville, TN 99999"])
+    assert [loc.source if loc else None for loc in second] == \
+        ["cache", "cache", "zip_centroid", "zip_centroid", None]
+    assert len(provider.calls) == 3
+    assert again.stats()["not_found"] == 1
+
+
+def test_provider_outage_and_budget_fall_back_to_zip_centroids(tmp_path, centroids) -> None:
+    provider = StubProvider({"5 Main St, Nashville, TN 37203": (36.1, -86.7)})
+    provider.down = True
+    geocoder = make_geocoder(tmp_path, provider, centroids)
+    result = geocoder.geocode_batch(["5 Main St, Nashville, TN 37203", "6 Main St, Nashville, TN 37203"])
+    assert [loc.source for loc in result] == ["zip_centroid", "zip_centroid"]
+    assert len(provider.calls) == 1  # the provider is skipped after it fails
+    assert result[0].approximate
+
+    # Fallback answers are not cached: once the provider is back it is asked
+    provider.down = False
+    recovered = make_geocoder(tmp_path, provider, centroids)
+    assert recovered.geocode("5 Main St, Nashville, TN 37203").source == "provider"
+    # With no time budget every miss goes straight to the fallback
+    assert recovered.geocode_batch(["7 Main St, Nashville, TN 37203"], budget_s=0)[0].source == \
+        "zip_centroid"
+    assert len(provider.calls) == 2
+
+
+def test_zip_centroids_from_points_and_coverage(centroids) -> None:
+    shops = pd.DataFrame({"postal_code": ["37203", "37203", "37901"],
+                          "md_y": [36.0, 36.2, 35.96], "md_x": [-86.8, -86.6, -83.92]})
+    derived = ZipCentroids.from_points(shops, "postal_code", "md_y", "md_x")
+    assert derived.lookup("37203") == pytest.approx((36.1, -86.7))
+    combined = centroids.combine(derived)
+    assert combined.lookup("37203") == (36.15, -86.79)  # the centroid file wins
+    assert combined.lookup("37901") == pytest.approx((35.96, -83.92))
+    assert combined.missing(["37203", "38103", "38103"]) == ["38103"]
+    lats, _ = combined.lookup_many(["37901", "38103"])
+    assert lats[0] == pytest.approx(35.96) and pd.isna(lats[1])
+
+
+def test_uncovered_claim_zips_are_logged(centroids, caplog) -> None:
+    claim_zips = pd.Series([37203.0, 38103.0, 7010.0, 38103.0, 1002.0])  # as stored in hsas.parquet
+    with caplog.at_level("WARNING", logger="geocoding"):
+        assert centroids.log_coverage(claim_zips, "HSA claims") == ["01002", "38103"]
+    assert "2 of 4 HSA claims ZIPs" in caplog.text
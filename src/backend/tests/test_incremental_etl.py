@@ -0,0 +1,88 @@
+import sqlite3
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from duckdb_pool import DuckDBConnectionManager
+from incremental_etl import incremental_build
+
+HEADER = "MEDICARE_PROV_NUM,ZIP_CD_OF_RESIDENCE,TOTAL_DAYS_OF_CARE,TOTAL_CHARGES,TOTAL_CASES\n"
+
+
+def build(tmp_path, inputs):
+    return incremental_build(
+        [str(p) for p in inputs],
+        db_file_path=str(tmp_path / "databases" / "hsas.db"),
+        table_name="hsa_data",
+        dataset_path=str(tmp_path / "hsas_incremental"),
+        chunk_size=2,
+    )
+
+
+def counts(tmp_path):
+    manager = DuckDBConnectionManager(str(tmp_path / "hsas_incremental"))
+    with manager.cursor() as cur:
+        parquet = cur.execute(
+            "SELECT source, count(*) FROM hsa_data GROUP BY 1 ORDER BY 1"
+        ).fetchall()
+    manager.close()
+    with sqlite3.connect(tmp_path / "databases" / "hsas.db") as conn:
+        sqlite = conn.execute(
+            "SELECT source, count(*) FROM hsa_data GROUP BY 1 ORDER BY 1"
+        ).fetchall()
+    assert parquet == sqlite
+    return parquet
+
+
+def test_only_changed_inputs_are_rebuilt(tmp_path) -> None:
+    y2021 = tmp_path / "Hospital_Service_Area_2021.csv"
+    y2022 = tmp_path / "Hospital_Service_Area_2022.csv"
+    y2021.write_text(HEADER + "440001,37201,1,10,1\n440002,37203,2,20,1\n")
+    y2022.write_text(HEADER + "440001,37201,3,30,1\n")
+
+    assert build(tmp_path, [y2021, y2022]) == [
+        "Hospital_Service_Area_2021", "Hospital_Service_Area_2022",
+    ]
+    assert counts(tmp_path) == [
+        ("Hospital_Service_Area_2021", 2), ("Hospital_Service_Area_2022", 1),
+    ]
+
+    # Nothing changed: nothing is rebuilt
+    assert build(tmp_path, [y2021, y2022]) == []
+
+    # A fix to one year only rebuilds that year
+    y2022.write_text(HEADER + "440001,37201,3,30,1\n440003,37204,4,40,2\n")
+    assert build(tmp_path, [y2021, y2022]) == ["Hospital_Service_Area_2022"]
+    assert counts(tmp_path) == [
+        ("Hospital_Service_Area_2021", 2), ("Hospital_Service_Area_2022", 2),
+    ]
+
+    # Dropping an input drops its partition and rows
+    assert build(tmp_path, [y2022]) == []
+    assert counts(tmp_path) == [("Hospital_Service_Area_2022", 2)]
+
+
+def test_later_inputs_are_cast_to_the_pinned_schema(tmp_path) -> None:
+    y2021 = tmp_path / "Hospital_Service_Area_2021.csv"
+    y2022 = tmp_path / "Hospital_Service_Area_2022.csv"
+    y2021.write_text(HEADER + "440001,37201,1,10.5,1\n")
+    # Whole-number charges, an extra column and no case counts
+    y2022.write_text("MEDICARE_PROV_NUM,ZIP_CD_OF_RESIDENCE,TOTAL_DAYS_OF_CARE,TOTAL_CHARGES,NOTE\n"
+                     "440002,37203,2,20,x\n")
+    build(tmp_path, [y2021])
+    build(tmp_path, [y2021, y2022])
+
+    dataset = tmp_path / "hsas_incremental"
+    schemas = {
+        p.parent.name: pq.read_schema(p).remove_metadata()
+        for p in dataset.glob("source=*/data.parquet")
+    }
+    assert len(schemas) == 2 and len(set(schemas.values())) == 1
+    assert schemas["source=Hospital_Service_Area_2022"].field("total_charges").type == pa.float64()
+    assert "note" not in schemas["source=Hospital_Service_Area_2022"].names
+    manager = DuckDBConnectionManager(str(dataset))
+    with manager.cursor() as cur:
+        assert cur.execute("SELECT total_charges, total_cases FROM hsa_data ORDER BY source").fetchall() \
+            == [(10.5, 1), (20.0, None)]
+    manager.close()
+    assert counts(tmp_path) == [("Hospital_Service_Area_2021", 1), ("Hospital_Service_Area_2022", 1)]
@@ -0,0 +1,115 @@
+import sqlite3
+
+import duckdb
+import pandas as pd
+import pytest
+
+import load_hsa_data
+from load_hsa_data import load_csv_to_sqlite_and_save_parquet
+from sqlite_writer import SQLiteBulkWriter
+
+CSV = """MEDICARE_PROV_NUM,ZIP_CD_OF_RESIDENCE,TOTAL_DAYS_OF_CARE,TOTAL_CHARGES,TOTAL_CASES,EMPTY
+440002,37203,10,1000,*,
+440001,37201,*,*,*,
+440001,37201,5,*,2,
+440003,,3,300,1,
+440002,37204,0,0,0,
+"""
+
+
+def test_streaming_etl_matches_cleaning_rules(tmp_path) -> None:
+    csv_path = tmp_path / "hsa.csv"
+    csv_path.write_text(CSV)
+    db_path = tmp_path / "databases" / "hsas.db"
+    parquet_path = tmp_path / "processed" / "hsas.parquet"
+    partitioned_path = tmp_path / "processed" / "hsas_partitioned"
+
+    load_csv_to_sqlite_and_save_parquet(
+        str(csv_path), str(db_path), "hsa_data", str(parquet_path),
+        partitioned_path=str(partitioned_path), chunk_size=2,
+    )
+
+    rows = duckdb.sql(
+        f"SELECT * FROM '{parquet_path}'"
+    ).fetchall()
+    columns = duckdb.sql(f"DESCRIBE SELECT * FROM '{parquet_path}'").fetchall()
+    assert [c[0] for c in columns] == [
+        "medicare_prov_num", "zip_cd_of_residence", "total_days_of_care",
+        "total_charges", "total_cases",
+    ]
+    # '*' becomes 0, all-zero rows are dropped, the missing zip is imputed
+    # with the median and rows are sorted by zip then provider
+    assert rows == [
+        (440001, 37201.0, 5.0, 0.0, 2.0),
+        (440003, 37202.0, 3.0, 300.0, 1.0),
+        (440002, 37203.0, 10.0, 1000.0, 0.0),
+    ]
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT count(*) FROM hsa_data").fetchone() == (3,)
+    assert sorted(p.name for p in partitioned_path.iterdir()) == ["zip3=372"]
+
+
+def test_sqlite_artifact_is_typed_and_indexed(tmp_path) -> None:
+    csv_path = tmp_path / "hsa.csv"
+    csv_path.write_text(CSV)
+    db_path = tmp_path / "databases" / "hsas.db"
+    load_csv_to_sqlite_and_save_parquet(
+        str(csv_path), str(db_path), "hsa_data",
+        str(tmp_path / "processed" / "hsas.parquet"), chunk_size=2,
+    )
+    with sqlite3.connect(db_path) as conn:
+        types = {
+            row[1]: row[2]
+            for row in conn.execute("PRAGMA table_info(hsa_data)")
+        }
+        indexes = {
+            row[1] for row in conn.execute("PRAGMA index_list(hsa_data)")
+        }
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM hsa_data "
+            "WHERE zip_cd_of_residence = 37201"
+        ).fetchall()
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert types["medicare_prov_num"] == "INTEGER"
+    assert types["total_charges"] == "REAL"
+    assert indexes == {
+        "idx_hsa_data_zip_cd_of_residence", "idx_hsa_data_medicare_prov_num",
+    }
+    assert "idx_hsa_data_zip_cd_of_residence" in plan[0][-1]
+    assert journal_mode == "delete"
+
+
+def test_failed_rebuild_keeps_previous_database(tmp_path) -> None:
+    db_path = tmp_path / "hsas.db"
+    frame = pd.DataFrame({"zip_cd_of_residence": ["37201", "37203"], "total_charges": [1.0, 2.0]})
+    with SQLiteBulkWriter(str(db_path), "hsa_data", vacuum=False) as writer:
+        writer.write(frame)
+    with pytest.raises(RuntimeError):
+        with SQLiteBulkWriter(str(db_path), "hsa_data") as writer:
+            writer.write(frame.head(1))
+            raise RuntimeError("bad chunk")
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT count(*) FROM hsa_data").fetchone() == (2,)
+    assert [p.name for p in tmp_path.iterdir()] == ["hsas.db"]
+
+
+def test_quoted_paths_and_staging_cleanup(tmp_path, monkeypatch) -> None:
+    out = tmp_path / "o'brien"
+    csv_path = tmp_path / "hsa.csv"
+    csv_path.write_text(CSV)
+    parquet_path = out / "hsas.parquet"
+    load_csv_to_sqlite_and_save_parquet(
+        str(csv_path), str(out / "hsas.db"), "hsa_data", str(parquet_path),
+        partitioned_path=str(out / "hsas_partitioned"),
+    )
+    assert duckdb.sql("SELECT count(*) FROM read_parquet($p)", params={"p": str(parquet_path)}).fetchone() == (3,)
+    assert not (out / "hsas.parquet.staging").exists()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("COPY failed")
+
+    monkeypatch.setattr(load_hsa_data, "write_optimized_parquet", fail)
+    with pytest.raises(RuntimeError):
+        load_csv_to_sqlite_and_save_parquet(
+            str(csv_path), str(out / "hsas.db"), "hsa_data", str(parquet_path))
+    assert not (out / "hsas.parquet.staging").exists()
@@ -0,0 +1,88 @@
+import threading
+
+import folium
+import numpy as np
+
+from map_rendering import MapCache, add_business_markers, business_marker_data, map_cache_key
+from synthetic_data import generate_businesses
+
+
+def test_marker_data_is_columnar_and_skips_missing_coordinates() -> None:
+    df = generate_businesses(5)
+    df.loc[1, "md_y"] = np.nan
+    df.loc[2, "city"] = None
+    df = df.drop(columns="postal_code")
+
+    rows, columns = business_marker_data(df)
+    assert len(rows) == 4
+    assert [row[2] for row in rows] == [0, 1, 2, 3]
+    assert rows[0][:2] == [round(df.md_y[0], 5), round(df.md_x[0], 5)]
+    assert columns["name"] == df.name.drop(index=1).tolist()
+    assert columns["city"][1] == "N/A"  # row 2 shifted past the dropped row
+    assert "postal_code" not in columns
+
+
+def test_markers_render_without_per_marker_html() -> None:
+    def render(count):
+        m = folium.Map(location=[35.86, -86.66], zoom_start=7)
+        add_business_markers(m, generate_businesses(count))
+        return m.get_root().render()
+
+    small, large = render(10), render(10_000)
+    assert "L.AwesomeMarkers.icon" in large
+    assert "bindPopup(function" in large
+    # Per-marker growth is the coordinates and popup fields, not Leaflet code
+    assert (len(large) - len(small)) / 9_990 < 120
+    assert large.count("L.marker(") == 1
+
+
+def test_popup_text_cannot_close_the_script() -> None:
+    df = generate_businesses(1)
+    df.loc[0, "name"] = "</script><script>alert(1)</script>"
+    m = folium.Map()
+    add_business_markers(m, df)
+    assert "</script><script>alert" not in m.get_root().render()
+
+
+def test_map_cache_keys_on_canonical_filters_and_evicts_by_size() -> None:
+    calls = []
+
+    def render(geo_layer, business_filters):
+        calls.append((geo_layer, business_filters))
+        return f"{geo_layer}:{','.join(business_filters)}".ljust(100)
+
+    cache = MapCache(render, max_bytes=250)
+    assert map_cache_key("HSAs", []) == map_cache_key("HSAs", ["All", "Autozone"])
+    assert cache.get("HSAs", ["Napa Auto", "Autozone"]).startswith("HSAs:Autozone,Napa Auto")
+    cache.get("HSAs", ["Autozone", "Napa Auto"])
+    cache.get("HSAs", None)
+    cache.get("HSAs", ["All"])
+    assert calls == [("HSAs", ["Autozone", "Napa Auto"]), ("HSAs", ["All"])]
+    assert cache.stats()["hits"] == 2
+
+    cache.get("Counties", ["All"])  # third 100-byte entry evicts the oldest
+    assert cache.stats()["bytes"] == 200
+    cache.get("HSAs", ["Autozone", "Napa Auto"])
+    assert len(calls) == 4
+
+
+def test_map_cache_renders_each_key_once_under_concurrency() -> None:
+    started = threading.Event()
+    calls = []
+
+    def render(geo_layer, business_filters):
+        calls.append(geo_layer)
+        started.wait(1)
+        return "<html>"
+
+    cache = MapCache(render)
+    thread = cache.prerender([("HSAs", ["All"]), ("HRRs", ["All"])])
+    threads = [threading.Thread(target=cache.get, args=("HSAs", ["All"])) for _ in range(4)]
+    for t in threads:
+        t.start()
+    started.set()
+    thread.join()
+    for t in threads:
+        t.join()
+    assert sorted(calls) == ["HRRs", "HSAs"]
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,93 @@
+import json
+import os
+import time
+import urllib.request
+
+import duckdb
+import pytest
+
+from metrics import MetricsRegistry, QueryProfile, Trace, start_metrics_server
+
+
+def test_trace_records_stage_histograms_and_errors() -> None:
+    metrics = MetricsRegistry(buckets=(0.1, 1.0))
+    trace = Trace("execute_sql_query", metrics=metrics)
+    with trace.stage("connect"):
+        pass
+    with pytest.raises(ValueError):
+        with trace.stage("execute"):
+            raise ValueError("bad sql")
+    trace.finish()
+
+    text = metrics.render()
+    assert 'hsa_stage_duration_seconds_count{operation="execute_sql_query",stage="connect"} 1' in text
+    assert 'hsa_stage_duration_seconds_bucket{operation="execute_sql_query",stage="connect",le="+Inf"} 1' in text
+    assert metrics.value("hsa_errors_total", operation="execute_sql_query",
+                         stage="execute", error="ValueError") == 1
+    assert 'hsa_request_duration_seconds_count{operation="execute_sql_query",outcome="error"} 1' in text
+    assert trace.error["type"] == "ValueError"
+
+
+def test_metrics_endpoint_serves_text_format() -> None:
+    metrics = MetricsRegistry()
+    metrics.inc("hsa_cache_lookups_total", cache="result", result="hit")
+    metrics.gauge("hsa_open_results", lambda: 3)
+    server = start_metrics_server(port=0, host="127.0.0.1", metrics=metrics)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+    assert 'hsa_cache_lookups_total{cache="result",result="hit"} 1' in body
+    assert "hsa_open_results 3" in body
+
+
+@pytest.mark.parametrize("slow_ms, kept", [(0, True), (60_000, False)])
+def test_profiles_are_kept_only_for_slow_queries(tmp_path, slow_ms, kept) -> None:
+    con = duckdb.connect()
+    con.execute("PRAGMA enable_profiling = 'no_output'")
+    sql = "SELECT range % 7 AS k, count(*) FROM range(100000) GROUP BY k"
+    profile = QueryProfile(con, sql, slow_ms=slow_ms, profile_dir=str(tmp_path)).start()
+    con.execute(sql).fetchall()
+    path = profile.finish()
+    con.close()
+    assert (path is not None) == kept
+    if kept:
+        with open(path) as f:
+            record = json.load(f)
+        assert record["outcome"] == "complete"
+        assert "children" in record["profile"]
+    assert len(os.listdir(tmp_path)) == int(kept)
+
+
+def test_abandoned_slow_query_keeps_its_plan(tmp_path) -> None:
+    con = duckdb.connect()
+    con.execute("PRAGMA enable_profiling = 'no_output'")
+    sql = "SELECT range FROM range(100000)"
+    profile = QueryProfile(con, sql, slow_ms=0, profile_dir=str(tmp_path)).start()
+    reader = con.execute(sql).to_arrow_reader(1000)
+    reader.read_next_batch()
+    profile.stop()
+    del reader
+    path = profile.finish("abandoned")
+    con.close()
+    with open(path) as f:
+        record = json.load(f)
+    assert record["outcome"] == "abandoned"
+    assert record["profile"] is None and record["plan"]
+
+
+def test_profile_latency_stops_at_first_page(tmp_path) -> None:
+    con = duckdb.connect()
+    con.execute("PRAGMA enable_profiling = 'no_output'")
+    sql = "SELECT range FROM range(100000)"
+    profile = QueryProfile(con, sql, slow_ms=200, profile_dir=str(tmp_path)).start()
+    reader = con.execute(sql).to_arrow_reader(1000)
+    reader.read_next_batch()
+    elapsed_ms = profile.stop()
+    time.sleep(0.3)  # a user paging slowly through the rest
+    reader.read_all()
+    assert profile.finish() is None
+    assert profile.elapsed_ms == elapsed_ms < 200
+    con.close()
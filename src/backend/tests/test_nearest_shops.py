@@ -0,0 +1,62 @@
+import folium
+import numpy as np
+import pytest
+
+from nearest_shops import EARTH_RADIUS_MILES, NearestShops, nearest_overlay
+from synthetic_data import generate_businesses
+
+pytest.importorskip("sklearn")
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+@pytest.fixture(scope="module")
+def shops():
+    businesses = generate_businesses(2_000, seed=1)
+    businesses.loc[0, "md_y"] = np.nan  # skipped, not an error
+    return businesses, NearestShops(businesses)
+
+
+def brute_force(businesses, lat, lon, types=None):
+    df = businesses.dropna(subset=["md_y"])
+    if types:
+        df = df[df.business_type.isin(types)]
+    return np.sort(haversine_miles(lat, lon, df.md_y.to_numpy(), df.md_x.to_numpy()))
+
+
+def test_batch_nearest_matches_brute_force(shops) -> None:
+    businesses, index = shops
+    rng = np.random.default_rng(0)
+    lats, lons = rng.uniform(35, 36.6, 300), rng.uniform(-90, -82, 300)
+
+    result = index.nearest(lats, lons, k=4)
+    assert len(result) == 300 * 4
+    assert result.groupby("query")["rank"].apply(list).eq([[1, 2, 3, 4]] * 300).all()
+    for q in [0, 150, 299]:
+        got = result[result["query"] == q]["distance_miles"].to_numpy()
+        np.testing.assert_allclose(got, brute_force(businesses, lats[q], lons[q])[:4], rtol=1e-9)
+
+    types = ["Autozone", "Napa Auto"]
+    filtered = index.nearest(lats, lons, k=3, business_types=types)
+    assert set(filtered["business_type"]) <= set(types)
+    got = filtered[filtered["query"] == 7]["distance_miles"].to_numpy()
+    np.testing.assert_allclose(got, brute_force(businesses, lats[7], lons[7], types)[:3], rtol=1e-9)
+
+
+def test_radius_query_and_overlay(shops) -> None:
+    businesses, index = shops
+    lats, lons = np.array([36.16, 35.05]), np.array([-86.78, -85.31])
+    result = index.within(lats, lons, radius_miles=15, business_types=["Firestone"])
+    for q in [0, 1]:
+        expected = brute_force(businesses, lats[q], lons[q], ["Firestone"])
+        got = result[result["query"] == q]["distance_miles"].to_numpy()
+        np.testing.assert_allclose(got, expected[expected <= 15], rtol=1e-9)
+
+    assert index.nearest(lats, lons, business_types=["No Such Type"]).empty
+    m = folium.Map()
+    nearest_overlay(lats, lons, index.nearest(lats, lons, k=2)).add_to(m)
+    assert "MultiLineString" in m.get_root().render()
@@ -0,0 +1,104 @@
+import duckdb
+
+from paged_results import PagedResult, PagedResultStore, arrow_reader
+
+
+def open_range(rows, **kwargs):
+    con = duckdb.connect()
+    cur = con.cursor()
+    closed = []
+
+    def on_close():
+        cur.close()
+        closed.append(True)
+
+    reader = arrow_reader(
+        cur.execute(f"SELECT range AS n FROM range({rows})"), 7
+    )
+    return PagedResult(reader, on_close=on_close, **kwargs), closed
+
+
+def test_pages_are_read_lazily_and_spilled() -> None:
+    result, closed = open_range(10_000_000, page_size=10)
+    first = result.page(0)
+    assert first.column("n").to_pylist() == list(range(10))
+    assert result.rows_read < 100
+    assert result.page_count is None
+
+    assert result.page(2).column("n").to_pylist() == list(range(20, 30))
+    # Going back is served from the spilled page file
+    assert result.page(1).column("n").to_pylist() == list(range(10, 20))
+    assert not closed
+    result.close()
+    assert closed
+
+
+def test_row_cap_truncates_and_closes_cursor() -> None:
+    result, closed = open_range(1000, page_size=10, max_rows=25)
+    assert result.page(5).num_rows == 0
+    assert result.truncated
+    assert result.page_count == 3
+    assert result.page(2).num_rows == 5
+    assert closed
+    result.close()
+
+
+def test_complete_result_is_handed_to_on_complete() -> None:
+    completed = []
+    result, _ = open_range(12, page_size=5, on_complete=completed.append)
+    assert result.read_all().num_rows == 12
+    assert completed[0].num_rows == 12
+    assert not result.truncated
+
+
+def test_store_closes_least_recently_used() -> None:
+    store = PagedResultStore(max_open=1)
+    first, first_closed = open_range(100)
+    second, _ = open_range(100)
+    first_id = store.add(first)
+    store.add(second)
+    assert store.get(first_id) is None
+    assert first_closed
+
+
+def test_store_keeps_shared_result_open_until_last_id() -> None:
+    store = PagedResultStore()
+    result, closed = open_range(100)
+    first_id = store.add(result)
+    second_id = store.add(result)
+    store.discard(first_id)
+    assert not closed
+    assert store.get(second_id) is result
+    store.discard(second_id)
+    assert closed
+
+
+def test_closed_result_is_exhausted() -> None:
+    result, closed = open_range(1000, page_size=10)
+    result.page(0)
+    assert result.streaming
+    result.close()
+    assert closed and result.exhausted and not result.streaming
+    assert result.outcome == "abandoned"
+    assert result.page(3).num_rows == 0
+
+
+def test_store_releases_oldest_streaming_cursor() -> None:
+    store = PagedResultStore()
+    done, _ = open_range(5, page_size=10)
+    done.page(0)
+    first, first_closed = open_range(100, page_size=10)
+    second, second_closed = open_range(100, page_size=10)
+    for result in (done, first, second):
+        result.page(0)
+        store.add(result)
+    assert store.release_oldest_streaming()
+    assert first_closed and not second_closed
+    # Pages already read (and rows buffered past them) stay available
+    assert first.evicted and first.truncated and first.page_count == 2
+    assert first.outcome == "evicted" and done.outcome == "complete"
+    assert first.page(0).column("n").to_pylist() == list(range(10))
+    assert first.page(1).column("n").to_pylist() == list(range(10, 14))
+    assert first.page(2).num_rows == 0
+    assert store.release_oldest_streaming() and second_closed
+    assert not store.release_oldest_streaming()
@@ -0,0 +1,46 @@
+import duckdb
+import pytest
+
+from query_guard import QueryDeadline, admit_query
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE hsa_data AS SELECT range AS n, range % 7 AS k FROM range(100000)")
+    yield con
+    con.close()
+
+
+def test_small_query_is_admitted_unchanged(con) -> None:
+    sql = "SELECT k, count(*) FROM hsa_data GROUP BY k"
+    verdict = admit_query(con, sql)
+    assert verdict.action == "admitted"
+    assert verdict.sql == sql
+    assert "plan" in verdict.summary()
+
+
+def test_large_result_gets_a_limit(con) -> None:
+    verdict = admit_query(con, "SELECT * FROM hsa_data -- everything;", auto_limit=1000)
+    assert verdict.action == "limited"
+    assert con.execute(verdict.sql).fetchall() == con.execute(
+        "SELECT * FROM hsa_data LIMIT 1000").fetchall()
+
+
+def test_cross_join_is_rejected_on_cost(con) -> None:
+    verdict = admit_query(con, "SELECT * FROM hsa_data a, hsa_data b", max_cost=10**9)
+    assert verdict.rejected
+    assert "cost" in verdict.reason
+
+
+def test_memory_budget_rejects_large_sorts(con) -> None:
+    verdict = admit_query(con, "SELECT * FROM hsa_data ORDER BY k", max_memory_mb=1)
+    assert verdict.rejected
+    assert "memory" in verdict.reason
+
+
+def test_deadline_interrupts_long_query(con) -> None:
+    with pytest.raises(duckdb.InterruptException):
+        with QueryDeadline(con, timeout_s=0.2) as deadline:
+            con.execute("SELECT count(*) FROM range(1000000000000)").fetchall()
+    assert deadline.expired
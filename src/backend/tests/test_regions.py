@@ -0,0 +1,56 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+from shapely.geometry import box
+
+from regions import assign_regions, locate_points, region_counts
+from synthetic_data import generate_businesses
+
+
+def grid(columns, rows, crs="EPSG:4326"):
+    """``columns`` x ``rows`` cells over Tennessee with integer ids."""
+    xs, ys = np.linspace(-90.31, -81.65, columns + 1), np.linspace(34.98, 36.68, rows + 1)
+    cells = [box(xs[i], ys[j], xs[i + 1], ys[j + 1]) for i in range(columns) for j in range(rows)]
+    return gpd.GeoDataFrame({"hsanum": np.arange(len(cells)) + 100}, geometry=cells, crs=crs)
+
+
+def test_locate_points_matches_brute_force() -> None:
+    polygons = grid(12, 5).geometry.values
+    rng = np.random.default_rng(0)
+    lats, lons = rng.uniform(34.5, 37, 5_000), rng.uniform(-91, -81, 5_000)
+    located = locate_points(lats, lons, polygons)
+
+    points = shapely.points(lons, lats)
+    expected = np.full(len(points), -1)
+    for i, polygon in enumerate(polygons):
+        inside = shapely.intersects(polygon, points) & (expected < 0)
+        expected[inside] = i
+    np.testing.assert_array_equal(located, expected)
+    assert (located == -1).any() and (located >= 0).any()
+
+
+def test_assign_regions_and_counts() -> None:
+    businesses = generate_businesses(3_000, seed=2)
+    businesses.loc[0, ["md_y", "md_x"]] = [40.0, -100.0]  # outside Tennessee
+    # A projected layer is brought back to lon/lat before the join
+    layers = {"HSAs": grid(6, 3).to_crs("EPSG:3857"),
+              "HRRs": grid(2, 1).rename(columns={"hsanum": "hrrnum"})}
+    assigned = assign_regions(businesses, layers)
+
+    assert assigned["hsa"].dtype == "Int64"
+    assert pd.isna(assigned.loc[0, "hsa"]) and assigned["hsa"].iloc[1:].notna().all()
+    assert set(assigned["hrr"].dropna()) == {100, 101}
+    west = assigned["md_x"] < (-90.31 + -81.65) / 2
+    assert (assigned.loc[west, "hrr"] == 100).all()
+
+    counts = region_counts(assigned, "HSAs")
+    assert counts["total"].sum() == len(businesses) - 1
+    assert counts.drop(columns="total").sum(axis=1).equals(counts["total"])
+    by_type = assigned[assigned.business_type == "Autozone"].groupby("hsa").size()
+    pd.testing.assert_series_equal(counts["Autozone"][by_type.index], by_type, check_names=False,
+                                   check_dtype=False, check_index_type=False)
+
+    with pytest.raises(KeyError):
+        assign_regions(businesses, {"Counties": grid(1, 1)})
@@ -0,0 +1,39 @@
+import pyarrow as pa
+
+from result_cache import ResultCache, canonicalize_sql, is_cacheable
+
+
+def test_canonicalize_sql() -> None:
+    a = canonicalize_sql(
+        "SELECT zip_cd_of_residence, AVG(total_charges)\n"
+        "  FROM hsa_data -- example\n"
+        " WHERE total_days_of_care > 040 GROUP BY zip_cd_of_residence;"
+    )
+    b = canonicalize_sql(
+        "select zip_cd_of_residence,avg(total_charges) from hsa_data "
+        "where total_days_of_care>40 group by zip_cd_of_residence"
+    )
+    assert a == b
+    # String literals and quoted identifiers keep their case
+    assert "'TN'" in canonicalize_sql("SELECT * FROM t WHERE s = 'TN'")
+    assert canonicalize_sql("SELECT 40") != canonicalize_sql("SELECT 40.0")
+
+
+def test_is_cacheable() -> None:
+    assert is_cacheable(canonicalize_sql("SELECT 1"))
+    assert not is_cacheable(canonicalize_sql("SELECT random()"))
+    assert not is_cacheable(canonicalize_sql("DELETE FROM t"))
+
+
+def test_lru_eviction_and_fingerprint_invalidation() -> None:
+    table = pa.table({"a": list(range(100))})
+    cache = ResultCache(max_bytes=table.nbytes * 2)
+    fingerprint = ("hsas.parquet", 1, 10)
+    for sql in ("SELECT 1", "SELECT 2", "SELECT 3"):
+        assert cache.put(sql, fingerprint, table)
+    assert cache.get("select 1", fingerprint) is None
+    assert cache.get("select  3", fingerprint) is table
+    assert cache.stats()["entries"] == 2
+
+    assert cache.get("SELECT 3", ("hsas.parquet", 2, 10)) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,75 @@
+import duckdb
+import pandas as pd
+import pytest
+
+from rollups import build_rollups, execute_with_rollups, rewrite_query
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    df = pd.DataFrame({
+        "zip_cd_of_residence": ["37201", "37201", "37203", "37203", "37204"],
+        "medicare_prov_num": [1, 2, 1, 3, 3],
+        "total_charges": [100, 300, 50, None, 70],
+        "total_days_of_care": [1, 2, 3, 4, 5],
+        "total_cases": [1, 1, 2, 2, 3],
+    })
+    con.register("hsa_frame", df)
+    con.execute("CREATE VIEW hsa_data AS SELECT * FROM hsa_frame")
+    build_rollups(con)
+    yield con
+    con.close()
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT zip_cd_of_residence, AVG(total_charges) FROM hsa_data "
+    "GROUP BY zip_cd_of_residence ORDER BY zip_cd_of_residence",
+    "select zip_cd_of_residence, sum(total_charges) as s, count(*), "
+    "COUNT(total_charges) from hsa_data where zip_cd_of_residence <> '37204' "
+    "group by zip_cd_of_residence having sum(total_charges) > 60 "
+    "order by s desc limit 5;",
+    "SELECT medicare_prov_num, sum(total_days_of_care) AS days "
+    "FROM hsa_data GROUP BY medicare_prov_num ORDER BY medicare_prov_num",
+    "SELECT zip_cd_of_residence, count(zip_cd_of_residence) FROM hsa_data "
+    "GROUP BY zip_cd_of_residence ORDER BY zip_cd_of_residence",
+])
+def test_rewritten_query_matches_base(con, sql) -> None:
+    rewritten = rewrite_query(con, sql)
+    assert rewritten is not None
+    assert "hsa_data_by_" in rewritten
+    expected = con.execute(sql).fetchdf()
+    actual = execute_with_rollups(con, sql).fetchdf()
+    assert list(actual.columns) == list(expected.columns)
+    assert actual.astype(float, errors="ignore").equals(
+        expected.astype(float, errors="ignore")
+    )
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM hsa_data",
+    "SELECT zip_cd_of_residence, sum(total_charges) FROM hsa_data "
+    "WHERE medicare_prov_num = 1 GROUP BY zip_cd_of_residence",
+    "SELECT zip_cd_of_residence, max(total_charges) FROM hsa_data "
+    "GROUP BY zip_cd_of_residence",
+    "SELECT zip_cd_of_residence, count(DISTINCT medicare_prov_num) "
+    "FROM hsa_data GROUP BY zip_cd_of_residence",
+    "SELECT medicare_prov_num, sum(medicare_prov_num) FROM hsa_data "
+    "GROUP BY medicare_prov_num",
+    "SELECT zip_cd_of_residence, count(medicare_prov_num) FROM hsa_data "
+    "GROUP BY zip_cd_of_residence",
+])
+def test_ineligible_queries_fall_back(con, sql) -> None:
+    assert rewrite_query(con, sql) is None
+    assert len(execute_with_rollups(con, sql).fetchall()) > 0
+
+
+def test_count_of_dimension_skips_null_group(con) -> None:
+    con.execute("CREATE OR REPLACE VIEW hsa_data AS SELECT * FROM hsa_frame "
+                "UNION ALL SELECT NULL, 4, 1, 1, 1")
+    build_rollups(con)
+    sql = ("SELECT zip_cd_of_residence, count(zip_cd_of_residence) AS n, count(*) AS rows "
+           "FROM hsa_data GROUP BY zip_cd_of_residence ORDER BY zip_cd_of_residence")
+    assert rewrite_query(con, sql) is not None
+    assert execute_with_rollups(con, sql).fetchall() == con.execute(sql).fetchall() == [
+        ("37201", 2, 2), ("37203", 2, 2), ("37204", 1, 1), (None, 0, 1)]
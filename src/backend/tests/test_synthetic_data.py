@@ -0,0 +1,40 @@
+import pandas as pd
+
+from benchmark import compare, run_benchmarks
+from synthetic_data import HSAGenerator, parse_count, write_csv
+
+
+def test_generator_is_deterministic_and_skewed() -> None:
+    first = pd.concat(HSAGenerator(20_000, seed=3, chunk_size=7_000))
+    second = pd.concat(HSAGenerator(20_000, seed=3, chunk_size=7_000))
+    pd.testing.assert_frame_equal(first, second)
+    assert len(first) == 20_000
+
+    # Zipf popularity: the busiest 1% of zips carry far more than 1% of rows
+    counts = first["ZIP_CD_OF_RESIDENCE"].value_counts()
+    assert counts.iloc[:300].sum() > 0.3 * len(first)
+    # Small counts are suppressed as in the CMS file
+    assert first["TOTAL_CASES"].isna().any()
+    assert (first["TOTAL_CASES"].dropna() >= 11).all()
+
+
+def test_csv_is_written_in_the_raw_cms_format(tmp_path) -> None:
+    path = write_csv(HSAGenerator(50, chunk_size=20), str(tmp_path / "hsa.csv"))
+    lines = open(path).read().splitlines()
+    assert lines[0] == ("MEDICARE_PROV_NUM,ZIP_CD_OF_RESIDENCE,TOTAL_DAYS_OF_CARE,"
+                        "TOTAL_CHARGES,TOTAL_CASES")
+    assert len(lines) == 51
+    assert any(line.endswith(",*,*,*") for line in lines)
+    assert parse_count("1.5M") == 1_500_000
+
+
+def test_benchmark_report_and_regression_check() -> None:
+    report = run_benchmarks(suites=["etl", "datasette"], rows=2_000, repeat=2)
+    names = {(r["suite"], r["name"]) for r in report["results"]}
+    assert ("etl", "load_csv_to_sqlite_and_save_parquet") in names
+    assert all(r.get("status", 200) == 200 for r in report["results"])
+    assert report["meta"]["rows"] == 2_000
+
+    slower = {"results": [dict(r, median_s=r["median_s"] * 2) for r in report["results"]]}
+    assert len(compare(slower, report)) == len(report["results"])
+    assert compare(report, report) == []
@@ -0,0 +1,71 @@
+import duckdb
+import pandas as pd
+import pytest
+
+from rollups import build_rollups, rewrite_query
+from template_sql import TemplateTranslator
+
+SCHEMA = [
+    {"column_name": "total_charges", "column_type": "BIGINT"},
+    {"column_name": "medicare_prov_num", "column_type": "BIGINT"},
+    {"column_name": "zip_cd_of_residence", "column_type": "VARCHAR"},
+    {"column_name": "total_days_of_care", "column_type": "BIGINT"},
+    {"column_name": "total_cases", "column_type": "BIGINT"},
+]
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    df = pd.DataFrame({
+        "zip_cd_of_residence": ["37201", "37201", "37203", "37203", "37204"],
+        "medicare_prov_num": [1, 2, 1, 3, 3],
+        "total_charges": [100, 300, 50, 20, 70],
+        "total_days_of_care": [1, 2, 3, 4, 5],
+        "total_cases": [1, 1, 2, 2, 3],
+    })
+    con.register("hsa_frame", df)
+    con.execute("CREATE VIEW hsa_data AS SELECT * FROM hsa_frame")
+    build_rollups(con)
+    yield con
+    con.close()
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Calculate the average total_charges by zip_cd_of_residence",
+     [("37201", 200.0), ("37203", 35.0), ("37204", 70.0)]),
+    ("For each zip_cd_of_residence, calculate the sum of total_charges",
+     [("37201", 400), ("37203", 70), ("37204", 70)]),
+    ("Which 2 providers have the highest charges?", [(2, 300), (1, 150)]),
+    ("total cost", [(540,)]),
+    ("show records with days of care at least 4 in zip 37203",
+     [("37203", 3, 20, 4, 2)]),
+])
+def test_common_questions_translate_locally(con, question, expected) -> None:
+    sql = TemplateTranslator(SCHEMA).translate(question)
+    assert sql is not None
+    assert con.execute(sql).fetchall() == expected
+
+
+def test_count_of_a_counted_measure_sums_it(con) -> None:
+    translator = TemplateTranslator(SCHEMA)
+    sql = translator.translate("count of cases by zip")
+    assert "SUM(total_cases)" in sql
+    assert con.execute(sql).fetchall() == [("37201", 2), ("37203", 4), ("37204", 3)]
+    assert "SUM(total_days_of_care)" in translator.translate("top 2 providers by count of days of care")
+    assert "COUNT(total_charges)" in translator.translate("count of charges by zip")
+
+
+def test_grouped_templates_are_answered_from_rollups(con) -> None:
+    sql = TemplateTranslator(SCHEMA).translate("top 5 zip codes by total charges")
+    assert "LIMIT 5" in sql
+    assert rewrite_query(con, sql) is not None
+
+
+@pytest.mark.parametrize("question", [
+    "average charges by zip code for 2022",
+    "Show total charges over 1M by state",
+    "how many hospitals opened last year",
+])
+def test_low_confidence_questions_fall_back(question) -> None:
+    assert TemplateTranslator(SCHEMA).translate(question) is None
@@ -0,0 +1,81 @@
+import geopandas as gpd
+import httpx
+import numpy as np
+import pytest
+from shapely.geometry import box
+
+from boundaries import boundary_path, prepare_boundaries
+from synthetic_data import generate_businesses
+from tile_serving import ViewportLayers, create_tile_app, tile_bounds
+
+
+@pytest.fixture
+def tile_app(tmp_path):
+    xs, ys = np.linspace(-90.31, -81.65, 9), np.linspace(34.98, 36.68, 4)
+    cells = [box(xs[i], ys[j], xs[i + 1], ys[j + 1]) for i in range(8) for j in range(3)]
+    hsas = gpd.GeoDataFrame({"hsanum": np.arange(len(cells)) + 100}, geometry=cells, crs="EPSG:4326")
+    prepare_boundaries({"HSAs": hsas}, out_dir=tmp_path)
+    businesses = generate_businesses(3_000, seed=1)
+    app = create_tile_app({"HSAs": lambda zoom: boundary_path("HSAs", zoom, tmp_path)},
+                          lambda: businesses, max_points=500)
+    return app, businesses
+
+
+def client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://localhost")
+
+
+def test_tile_bounds() -> None:
+    assert tile_bounds(0, 0, 0) == pytest.approx((-180, -85.0511, 180, 85.0511), abs=1e-4)
+    west, south, east, north = tile_bounds(7, 33, 50)  # covers Nashville
+    assert west < -86.78 < east and south < 36.16 < north
+    with pytest.raises(ValueError):
+        tile_bounds(3, 8, 0)
+
+
+@pytest.mark.asyncio
+async def test_boundaries_in_viewport(tile_app) -> None:
+    app, _ = tile_app
+    async with client(app) as c:
+        # Just inside the westmost column of cells
+        response = await c.get("/bbox/HSAs", params={"bbox": "-90.2,35.0,-89.5,36.6", "zoom": 9},
+                               headers={"origin": "http://localhost:7860"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/geo+json"
+        assert response.headers["access-control-allow-origin"] == "*"
+        ids = [f["properties"]["hsanum"] for f in response.json()["features"]]
+        assert ids == [100, 101, 102]
+
+        tile = await c.get("/tiles/HSAs/7/33/50.geojson")
+        assert 0 < len(tile.json()["features"]) < 24
+
+        assert (await c.get("/bbox/HRRs", params={"bbox": "-90,35,-89,36"})).status_code == 404
+        assert (await c.get("/bbox/HSAs", params={"bbox": "-89,35,-90,36"})).status_code == 400
+        assert (await c.get("/tiles/HSAs/3/9/0.geojson")).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_businesses_filtered_and_clustered(tile_app) -> None:
+    app, businesses = tile_app
+    async with client(app) as c:
+        small = await c.get("/bbox/businesses", params={"bbox": "-87,35.5,-86,36.5", "types": "Autozone"})
+        features = small.json()["features"]
+        inside = businesses[businesses["md_x"].between(-87, -86) & businesses["md_y"].between(35.5, 36.5)
+                            & (businesses["business_type"] == "Autozone")]
+        assert len(features) == len(inside)
+        assert {f["properties"]["business_type"] for f in features} == {"Autozone"}
+        assert "name" in features[0]["properties"]
+
+        # The whole state exceeds max_points, so it comes back as counted clusters
+        state = (await c.get("/bbox/businesses", params={"bbox": "-90.4,34.9,-81.6,36.7"})).json()
+        counts = [f["properties"]["count"] for f in state["features"]]
+        assert sum(counts) == len(businesses) and len(counts) <= 32 * 32
+
+
+def test_viewport_layers_render() -> None:
+    import folium
+
+    m = folium.Map()
+    ViewportLayers("HSAs", ["Autozone"], url="http://tiles.example/").add_to(m)
+    html = m.get_root().render()
+    assert '"http://tiles.example"' in html and '"/bbox/"' in html and '["Autozone"]' in html
@@ -0,0 +1,54 @@
+from translation_cache import TranslationCache
+
+SCHEMA = [{"column_name": "total_charges", "column_type": "BIGINT"}]
+
+
+def test_hit_after_put_survives_restart(tmp_path) -> None:
+    path = str(tmp_path / "cache.db")
+    cache = TranslationCache(path, schema=SCHEMA, model="gpt-4")
+    assert cache.get("Sum of total_charges") is None
+    cache.put("Sum of total_charges", "SELECT sum(total_charges) FROM t")
+    assert cache.get("  sum of TOTAL_CHARGES? ") == (
+        "SELECT sum(total_charges) FROM t"
+    )
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    cache.close()
+
+    reopened = TranslationCache(path, schema=SCHEMA, model="gpt-4")
+    assert reopened.get("sum of total_charges") is not None
+    reopened.close()
+
+
+def test_schema_or_model_change_drops_entries(tmp_path) -> None:
+    path = str(tmp_path / "cache.db")
+    cache = TranslationCache(path, schema=SCHEMA, model="gpt-4")
+    cache.put("q", "SELECT 1")
+    cache.close()
+
+    other = TranslationCache(path, schema=SCHEMA, model="gpt-4o")
+    assert other.get("q") is None
+    other.close()
+    original = TranslationCache(path, schema=SCHEMA, model="gpt-4")
+    assert original.get("q") is None
+    original.close()
+
+
+def test_ttl_and_size_eviction(tmp_path) -> None:
+    cache = TranslationCache(
+        str(tmp_path / "cache.db"), schema=SCHEMA, model="gpt-4",
+        ttl=-1,
+    )
+    cache.put("q", "SELECT 1")
+    assert cache.get("q") is None
+    cache.close()
+
+    cache = TranslationCache(
+        str(tmp_path / "small.db"), schema=SCHEMA, model="gpt-4",
+        max_entries=2, memory_entries=1,
+    )
+    for i in range(4):
+        cache.put(f"q{i}", f"SELECT {i}")
+    assert cache.get("q0") is None
+    assert cache.get("q3") == "SELECT 3"
+    cache.close()